@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from typing import Callable, Generic, Optional
 from problem import HeuristicFunction, Problem, S, A, Solution
+from policy_store import PolicyStore
+from search_stats import SearchStats
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -22,48 +24,71 @@ class HumanAgent(GoalBasedAgent[S, A]):
         return self.user_input_fn(problem, state)
 
 # This agent applies an uninformed search algorithm to find the solution to goal for the given state
+# If a SearchStats object is given, it is passed to the search function on every act as "stats" to accumulate the search statistics
+# If a PolicyStore is given, it is used to store the policy (for example, to limit its size or to keep it on disk)
 class UninformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution]) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution], stats: Optional[SearchStats] = None, policy: Optional[PolicyStore] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
-        self.policy: Dict[S, A] = {}
+        self.policy = policy if policy is not None else PolicyStore()
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state)
+            if self.stats is None:
+                solution = self.search_fn(problem, state)
+            else:
+                solution = self.search_fn(problem, state, stats=self.stats)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
+                self.policy.flush()
                 return None
             # Otherwise, we go through the solution path and store the action to do in each state into the policy
             current = state
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
+            self.policy.flush() # Commit the stored path if the policy is kept on disk
+            # If the policy has a size limit, the first state may already be evicted when the path is long
+            if solution: return solution[0]
         return self.policy.get(state)
 
 # This agent applies an informed search algorithm to find the solution to goal for the given state
+# If a time budget (in seconds) is given, it is passed to the search function on every act as "time_budget"
+# so it should be used with search functions that accept it (such as the anytime searches)
+# If a SearchStats object is given, it is passed to the search function on every act as "stats" to accumulate the search statistics
+# If a PolicyStore is given, it is used to store the policy (for example, to limit its size or to keep it on disk)
 class InformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction, time_budget: Optional[float] = None, stats: Optional[SearchStats] = None, policy: Optional[PolicyStore] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         self.heuristic = heuristic
+        self.time_budget = time_budget
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
-        self.policy: Dict[S, A] = {}
+        self.policy = policy if policy is not None else PolicyStore()
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state, self.heuristic)
+            options = {}
+            if self.time_budget is not None: options["time_budget"] = self.time_budget
+            if self.stats is not None: options["stats"] = self.stats
+            solution = self.search_fn(problem, state, self.heuristic, **options)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
+                self.policy.flush()
                 return None
             # Otherwise, we go through the solution path and store the action to do in each state into the policy
             current = state
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
+            self.policy.flush() # Commit the stored path if the policy is kept on disk
+            # If the policy has a size limit, the first state may already be evicted when the path is long
+            if solution: return solution[0]
         return self.policy.get(state)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from array import array
+from typing import Any, Dict, Tuple
+import json, mmap, sys
+
+# This file contains a simple binary format to store precomputed tables (such as heuristic databases) on disk
+# The file starts with a JSON header on the first line, followed by the raw bytes of every array.
+# The header contains any data given by the caller, and the type, offset and length of every array,
+# so the arrays can be memory-mapped when loaded instead of being read and copied into memory.
+# Every array starts at an offset that is a multiple of 8 bytes
+
+ALIGNMENT = 8
+
+# Writes the header and the arrays to the file at the given path
+# The header must be JSON serializable and it should not contain the keys "arrays" and "byteorder" (they are added here)
+def save_arrays(path: str, header: Dict[str, Any], arrays: Dict[str, array]) -> None:
+    # The offsets depend on the header size which depends on the offsets, so the header is padded to a fixed size
+    # that is large enough (the offsets are written with at most 20 digits)
+    entries = {name: {"typecode": data.typecode, "offset": 0, "length": len(data)} for name, data in arrays.items()}
+    full_header = dict(header, byteorder=sys.byteorder, arrays=entries)
+    for entry in entries.values(): entry["offset"] = 10**19
+    header_size = len(json.dumps(full_header).encode()) + 1
+    offset = header_size = header_size + (-header_size) % ALIGNMENT
+    for name, data in arrays.items():
+        entries[name]["offset"] = offset
+        offset += len(data) * data.itemsize
+        offset += (-offset) % ALIGNMENT
+    encoded = json.dumps(full_header).encode()
+    with open(path, 'wb') as f:
+        f.write(encoded + b' ' * (header_size - len(encoded) - 1) + b'\n')
+        for name, data in arrays.items():
+            f.seek(entries[name]["offset"])
+            data.tofile(f)
+        f.truncate(offset)
+
+# Reads the header and the arrays from the file at the given path
+# The arrays are returned as read-only memoryviews over a memory map of the file (which behave like read-only arrays)
+# If the file was written on a machine with a different byte order, the arrays are copied and swapped instead
+def load_arrays(path: str) -> Tuple[Dict[str, Any], Dict[str, memoryview]]:
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        memory = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # The map stays valid after the file is closed
+    entries = header.pop("arrays")
+    byteorder = header.pop("byteorder")
+    arrays = {}
+    for name, entry in entries.items():
+        itemsize = array(entry["typecode"]).itemsize
+        view = memoryview(memory)[entry["offset"]:entry["offset"] + entry["length"] * itemsize].cast(entry["typecode"])
+        if byteorder != sys.byteorder:
+            data = array(entry["typecode"], view)
+            data.byteswap()
+            view = memoryview(data)
+        arrays[name] = view
+    return header, arrays
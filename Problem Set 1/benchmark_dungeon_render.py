@@ -0,0 +1,77 @@
+from dungeon import DungeonProblem, DungeonTile
+from dungeon_render import TerminalDiffPrinter, colorize
+from generators import generate_dungeon
+from helpers.utils import bcolors
+import argparse, io, random, time
+
+# This benchmark measures the printing of the dungeon states along random walks:
+#   plain:   the per-cell printing (a point and up to 4 set lookups per cell) against DungeonState.__str__ (a copy of the static frame)
+#   colored: the plain printing followed by a str.replace per tile against DungeonState.__str__ followed by colorize (a single pass)
+#   diff:    the number of characters written to the terminal by full frames against the TerminalDiffPrinter
+
+# The old printing of the states (every cell is checked against the walls, the player, the exit and the coins)
+def point_str(state) -> str:
+    def position_to_str(position):
+        if position not in state.layout.walkable: return DungeonTile.WALL
+        if position == state.player: return DungeonTile.PLAYER
+        if position == state.layout.exit: return DungeonTile.EXIT
+        if position in state.remaining_coins: return DungeonTile.COIN
+        return DungeonTile.EMPTY
+    points, width = state.layout.points, state.layout.width
+    return '\n'.join(''.join(position_to_str(points[y * width + x]) for x in range(width)) for y in range(state.layout.height))
+
+# The old colouring (a str.replace per tile)
+def replace_colored(level: str) -> str:
+    level = level.replace(DungeonTile.COIN, f'{bcolors.BRIGHT_GREEN}{DungeonTile.COIN}{bcolors.ENDC}')
+    level = level.replace(DungeonTile.PLAYER, f'{bcolors.YELLOW}{DungeonTile.PLAYER}{bcolors.ENDC}')
+    level = level.replace(DungeonTile.WALL, f'{bcolors.BRIGHT_BLACK}{DungeonTile.WALL}{bcolors.ENDC}')
+    level = level.replace(DungeonTile.EMPTY, f'{bcolors.BRIGHT_BLACK}{DungeonTile.EMPTY}{bcolors.ENDC}')
+    level = level.replace(DungeonTile.EXIT, f'{bcolors.BRIGHT_BLUE}{DungeonTile.EXIT}{bcolors.ENDC}')
+    return level
+
+# Returns the states visited by a random walk from the initial state
+def random_walk(problem: DungeonProblem, steps: int, rng: random.Random):
+    state = problem.get_initial_state()
+    states = [state]
+    for _ in range(steps):
+        state = problem.get_successor(state, rng.choice(problem.get_actions(state)))
+        states.append(state)
+    return states
+
+# Returns the number of frames printed per second
+def rate(function, states) -> float:
+    start = time.perf_counter()
+    for state in states:
+        function(state)
+    return len(states) / (time.perf_counter() - start)
+
+def report(label: str, before: float, after: float) -> None:
+    print(f"{label:<44} {before:>14.0f} {after:>14.0f} {after / before:>8.2f}x")
+
+def main(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    levels = [(level, DungeonProblem.from_file(level)) for level in args.dungeons]
+    for size in args.sizes:
+        levels.append((f"generated {size}x{size}", DungeonProblem.from_text(generate_dungeon(size, size, args.coins, rng))))
+    print(f"{'level':<44} {'before':>14} {'after':>14} {'speedup':>8}")
+    for label, problem in levels:
+        states = random_walk(problem, args.steps, rng)
+        assert all(point_str(state) == str(state) for state in states[:100])
+        report(f"{label} (plain, frames/s)", rate(point_str, states), rate(str, states))
+        report(f"{label} (colored, frames/s)", rate(lambda state: replace_colored(point_str(state)), states),
+                                               rate(lambda state: colorize(str(state)), states))
+        full, printer = io.StringIO(), TerminalDiffPrinter(colors=True, stream=io.StringIO())
+        for state in states:
+            full.write(colorize(str(state)) + '\n')
+            printer.show(str(state).split('\n'))
+        written, total = len(printer.stream.getvalue()), len(full.getvalue())
+        print(f"{f'{label} (diff, characters written)':<44} {total:>14} {written:>14} {total / written:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the printing of the dungeon states (plain, colored and diff)")
+    parser.add_argument("--dungeons", nargs="*", default=["dungeons/dungeon3.txt", "dungeons/dungeon4.txt"], help="the dungeons to print")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[101], help="the sizes of the generated dungeons to print")
+    parser.add_argument("--coins", type=int, default=40, help="the number of coins of the generated dungeons")
+    parser.add_argument("--steps", type=int, default=2000, help="the length of the random walk printed in every dungeon")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())
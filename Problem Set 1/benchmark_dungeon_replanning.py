@@ -0,0 +1,86 @@
+from dungeon import DungeonProblem, DungeonState
+from dungeon_incremental import DStarLiteAgent, toggle_cells
+from generators import generate_dungeon
+from search import AStarSearch
+from search_stats import SearchStats
+from collections import deque
+import argparse, random, time
+
+# This benchmark measures the cost of replanning after the layout of a dungeon is edited while the agent is walking in it
+# It generates random dungeons, then the D* Lite agent walks a few steps between the edits (every edit toggles a few random cells).
+# After every edit, it compares the repair done by the agent (which keeps its tables) with planning again from scratch:
+#   a new D* Lite agent (the same search without the previous tables) and A* with the strong heuristic from the player's state
+# The edits that would make the dungeon unsolvable are skipped
+
+# Check that the exit and all the remaining coins can be reached from the player
+def is_solvable(problem: DungeonProblem, state: DungeonState) -> bool:
+    layout = problem.layout
+    reached, queue = {state.cell}, deque([state.cell])
+    while queue:
+        cell = queue.popleft()
+        for neighbour in layout.moves[cell]:
+            if neighbour >= 0 and neighbour not in reached:
+                reached.add(neighbour)
+                queue.append(neighbour)
+    targets = [layout.exit_cell] + [cell for index, cell in enumerate(layout.coins) if state.coins >> index & 1]
+    return all(target in reached for target in targets)
+
+# Returns a random edit of the problem that keeps it solvable
+def random_edit(problem: DungeonProblem, state: DungeonState, cells: int, rng: random.Random) -> DungeonProblem:
+    layout = problem.layout
+    # Only the inner cells are edited so the dungeon stays closed by walls
+    inner = [y * layout.width + x for y in range(1, layout.height - 1) for x in range(1, layout.width - 1)]
+    while True:
+        edited = toggle_cells(problem, state, rng.sample(inner, cells))
+        if is_solvable(edited, edited.initial_state): return edited
+
+# Returns the first action, the time and the number of expanded nodes of a planning function
+def measure(plan):
+    stats = SearchStats()
+    start = time.perf_counter()
+    action = plan(stats)
+    return action, time.perf_counter() - start, stats.expansions
+
+def main(args: argparse.Namespace):
+    from dungeon_heuristic import strong_heuristic
+    rng = random.Random(args.seed)
+    print(f"{'instance':>8} {'edit':>4} {'repair (s)':>10} {'repair exp':>10} {'scratch (s)':>11} {'scratch exp':>11} {'A* (s)':>8} {'A* exp':>8}")
+    totals = [0.0] * 6
+    for instance in range(args.instances):
+        problem = DungeonProblem.from_text(generate_dungeon(args.width, args.height, args.coins, rng, loops=args.loops))
+        state = problem.get_initial_state()
+        agent = DStarLiteAgent()
+        agent.act(problem, state)
+        for edit in range(args.edits):
+            # Walk a few steps along the current plan
+            for _ in range(args.steps):
+                if problem.is_goal(state): break
+                state = problem.get_successor(state, agent.act(problem, state))
+            if problem.is_goal(state): break
+            problem = random_edit(problem, state, args.cells, rng)
+            state = problem.initial_state
+            def repair(stats):
+                agent.stats = stats
+                return agent.act(problem, state)
+            action, repair_time, repair_expansions = measure(repair)
+            _, scratch_time, scratch_expansions = measure(lambda stats: DStarLiteAgent(stats).act(problem, state))
+            _, astar_time, astar_expansions = measure(lambda stats: AStarSearch(problem, state, strong_heuristic, stats=stats))
+            print(f"{instance:>8} {edit:>4} {repair_time:>10.4f} {repair_expansions:>10} {scratch_time:>11.4f} {scratch_expansions:>11} {astar_time:>8.4f} {astar_expansions:>8}")
+            for index, value in enumerate((repair_time, repair_expansions, scratch_time, scratch_expansions, astar_time, astar_expansions)):
+                totals[index] += value
+    print(f"{'total':>8} {'':>4} {totals[0]:>10.4f} {totals[1]:>10.0f} {totals[2]:>11.4f} {totals[3]:>11.0f} {totals[4]:>8.4f} {totals[5]:>8.0f}")
+    if totals[0] > 0:
+        print(f"Repairing is {totals[2] / totals[0]:.2f}x faster than D* Lite from scratch and {totals[4] / totals[0]:.2f}x faster than A*")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare incremental replanning (D* Lite) against planning from scratch on randomly edited dungeons")
+    parser.add_argument("--instances", "-n", type=int, default=3, help="the number of generated dungeons")
+    parser.add_argument("--width", type=int, default=25, help="the width of the generated dungeons")
+    parser.add_argument("--height", type=int, default=17, help="the height of the generated dungeons")
+    parser.add_argument("--coins", type=int, default=4, help="the number of coins in the generated dungeons")
+    parser.add_argument("--loops", type=float, default=0.5, help="the probability that a wall between 2 corridors of the maze is removed")
+    parser.add_argument("--edits", "-e", type=int, default=10, help="the number of edits done to every dungeon")
+    parser.add_argument("--cells", "-k", type=int, default=2, help="the number of cells toggled by every edit")
+    parser.add_argument("--steps", type=int, default=2, help="the number of steps the agent walks between the edits")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+from dungeon import DungeonProblem, DungeonState
+from mathutils import Direction
+from problem import Problem
+from collections import deque
+import argparse, time
+
+# This benchmark measures the throughput of successor generation (get_actions followed by get_successor for every action)
+# It compares the move tables precomputed in the dungeon layout against computing every neighbour with Point arithmetic
+# (which is how the problem generated the successors before the tables were added)
+
+# The actions computed by adding the direction vector to the player position and checking if the result is walkable
+def point_get_actions(problem: DungeonProblem, state: DungeonState):
+    actions = []
+    for direction in Direction:
+        position = state.player + direction.to_vector()
+        if position not in problem.layout.walkable: continue
+        actions.append(direction)
+    return actions
+
+# The successor computed by adding the direction vector to the player position
+def point_get_successor(problem: DungeonProblem, state: DungeonState, action: Direction):
+    player = state.player + action.to_vector()
+    if player not in problem.layout.walkable:
+        return state
+    cell = problem.layout.cell_of(player)
+    return DungeonState(state.layout, cell, state.coins & ~problem.layout.coin_bits[cell])
+
+# Collect (up to a limit) the states reachable from the initial state using a breadth first traversal
+# (it works for any problem, so the other benchmarks use it too)
+def reachable_states(problem: Problem, limit: int):
+    initial_state = problem.get_initial_state()
+    states, queue = {initial_state}, deque([initial_state])
+    while queue and len(states) < limit:
+        state = queue.popleft()
+        for action in problem.get_actions(state):
+            child = problem.get_successor(state, action)
+            if child not in states:
+                states.add(child)
+                queue.append(child)
+    return list(states)
+
+# Returns the number of generated successors per second
+def measure(get_actions, get_successor, problem: DungeonProblem, states, repeats: int) -> float:
+    generated = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for state in states:
+            for action in get_actions(problem, state):
+                get_successor(problem, state, action)
+                generated += 1
+    return generated / (time.perf_counter() - start)
+
+def main(args: argparse.Namespace):
+    print(f"{'level':<28} {'states':>7} {'before (succ/s)':>16} {'after (succ/s)':>15} {'speedup':>8}")
+    for level in args.levels:
+        problem = DungeonProblem.from_file(level)
+        states = reachable_states(problem, args.states)
+        before = measure(point_get_actions, point_get_successor, problem, states, args.repeats)
+        after = measure(DungeonProblem.get_actions, DungeonProblem.get_successor, problem, states, args.repeats)
+        print(f"{level:<28} {len(states):>7} {before:>16.0f} {after:>15.0f} {after / before:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the successor generation throughput of the dungeon problem")
+    parser.add_argument("levels", nargs="*", default=[f"dungeons/dungeon{index}.txt" for index in range(1, 5)], help="the dungeons to use")
+    parser.add_argument("--states", "-n", type=int, default=20000, help="the maximum number of states to generate successors for")
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="the number of passes over the states")
+    main(parser.parse_args())
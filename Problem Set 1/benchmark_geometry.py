@@ -0,0 +1,87 @@
+from dungeon import DungeonProblem, DungeonState
+from parking import ParkingProblem
+from mathutils import Direction, Point, euclidean_distance, point_grid
+from benchmark_dungeon_successors import reachable_states
+import argparse, math, time
+
+# This benchmark measures the geometry helpers of mathutils against the point arithmetic they replace:
+#   translate:  point + direction.to_vector() (which creates a point) against PointGrid.translate (which returns an interned point)
+#   membership: looking up a created point in a set of points against looking up an interned point
+#   euclidean:  the distance computed through the difference point against math.hypot on the coordinates
+#   successors: the get_actions/get_successor loop of the dungeon when the neighbours are computed with points (created or interned)
+#               and the get_actions/get_successor loop of the problems (which use the precomputed cell tables)
+
+# Returns the number of operations per second (the function does "count" operations)
+def rate(function, count: int, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return count * repeats / (time.perf_counter() - start)
+
+# The old euclidean distance (through the difference point)
+def point_euclidean_distance(p1: Point, p2: Point) -> float:
+    difference = p1 - p2
+    return math.sqrt(difference.x * difference.x + difference.y * difference.y)
+
+def report(label: str, before: float, after: float) -> None:
+    print(f"{label:<44} {before:>14.0f} {after:>14.0f} {after / before:>8.2f}x")
+
+def main(args: argparse.Namespace):
+    print(f"{'operation':<44} {'before (op/s)':>14} {'after (op/s)':>14} {'speedup':>8}")
+    grid = point_grid(args.size, args.size)
+    created = [Point(x, y) for y in range(args.size) for x in range(args.size)] # Points that are not interned
+    interned = list(grid.points)
+    walkable = frozenset(interned)
+    count = len(created) * 4
+    report("translate", rate(lambda: [point + direction.to_vector() for point in created for direction in Direction], count, args.repeats),
+                        rate(lambda: [grid.translate(point, direction) for point in interned for direction in Direction], count, args.repeats))
+    report("membership", rate(lambda: [point in walkable for point in created], len(created), args.repeats * 4),
+                         rate(lambda: [point in walkable for point in interned], len(created), args.repeats * 4))
+    target = Point(args.size // 2, args.size // 3)
+    report("euclidean", rate(lambda: [point_euclidean_distance(point, target) for point in interned], len(created), args.repeats * 4),
+                        rate(lambda: [euclidean_distance(point, target) for point in interned], len(created), args.repeats * 4))
+
+    for level in args.dungeons:
+        problem = DungeonProblem.from_file(level)
+        layout = problem.layout
+        level_grid = point_grid(layout.width, layout.height)
+        states = reachable_states(problem, args.states)
+        # The successors computed from the points of the states (the neighbours are created or interned)
+        def point_successors(translate):
+            for state in states:
+                player = state.player
+                for direction in Direction:
+                    position = translate(player, direction)
+                    if position not in layout.walkable: continue
+                    cell = layout.cell_of(position)
+                    DungeonState(layout, cell, state.coins & ~layout.coin_bits[cell])
+        def table_successors():
+            for state in states:
+                for action in problem.get_actions(state):
+                    problem.get_successor(state, action)
+        successors = sum(len(layout.actions[state.cell]) for state in states)
+        created_rate = rate(lambda: point_successors(lambda point, direction: point + direction.to_vector()), successors, args.repeats)
+        report(f"{level} (interned points)", created_rate, rate(lambda: point_successors(level_grid.translate), successors, args.repeats))
+        report(f"{level} (cell tables)", created_rate, rate(table_successors, successors, args.repeats))
+
+    for level in args.parks:
+        problem = ParkingProblem.from_file(level)
+        states = reachable_states(problem, args.states)
+        actions = [(state, list(problem.get_actions(state))) for state in states]
+        def parking_successors():
+            for state, state_actions in actions:
+                for action in state_actions:
+                    problem.get_successor(state, action)
+        successors = sum(len(state_actions) for _, state_actions in actions)
+        actions_rate = rate(lambda: [list(problem.get_actions(state)) for state in states], len(states), args.repeats)
+        print(f"{level + ' (get_actions)':<44} {'':>14} {actions_rate:>14.0f}")
+        print(f"{level + ' (get_successor)':<44} {'':>14} {rate(parking_successors, successors, args.repeats):>14.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the geometry helpers (interned points, translation tables and distances)")
+    parser.add_argument("--dungeons", nargs="*", default=["dungeons/dungeon1.txt", "dungeons/dungeon3.txt"], help="the dungeons used for the successor loops")
+    parser.add_argument("--parks", nargs="*", default=["parks/park4.txt"], help="the parking lots used for the successor loops")
+    parser.add_argument("--size", type=int, default=64, help="the size of the grid used for the point operations")
+    parser.add_argument("--states", type=int, default=20000, help="the maximum number of states of every level")
+    parser.add_argument("--repeats", "-r", type=int, default=5, help="the number of times every measurement is repeated")
+    main(parser.parse_args())
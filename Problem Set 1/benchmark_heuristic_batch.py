@@ -0,0 +1,65 @@
+from dungeon import DungeonProblem
+from dungeon_heuristic import batched_strong_heuristic, strong_heuristic, strong_heuristic_batch
+from generators import generate_dungeon
+from search import AStarSearch
+from search_stats import SearchStats
+import mathutils
+import argparse, random, time
+
+# This benchmark compares the strong dungeon heuristic called for every child against its batched version
+# which A* calls once per expansion for all the children when given batched_strong_heuristic (see get_heuristic_batch in problem.py):
+#   expansions: the heuristic time over the children of sampled states in generated dungeons with many coins
+#               (the states are the end points of random walks so they have different remaining coins)
+#   search:     the heuristic time reported by the statistics of A* on the given dungeons (the searches must explore the same nodes)
+
+# Sample states using random walks from the initial state and return the children of every sampled state
+def sample_expansions(problem: DungeonProblem, samples: int, walk_length: int, rng: random.Random):
+    expansions = []
+    for _ in range(samples):
+        state = problem.get_initial_state()
+        for _ in range(rng.randint(0, walk_length)):
+            state = problem.get_successor(state, rng.choice(problem.get_actions(state)))
+        expansions.append([problem.get_successor(state, action) for action in problem.get_actions(state)])
+    return expansions
+
+# Returns the time spent by the function (called "repeats" times)
+def measure(function, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return time.perf_counter() - start
+
+def main(args: argparse.Namespace):
+    print(f"Batched distances backend: {'numpy' if mathutils.np is not None else 'array'}")
+    print(f"{'level':<44} {'per child (s)':>14} {'batched (s)':>14} {'speedup':>8}")
+    rng = random.Random(args.seed)
+    for coins in args.coins:
+        problem = DungeonProblem.from_text(generate_dungeon(args.size, args.size, coins, rng))
+        expansions = sample_expansions(problem, args.samples, args.walk_length, rng)
+        # Check that both versions return the same values (this also fills the coin memo that both versions share)
+        for children in expansions:
+            assert strong_heuristic_batch(problem, children) == [strong_heuristic(problem, child) for child in children]
+        single = measure(lambda: [[strong_heuristic(problem, child) for child in children] for children in expansions], args.repeats)
+        batched = measure(lambda: [strong_heuristic_batch(problem, children) for children in expansions], args.repeats)
+        print(f"{f'generated {args.size}x{args.size} ({coins} coins)':<44} {single:>14.3f} {batched:>14.3f} {single / batched:>7.2f}x")
+
+    for level in args.dungeons:
+        problem = DungeonProblem.from_file(level)
+        single_stats, batched_stats = SearchStats(), SearchStats()
+        single_path = AStarSearch(problem, problem.get_initial_state(), strong_heuristic, single_stats)
+        problem = DungeonProblem.from_file(level) # Start from an empty cache
+        batched_path = AStarSearch(problem, problem.get_initial_state(), batched_strong_heuristic, batched_stats)
+        assert single_path == batched_path and single_stats.expansions == batched_stats.expansions
+        print(f"{f'{level} (A*, {batched_stats.expansions} expansions)':<44} {single_stats.heuristic_time:>14.3f} "
+              f"{batched_stats.heuristic_time:>14.3f} {single_stats.heuristic_time / batched_stats.heuristic_time:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the batched strong heuristic of the dungeon against calling it for every child")
+    parser.add_argument("--coins", nargs="*", type=int, default=[10, 50, 100], help="the number of coins of the generated dungeons")
+    parser.add_argument("--size", type=int, default=41, help="the width and height of the generated dungeons")
+    parser.add_argument("--samples", "-n", type=int, default=2000, help="the number of sampled expansions in every generated dungeon")
+    parser.add_argument("--walk-length", type=int, default=200, help="the maximum length of the random walks that sample the states")
+    parser.add_argument("--dungeons", nargs="*", default=["dungeons/dungeon1.txt", "dungeons/dungeon2.txt", "dungeons/dungeon3.txt"], help="the dungeons searched by A*")
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="the number of times every measurement is repeated")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())
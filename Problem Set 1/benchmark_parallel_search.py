@@ -0,0 +1,36 @@
+from dungeon import DungeonProblem
+from parallel_search import HashDistributedAStar, ParallelSearchReport
+from generators import generate_dungeon
+import argparse, os, random
+
+# This benchmark measures how the hash distributed A* (HDA*) scales with the number of worker processes
+# It generates large dungeons (random mazes with loops, see generators.py) and solves each of them with 1 to N workers,
+# then it reports the path cost (which must be the same for every number of workers) and the expansions per second
+
+def main(args: argparse.Namespace):
+    from dungeon_heuristic import strong_heuristic
+    rng = random.Random(args.seed)
+    print(f"{'instance':>8} {'workers':>7} {'cost':>6} {'expansions':>10} {'time (s)':>9} {'expansions/s':>12} {'speedup':>7}")
+    for instance in range(args.instances):
+        problem = DungeonProblem.from_text(generate_dungeon(args.width, args.height, args.coins, rng, loops=args.loops))
+        baseline, costs = None, set()
+        for workers in range(1, args.workers + 1):
+            report = ParallelSearchReport()
+            HashDistributedAStar(problem, problem.get_initial_state(), strong_heuristic, workers=workers, batch_size=args.batch_size, report=report)
+            baseline = baseline or report.elapsed
+            costs.add(report.cost)
+            print(f"{instance:>8} {workers:>7} {report.cost:>6} {report.total_expansions:>10} {report.elapsed:>9.3f} {report.expansions_per_second:>12.0f} {baseline / report.elapsed:>7.2f}")
+        if len(costs) != 1:
+            print(f"ERROR: The path cost changed with the number of workers: {sorted(costs)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the scaling of the hash distributed A* search")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="the maximum number of worker processes")
+    parser.add_argument("--instances", "-n", type=int, default=3, help="the number of generated dungeons")
+    parser.add_argument("--width", type=int, default=25, help="the width of the generated dungeons")
+    parser.add_argument("--height", type=int, default=17, help="the height of the generated dungeons")
+    parser.add_argument("--coins", type=int, default=6, help="the number of coins in the generated dungeons")
+    parser.add_argument("--loops", type=float, default=0.5, help="the probability that a wall between 2 corridors of the maze is removed")
+    parser.add_argument("--batch-size", "-b", type=int, default=64, help="the number of expansions between the batches sent by a worker")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())
@@ -0,0 +1,48 @@
+from parking import ParkingProblem
+from parking_heuristic import parking_heuristic
+from parking_pdb import PatternDatabase, get_pattern_database, pdb_heuristic
+from search import AStarSearch
+from search_stats import SearchStats
+import argparse, os, tempfile, time
+
+# This benchmark builds the pattern database of every parking lot then compares A* with the per-car slot distances
+# against A* with the pattern database. It reports the build time, the table size and the reduction in the expanded nodes
+# (the path costs must be the same since both heuristics are admissible)
+
+def solve(problem: ParkingProblem, heuristic):
+    stats = SearchStats()
+    path = AStarSearch(problem, problem.get_initial_state(), heuristic, stats=stats)
+    cost, state = 0, problem.get_initial_state()
+    for action in path or []:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return (None if path is None else cost), stats
+
+def main(args: argparse.Namespace):
+    print(f"{'level':<20} {'patterns':<16} {'build (s)':>9} {'size (KB)':>9} {'load (s)':>9} {'cost':>6} {'slots exp.':>10} {'pdb exp.':>9} {'reduction':>9}")
+    for level in args.levels:
+        problem = ParkingProblem.from_file(level)
+        start = time.perf_counter()
+        database = PatternDatabase.build(problem, pattern_size=args.pattern_size)
+        build_time = time.perf_counter() - start
+        # Save the database then load it again (memory-mapped) to measure the load time and use it for the search
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "parking.pdb")
+            database.save(path)
+            start = time.perf_counter()
+            get_pattern_database(problem, path)
+            load_time = time.perf_counter() - start
+            slots_cost, slots_stats = solve(ParkingProblem.from_file(level), parking_heuristic)
+            pdb_cost, pdb_stats = solve(problem, pdb_heuristic)
+            problem.cache().clear() # Release the memory map before the file is deleted
+        patterns = ' '.join(''.join(chr(ord('A') + car) for car in pattern) for pattern in database.patterns)
+        reduction = slots_stats.expansions / max(pdb_stats.expansions, 1)
+        print(f"{level:<20} {patterns:<16} {build_time:>9.3f} {database.nbytes / 1024:>9.1f} {load_time:>9.4f} {str(pdb_cost):>6} {slots_stats.expansions:>10} {pdb_stats.expansions:>9} {reduction:>8.2f}x")
+        if slots_cost != pdb_cost:
+            print(f"ERROR: The path cost changed with the pattern database: {slots_cost} != {pdb_cost}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the pattern database heuristic of the parking problem")
+    parser.add_argument("levels", nargs="*", default=[f"parks/park{index}.txt" for index in range(1, 6)], help="the parking lots to use")
+    parser.add_argument("--pattern-size", "-k", type=int, default=2, help="the number of cars in every pattern")
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+from routing_service import RoutingService
+from generators import generate_graph
+import argparse, json, os, random, subprocess, sys, tempfile, time
+
+# This benchmark compares the routing service (which loads the graph once and answers batches of queries)
+# against playing every query with play_graph.py as it is run today (one process per query that parses the JSON graph and searches it)
+# The queries are drawn from a few sources so that the batches can share the shortest path trees
+
+def main(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.graph is None:
+            # A grid-like road graph where every node is connected to its 4 neighbours except for 10% of the roads
+            graph_path, edges_path = os.path.join(directory, "graph.json"), None
+            with open(graph_path, 'w') as f:
+                json.dump(generate_graph(args.grid * args.grid, rng, kind="grid"), f)
+        else:
+            graph_path, edges_path = args.graph, args.edges
+        start = time.perf_counter()
+        service = RoutingService(graph_path, edges_path, args.cache_size)
+        load_time = time.perf_counter() - start
+        names = [service.graph.name(node) for node in range(service.graph.node_count)]
+        sources = rng.sample(names, min(args.sources, len(names)))
+        queries = [(rng.choice(sources), rng.choice(names)) for _ in range(args.queries)]
+
+        print(f"Graph: {service.graph.node_count} nodes, {service.graph.edge_count} edges (loaded in {load_time:.3f} seconds)")
+        # The service with a cold cache then with a warm cache (the same queries again)
+        for label in ("service (cold cache)", "service (warm cache)"):
+            start = time.perf_counter()
+            for index in range(0, len(queries), args.batch_size):
+                service.route(queries[index:index + args.batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"{label:<24} {len(queries) / elapsed:>10.1f} queries/s")
+        print(f"Trees: {service.trees}, cache hits: {service.cache.hits}, misses: {service.cache.misses}, evictions: {service.cache.evictions}")
+        # One process per query (only a few queries since it is slow)
+        # play_graph.py reads the start and the goal from the graph file, so every query gets its own copy of the graph
+        if edges_path is not None:
+            print("The play_graph.py baseline is skipped since play_graph.py only reads JSON graphs")
+            return
+        graph_def = json.load(open(graph_path))
+        baseline = []
+        for index, (source, goal) in enumerate(queries[:args.baseline_queries]):
+            query_path = os.path.join(directory, f"query{index}.json")
+            with open(query_path, 'w') as f:
+                json.dump({**graph_def, "start": source, "goal": goal}, f)
+            baseline.append(query_path)
+        start = time.perf_counter()
+        for query_path in baseline:
+            subprocess.run([sys.executable, "play_graph.py", query_path, "--agent", args.baseline_agent], check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        print(f"{'play_graph.py per query':<24} {len(baseline) / elapsed:>10.1f} queries/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput of the routing service")
+    parser.add_argument("--graph", default=None, help="the graph file (JSON) or the nodes file (CSV) (a grid graph is generated if not given)")
+    parser.add_argument("--edges", default=None, help="the edges file (CSV) if the graph is given as CSV files")
+    parser.add_argument("--grid", type=int, default=60, help="the width of the generated grid graph")
+    parser.add_argument("--queries", "-n", type=int, default=1000, help="the number of queries")
+    parser.add_argument("--sources", type=int, default=20, help="the number of distinct sources in the queries")
+    parser.add_argument("--batch-size", "-b", type=int, default=100, help="the number of queries in every batch")
+    parser.add_argument("--cache-size", "-cs", type=int, default=64 * 2**20, help="the maximum size (in bytes) of the result cache")
+    parser.add_argument("--baseline-queries", type=int, default=10, help="the number of queries played with play_graph.py (one process per query)")
+    parser.add_argument("--baseline-agent", default="astar", help="the agent used by play_graph.py for the baseline queries")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Tuple
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, point_grid
 from problem import Problem
 from helpers.utils import track_call_count
 
@@ -22,41 +23,147 @@ class DungeonTile(str, Enum):
 #   the constructor and to make the class immutable
 # We disable the automatic equality implementation since we don't need it;
 # we only need the default equality which compares objects by pointers.
+# The maximum number of coin bitmasks whose coin positions are cached by every layout (the least recently used are evicted first)
+COIN_SET_CACHE_SIZE = 4096
+
 # The layout contains the problem details that are unchangeable across states such as:
 #   The walkable area (locations without walls) and the exit location
+# To keep the states compact, every cell in the grid has a flat index (y * width + x)
+# and every coin has an index (assigned in DungeonProblem.from_text) so a set of coins can be stored as a bitmask
+# The layout also contains tables of the possible moves from every cell so that the problem never has to compute a neighbour
 @dataclass(eq=False, frozen=True)
 class DungeonLayout:
-    __slots__ = ("width", "height", "walkable", "exit")
+    __slots__ = ("width", "height", "walkable", "exit", "points", "coins", "coin_bits", "exit_cell", "actions", "moves", "_coin_sets", "_frame")
     width: int
     height: int
     walkable: FrozenSet[Point]
     exit: Point
+    points: Tuple[Point, ...]                   # The point of every cell index (points[y * width + x] == Point(x, y))
+    coins: Tuple[int, ...]                      # The cell index of every coin (coin 'i' is in the cell coins[i])
+    coin_bits: Tuple[int, ...]                  # For every cell index, the bit of the coin in this cell (0 if the cell has no coin)
+    exit_cell: int                              # The cell index of the exit
+    actions: Tuple[Tuple[Direction, ...], ...]  # For every cell index, the directions that do not lead into a wall (in the order of Direction)
+    moves: Tuple[Tuple[int, ...], ...]          # For every cell index and direction, the index of the neighbouring cell (-1 if it is a wall)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_coin_sets", OrderedDict()) # A bounded cache of the coin positions for each coin bitmask
+        object.__setattr__(self, "_frame", None) # The static part of the printed grid (created when a state is first printed)
+
+    # Create a layout and precompute all its tables from the grid size, the walkable positions, the exit and the coins
+    # The coins are indexed in the order they appear in the grid (row by row)
+    @staticmethod
+    def create(width: int, height: int, walkable: Iterable[Point], exit: Point, coins: Iterable[Point]) -> 'DungeonLayout':
+        # The points are interned in a grid so that the points of the layout (and their neighbours) are shared objects
+        grid = point_grid(width, height)
+        walkable = frozenset(grid.intern(point) for point in walkable)
+        points = grid.points
+        coin_cells = tuple(sorted(coin.y * width + coin.x for coin in coins))
+        coin_bits = [0] * len(points)
+        for index, cell in enumerate(coin_cells):
+            coin_bits[cell] = 1 << index
+        actions, moves = [], []
+        for point in points:
+            neighbours = [grid.translate(point, direction) for direction in Direction]
+            neighbours = [neighbour.y * width + neighbour.x if point in walkable and neighbour in walkable else -1 for neighbour in neighbours]
+            actions.append(tuple(direction for direction in Direction if neighbours[direction] >= 0))
+            moves.append(tuple(neighbours))
+        return DungeonLayout(width, height, walkable, grid.intern(exit), points, coin_cells, tuple(coin_bits),
+                             exit.y * width + exit.x, tuple(actions), tuple(moves))
+
+    # Converts a coin bitmask to the set of the coin positions (the result is cached since many states share the same coins)
+    # The number of coin bitmasks grows as 2^coins, so the cache keeps at most COIN_SET_CACHE_SIZE of them
+    def coin_set(self, coins: int) -> FrozenSet[Point]:
+        cache = self._coin_sets
+        positions = cache.get(coins)
+        if positions is None:
+            positions = frozenset(self.points[cell] for index, cell in enumerate(self.coins) if coins >> index & 1)
+            cache[coins] = positions
+            if len(cache) > COIN_SET_CACHE_SIZE: cache.popitem(last=False) # Evict the least recently used entry
+        else:
+            cache.move_to_end(coins)
+        return positions
+
+    # Returns the printed grid without the player and the coins (the walls, the empty cells and the exit) as ASCII characters
+    # The rows are separated by new lines so the character of a cell is at the offset cell + cell // width
+    # The states copy this buffer then only write the player and the remaining coins into the copy (see DungeonState.__str__)
+    def static_frame(self) -> bytes:
+        frame = self._frame
+        if frame is None:
+            width = self.width
+            frame = bytearray(b'\n'.join(
+                bytes(ord(DungeonTile.EMPTY if self.points[cell] in self.walkable else DungeonTile.WALL) for cell in range(y * width, (y + 1) * width))
+                for y in range(self.height)))
+            frame[self.exit_cell + self.exit_cell // width] = ord(DungeonTile.EXIT)
+            frame = bytes(frame)
+            object.__setattr__(self, "_frame", frame)
+        return frame
+
+    # Converts a set of coin positions to a coin bitmask
+    def coin_mask(self, positions: Iterable[Point]) -> int:
+        return sum(self.coin_bits[self.cell_of(position)] for position in positions)
+
+    # Converts a position to its cell index
+    def cell_of(self, position: Point) -> int:
+        return position.y * self.width + position.x
+
+    # Rebuild the layout (and its tables) when unpickled (see Point.__reduce__)
+    def __reduce__(self):
+        return (DungeonLayout.create, (self.width, self.height, self.walkable, self.exit, [self.points[cell] for cell in self.coins]))
 
 # For the dungeon state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
-# Now it can be added to sets and used as keys in dictionaries
+#   the constructor and to make the class immutable
 # This will contain a reference to the dungeon layout and it will contain environment details that change across states such as:
-#   The player location and the locations of the remaining coins 
-@dataclass(frozen=True)
+#   The player location (as a cell index) and the remaining coins (as a bitmask where bit 'i' is set if coin 'i' was not collected)
+# Since the state only contains 2 integers, the == operator and the hash function are implemented manually to be cheap
+# and the hash is computed once when the state is created. Now it can be added to sets and used as keys in dictionaries
+# The properties "player" and "remaining_coins" convert the state back to points so that the heuristics can still use them
+@dataclass(eq=False, frozen=True)
 class DungeonState:
-    __slots__ = ("layout", "player", "remaining_coins")
+    __slots__ = ("layout", "cell", "coins", "_hash")
     layout: DungeonLayout
-    player: Point
-    remaining_coins: FrozenSet[Point]
+    cell: int
+    coins: int
+
+    def __post_init__(self):
+        # Every (cell, coins) pair has a unique hash since the cell index is less than the number of cells
+        object.__setattr__(self, "_hash", self.coins * len(self.layout.points) + self.cell)
+
+    # Create a state from the player position and the set of remaining coin positions
+    @staticmethod
+    def from_points(layout: DungeonLayout, player: Point, remaining_coins: Iterable[Point]) -> 'DungeonState':
+        return DungeonState(layout, layout.cell_of(player), layout.coin_mask(remaining_coins))
+
+    @property
+    def player(self) -> Point:
+        return self.layout.points[self.cell]
+
+    @property
+    def remaining_coins(self) -> FrozenSet[Point]:
+        return self.layout.coin_set(self.coins)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not DungeonState: return NotImplemented
+        return self._hash == other._hash and self.layout is other.layout
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    # Rebuild the state using the constructor when unpickled (see Point.__reduce__)
+    def __reduce__(self):
+        return (DungeonState, (self.layout, self.cell, self.coins))
 
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
-        def position_to_str(position):
-            if position not in self.layout.walkable:
-                return DungeonTile.WALL
-            if position == self.player:
-                return DungeonTile.PLAYER
-            if position == self.layout.exit:
-                return DungeonTile.EXIT
-            if position in self.remaining_coins:
-                return DungeonTile.COIN
-            return DungeonTile.EMPTY
-        return '\n'.join(''.join(position_to_str(Point(x, y)) for x in range(self.layout.width)) for y in range(self.layout.height))
+        layout = self.layout
+        width, frame = layout.width, bytearray(layout.static_frame())
+        coins, coin_cells = self.coins, layout.coins
+        while coins: # Write the remaining coins (by iterating over the set bits of the bitmask)
+            bit = coins & -coins
+            cell = coin_cells[bit.bit_length() - 1]
+            frame[cell + cell // width] = ord(DungeonTile.COIN)
+            coins ^= bit
+        frame[self.cell + self.cell // width] = ord(DungeonTile.PLAYER) # The player is drawn over the exit
+        return frame.decode()
 
 # This is a list of all the possible actions for the dungeon agent
 AllDungeonActions = [
@@ -78,27 +185,19 @@ class DungeonProblem(Problem[DungeonState, Direction]):
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
     @track_call_count
     def is_goal(self, state: DungeonState) -> bool:
-        return len(state.remaining_coins) == 0 and state.player == self.layout.exit
+        return state.coins == 0 and state.cell == self.layout.exit_cell
 
+    # The possible actions are precomputed for every cell (walking into walls is disallowed)
     def get_actions(self, state: DungeonState) -> Iterable[Direction]:
-        actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
-            # Disallow walking into walls
-            if position not in self.layout.walkable: continue
-            actions.append(direction)
-        return actions
+        return self.layout.actions[state.cell]
 
     def get_successor(self, state: DungeonState, action: Direction) -> DungeonState:
-        player = state.player + action.to_vector()
-        remaining_coins = state.remaining_coins
-        if player not in self.layout.walkable:
+        cell = self.layout.moves[state.cell][action]
+        if cell < 0:
             # If we try to walk into a wall, the state does not change
             return state
-        if player in remaining_coins:
-            # If we walk over a coin, we take it
-            remaining_coins -= {player}
-        return DungeonState(state.layout, player, remaining_coins)
+        # If we walk over a coin, we take it (clearing its bit does nothing if the cell has no coin)
+        return DungeonState(state.layout, cell, state.coins & ~self.layout.coin_bits[cell])
 
     def get_cost(self, state: DungeonState, action: Direction) -> float:
         # All actions have the same cost
@@ -112,19 +211,22 @@ class DungeonProblem(Problem[DungeonState, Direction]):
         exit: Point = None
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
         width, height = max(len(line) for line in lines), len(lines)
+        grid = point_grid(width, height)
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
                 if char != DungeonTile.WALL:
-                    walkable.add(Point(x, y))
+                    point = grid.point(x, y)
+                    walkable.add(point)
                     if char == DungeonTile.PLAYER:
-                        player = Point(x, y)
+                        player = point
                     elif char == DungeonTile.COIN:
-                        coins.add(Point(x, y))
+                        coins.add(point)
                     elif char == DungeonTile.EXIT:
-                        exit = Point(x, y)
+                        exit = point
         problem = DungeonProblem()
-        problem.layout = DungeonLayout(width, height, frozenset(walkable), exit)
-        problem.initial_state = DungeonState(problem.layout, player, frozenset(coins))
+        # The layout precomputes the coin indices and the move tables of every cell
+        problem.layout = DungeonLayout.create(width, height, walkable, exit, coins)
+        problem.initial_state = DungeonState.from_points(problem.layout, player, coins)
         return problem
 
     # Read a dungeon problem from file containing a grid of tiles
@@ -1,6 +1,9 @@
 from dungeon import DungeonProblem, DungeonState
-from mathutils import Direction, Point, euclidean_distance, manhattan_distance
+from mathutils import Direction, Point, PointArray, euclidean_distance, manhattan_distance, manhattan_distances, nearest_manhattan_distances
 from helpers import utils
+from maze_distances import UNREACHABLE, get_maze_distances
+import math
+from typing import Dict, List, Sequence
 
 # This heuristic returns the distance between the player and the exit as an estimate for the path cost
 # While it is consistent, it does a bad job at estimating the actual cost thus the search will explore a lot of nodes before finding a goal
@@ -19,16 +22,101 @@ def strong_heuristic(problem: DungeonProblem, state: DungeonState) -> float:
         # Cache to store computed values for performance
     
 
-    if not state.remaining_coins: # If there's no coins left just return the manhattan distance to the exit 
-        # This condition is to avoid line 27,30 from throwing an error if state.remaining_coins is empty 
+    if state.coins == 0: # If there's no coins left just return the manhattan distance to the exit 
+        # This condition is to avoid the min below from throwing an error if there are no remaining coins
         return manhattan_distance(state.player, problem.layout.exit)
     
-    # Loop on all remaining coins to get the one with the min manhattan distance from the player
-    nearest_coin_distance = min(manhattan_distance(state.player, coin) for coin in state.remaining_coins) 
+    # Get the remaining coins and the min manhattan distance from the exit to one of them
+    # (they only depend on the remaining coins, so they are memoised in the problem's cache, see remaining_coin_points)
+    coin_points, exit_distance = remaining_coin_points(problem, state.coins)
     
-    # Loop on all remaining coins to get the one with the min manhattan distance from the exit
-    exit_distance = min(manhattan_distance(coin, problem.layout.exit) for coin in state.remaining_coins)
+    # Loop on all remaining coins to get the one with the min manhattan distance from the player
+    nearest_coin_distance = min(manhattan_distances(state.player, coin_points))
     
     # Set the heuristic value to be ( distance from the player to its nearest coin ) + ( distance from the exit to its nearest coin ) 
     return nearest_coin_distance  + exit_distance
-    
\ No newline at end of file
+
+# The batched version of strong_heuristic (see get_heuristic_batch in problem.py) which returns the same values for many states
+# The states are grouped by their remaining coins (the children of a node share them unless a child collects a coin),
+# then the distances from the players of a group to its coins are computed at once using the batched distances of mathutils.
+# The coins of every group and their distance to the exit are memoised in the problem's cache since many states share the same coins
+def strong_heuristic_batch(problem: DungeonProblem, states: Sequence[DungeonState]) -> List[float]:
+    layout = problem.layout
+    groups: Dict[int, List[int]] = {}
+    for index, state in enumerate(states):
+        groups.setdefault(state.coins, []).append(index)
+    values = [0] * len(states)
+    for coins, indices in groups.items():
+        players = PointArray(layout.points[states[index].cell] for index in indices)
+        if coins == 0:
+            distances = manhattan_distances(layout.exit, players)
+        else:
+            coin_points, exit_distance = remaining_coin_points(problem, coins)
+            distances = [distance + exit_distance for distance in nearest_manhattan_distances(players, coin_points)]
+        for index, distance in zip(indices, distances):
+            values[index] = distance
+    return values
+
+# The strong heuristic with its batched version attached, so A* calls the batched version once per expansion
+# It is opt-in since strong_heuristic shares the same coin memo, so the batch only saves the python calls per child
+# and the grouping costs more than that (see benchmark_heuristic_batch.py): A* is faster with strong_heuristic
+def batched_strong_heuristic(problem: DungeonProblem, state: DungeonState) -> float:
+    return strong_heuristic(problem, state)
+
+batched_strong_heuristic.batch = strong_heuristic_batch
+
+# Returns the remaining coins (as a bitmask) as a point array and the manhattan distance from the exit to the nearest one
+def remaining_coin_points(problem: DungeonProblem, coins: int):
+    memo = problem.cache().setdefault("remaining_coin_points", {})
+    result = memo.get(coins)
+    if result is None:
+        layout = problem.layout
+        coin_points = PointArray(layout.points[cell] for index, cell in enumerate(layout.coins) if coins >> index & 1)
+        result = memo[coins] = (coin_points, min(manhattan_distances(layout.exit, coin_points)))
+    return result
+    
+
+# This heuristic uses the true maze distances (around the walls) instead of the manhattan distance
+# The player must walk to one of the remaining coins, then visit the other coins and end at the exit
+# so the cost is at least (maze distance to the nearest coin) + (minimum spanning tree over the remaining coins and the exit)
+# since the path from the first coin to the exit is a tree that connects all the remaining coins and the exit
+# It is consistent: a move changes the distance to the nearest coin by at most 1, and collecting a coin
+# decreases the spanning tree cost by at most the distance from that coin to its nearest remaining coin
+def mst_heuristic(problem: DungeonProblem, state: DungeonState) -> float:
+    distances = get_maze_distances(problem)
+    if state.coins == 0: # If there's no coins left, the player only has to walk to the exit
+        distance = distances.exit_field[state.cell]
+        return math.inf if distance == UNREACHABLE else distance
+    tree_cost, coin_fields = coins_spanning_tree(problem, state.coins)
+    nearest_coin_distance = min(field[state.cell] for field in coin_fields)
+    if nearest_coin_distance == UNREACHABLE: return math.inf
+    return nearest_coin_distance + tree_cost
+
+# Returns the cost of the minimum spanning tree over the given coins (as a bitmask) and the exit using the maze distances,
+# and the distance fields of these coins. The results are memoised in the problem's cache since many states share the same coins
+def coins_spanning_tree(problem: DungeonProblem, coins: int):
+    memo = problem.cache().setdefault("coins_spanning_tree", {})
+    result = memo.get(coins)
+    if result is not None: return result
+    distances = get_maze_distances(problem)
+    layout = problem.layout
+    indices = [index for index in range(len(layout.coins)) if coins >> index & 1]
+    coin_fields = tuple(distances.coin_fields[index] for index in indices)
+    # Use Prim's algorithm starting from the exit (the graph is complete so this is O(n^2))
+    cells = [layout.coins[index] for index in indices]
+    fields = list(coin_fields)
+    best = [distances.exit_field[cell] for cell in cells] # The distance from every coin outside the tree to the tree
+    tree_cost = 0
+    while best:
+        nearest = min(range(len(best)), key=best.__getitem__)
+        if best[nearest] == UNREACHABLE:
+            tree_cost = math.inf
+            break
+        tree_cost += best[nearest]
+        field = fields[nearest]
+        for items in (best, cells, fields): # Remove the coin that joined the tree (by replacing it with the last coin)
+            items[nearest] = items[-1]
+            items.pop()
+        best = [min(distance, field[cell]) for distance, cell in zip(best, cells)]
+    result = memo[coins] = (tree_cost, coin_fields)
+    return result
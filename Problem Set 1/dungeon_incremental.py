@@ -0,0 +1,215 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq, math
+
+from agents import GoalBasedAgent
+from dungeon import DungeonLayout, DungeonProblem, DungeonState
+from mathutils import Direction
+from search_stats import NULL_STATS, SearchStats
+
+# This file contains an incremental replanning agent (D* Lite) for the dungeon problem
+# The search agents throw their policy away and search again from scratch whenever the world diverges from their plan.
+# Instead, D* Lite searches backward from the goal state (the exit with no remaining coins) and keeps its tables between calls:
+#   g[s]   = the cost from s to the goal found by the last expansion of s
+#   rhs[s] = the one-step lookahead cost: min over the successors s' of (1 + g[s'])
+# A state is consistent when g[s] == rhs[s]. When the layout changes, only the states next to the changed cells get a new rhs,
+# and only the inconsistent states (and whatever their costs affect) are expanded again to repair the search.
+# Moving the player changes the heuristic of every state, so instead of recomputing the queue keys,
+# the heuristic distance between the old and the new position is added to "km" (the key modifier) as described in:
+#   S. Koenig and M. Likhachev, "D* Lite", AAAI 2002
+# The states are stored as integers (coins * cell_count + cell, which is also the hash of DungeonState) so that they stay valid
+# after the layout is replaced by an edited one (DungeonState compares layouts by pointer)
+
+INF = math.inf
+
+class DStarLiteAgent(GoalBasedAgent[DungeonState, Direction]):
+    layout: Optional[DungeonLayout]
+    g: Dict[int, float]
+    rhs: Dict[int, float]
+
+    # If a SearchStats object is given, every expanded state (as its integer key) is recorded in it
+    def __init__(self, stats: Optional[SearchStats] = None) -> None:
+        super().__init__()
+        self.stats = stats
+        self.layout = None
+
+    # Forget everything and start a new search on the layout from the given state
+    def reset(self, layout: DungeonLayout, state: DungeonState) -> None:
+        self.layout = layout
+        self.cell_count = len(layout.points)
+        self.xs = [point.x for point in layout.points]
+        self.ys = [point.y for point in layout.points]
+        self.goal = layout.exit_cell # The goal state has no remaining coins so its key is the exit cell
+        self.start = self.last = state.coins * self.cell_count + state.cell
+        self.start_coins = state.coins
+        self.km = 0
+        self.g, self.rhs = {}, {self.goal: 0}
+        self.queue: List[Tuple[float, float, int]] = [] # A heap of (key, state) where some entries may be outdated
+        self.queued: Dict[int, Tuple[float, float]] = {} # The current key of every state in the queue
+        self.push(self.goal)
+
+    # The layout can be edited in place of the old one only if the coins and the exit stay the same (walls can be added or removed)
+    def is_compatible(self, layout: DungeonLayout) -> bool:
+        old = self.layout
+        return old is not None and (old.width, old.height, old.coins, old.exit_cell) == (layout.width, layout.height, layout.coins, layout.exit_cell)
+
+    # Tell the agent that the problem's layout was edited. The changed cells are the cells that became walls or became walkable
+    # (if they are not given, they are found by comparing the walkable positions of the old and the new layouts)
+    # Only the states that the agent already knows at these cells or next to them are updated, the rest is repaired by the next act
+    def notify_layout_change(self, problem: DungeonProblem, cells: Optional[Iterable[int]] = None) -> None:
+        layout = problem.layout
+        if not self.is_compatible(layout):
+            self.layout = None # The agent will start over on the next act
+            return
+        if cells is None:
+            cells = [layout.cell_of(point) for point in self.layout.walkable ^ layout.walkable]
+        changed = set(cells)
+        old_moves = self.layout.moves
+        self.layout = layout
+        # The successors change for the states at the changed cells and at their neighbours (in the old or the new layout)
+        affected: Set[int] = set()
+        for cell in changed:
+            affected.add(cell)
+            affected.update(neighbour for neighbour in old_moves[cell] if neighbour >= 0)
+            affected.update(neighbour for neighbour in layout.moves[cell] if neighbour >= 0)
+        cell_count = self.cell_count
+        states = {state for state in self.g.keys() | self.rhs.keys() if state % cell_count in affected}
+        # A cell that became walkable has no known states yet, so the states at the changed cells that can move
+        # into a known state are updated too (otherwise a new shortcut would never be found)
+        states.update([predecessor for state in states for predecessor in self.predecessors(state) if predecessor % cell_count in changed])
+        for state in states:
+            self.update_state(state)
+
+    def act(self, problem: DungeonProblem, state: DungeonState) -> Direction:
+        layout = problem.layout
+        if self.layout is None or not self.is_compatible(layout):
+            self.reset(layout, state)
+        elif layout is not self.layout:
+            self.notify_layout_change(problem)
+        start = state.coins * self.cell_count + state.cell
+        if start != self.start:
+            # The player moved, so the old keys are corrected by the heuristic distance between its old and new positions
+            self.km += self.heuristic(self.last, start)
+            self.start = self.last = start
+            self.start_coins = state.coins
+        self.compute_shortest_path()
+        if self.cost(start) == INF: return None
+        # Move to the successor with the least cost to the goal
+        moves, coin_bits = layout.moves[state.cell], layout.coin_bits
+        best_action, best_cost = None, INF
+        for action in layout.actions[state.cell]:
+            cell = moves[action]
+            cost = 1 + self.cost((state.coins & ~coin_bits[cell]) * self.cell_count + cell)
+            if cost < best_cost: best_action, best_cost = action, cost
+        return best_action
+
+    # Returns the cost from the state to the goal (or infinity if it is unknown or unreachable)
+    def cost(self, state: int) -> float:
+        return self.g.get(state, INF)
+
+    # A lower bound on the cost from the first state to the second state: the player has to walk from the first cell to the second one
+    # and pass by every coin that is collected on the way (the coins of the first state that the second state does not have).
+    # It is the largest manhattan distance from the first cell through one of these coins to the second cell,
+    # so it satisfies the triangle inequality (as D* Lite requires) and stays admissible when walls are added or removed
+    def heuristic(self, first: int, second: int) -> float:
+        cell_count, xs, ys = self.cell_count, self.xs, self.ys
+        first_cell, first_coins = first % cell_count, first // cell_count
+        second_cell, second_coins = second % cell_count, second // cell_count
+        if second_coins & ~first_coins: return INF # Collected coins never come back
+        x1, y1, x2, y2 = xs[first_cell], ys[first_cell], xs[second_cell], ys[second_cell]
+        bound = abs(x1 - x2) + abs(y1 - y2)
+        collected = first_coins & ~second_coins
+        for index, coin in enumerate(self.layout.coins):
+            if collected >> index & 1:
+                x, y = xs[coin], ys[coin]
+                detour = abs(x1 - x) + abs(y1 - y) + abs(x - x2) + abs(y - y2)
+                if detour > bound: bound = detour
+        return bound
+
+    def key(self, state: int) -> Tuple[float, float]:
+        cost = min(self.g.get(state, INF), self.rhs.get(state, INF))
+        return (cost + self.heuristic(self.start, state) + self.km, cost)
+
+    def push(self, state: int) -> None:
+        key = self.key(state)
+        self.queued[state] = key
+        heapq.heappush(self.queue, (key[0], key[1], state))
+
+    # Returns the smallest key in the queue (after dropping the outdated entries)
+    def top_key(self) -> Tuple[float, float]:
+        queue, queued = self.queue, self.queued
+        while queue:
+            first, second, state = queue[0]
+            if queued.get(state) == (first, second): return (first, second)
+            heapq.heappop(queue)
+        return (INF, INF)
+
+    # The successors of a state as (cell, coins) pairs. Moving into a cell collects its coin
+    def successors(self, state: int) -> Iterable[int]:
+        cell_count, coin_bits = self.cell_count, self.layout.coin_bits
+        cell, coins = state % cell_count, state // cell_count
+        return [(coins & ~coin_bits[neighbour]) * cell_count + neighbour for neighbour in self.layout.moves[cell] if neighbour >= 0]
+
+    # The predecessors of a state. If the cell has a coin, the player either collected it by moving in or it was already collected
+    # The predecessors that stand on an uncollected coin, or that have a coin which the player already collected, are never reached
+    def predecessors(self, state: int) -> Iterable[int]:
+        cell_count, coin_bits, start_coins = self.cell_count, self.layout.coin_bits, self.start_coins
+        cell, coins = state % cell_count, state // cell_count
+        options = (coins, coins | coin_bits[cell]) if coin_bits[cell] else (coins,)
+        predecessors = []
+        for neighbour in self.layout.moves[cell]:
+            if neighbour < 0: continue
+            for option in options:
+                if option & coin_bits[neighbour] or option & ~start_coins: continue
+                predecessors.append(option * cell_count + neighbour)
+        return predecessors
+
+    # Recompute the lookahead cost of the state and queue it if it is inconsistent
+    def update_state(self, state: int) -> None:
+        if state != self.goal:
+            g = self.g
+            self.rhs[state] = min((1 + g.get(successor, INF) for successor in self.successors(state)), default=INF)
+        self.queued.pop(state, None)
+        if self.g.get(state, INF) != self.rhs.get(state, INF): self.push(state)
+
+    # Expand the inconsistent states until the start state is consistent and no queued state can improve its cost
+    def compute_shortest_path(self) -> None:
+        stats = (self.stats or NULL_STATS).begin()
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        start = self.start
+        while self.top_key() < self.key(start) or rhs.get(start, INF) != g.get(start, INF):
+            old_key = self.top_key()
+            state = heapq.heappop(queue)[2]
+            del queued[state]
+            new_key = self.key(state)
+            if old_key < new_key:
+                # The key was computed before the player moved, so it is queued again with its current key
+                self.push(state)
+                continue
+            stats.expand(state, len(queue), len(g))
+            if g.get(state, INF) > rhs.get(state, INF):
+                # The state became cheaper (overconsistent), so its cost is final and its predecessors are updated
+                g[state] = rhs[state]
+                for predecessor in self.predecessors(state):
+                    self.update_state(predecessor)
+            else:
+                # The state became more expensive (underconsistent), so it is reset and updated with its predecessors
+                g[state] = INF
+                self.update_state(state)
+                for predecessor in self.predecessors(state):
+                    self.update_state(predecessor)
+        stats.end(None)
+
+# Returns a copy of the problem where the walkability of the given cells is toggled (walls become floors and floors become walls)
+# The player, the exit and the coins keep their cells so the agent can continue on the edited problem
+def toggle_cells(problem: DungeonProblem, state: DungeonState, cells: Iterable[int]) -> DungeonProblem:
+    layout = problem.layout
+    walkable = set(layout.walkable)
+    for cell in cells:
+        point = layout.points[cell]
+        if cell == state.cell or cell == layout.exit_cell or layout.coin_bits[cell]: continue
+        if point in walkable: walkable.remove(point)
+        else: walkable.add(point)
+    edited = DungeonProblem()
+    edited.layout = DungeonLayout.create(layout.width, layout.height, walkable, layout.exit, [layout.points[cell] for cell in layout.coins])
+    edited.initial_state = DungeonState(edited.layout, state.cell, state.coins)
+    return edited
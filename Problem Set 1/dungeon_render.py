@@ -0,0 +1,81 @@
+from typing import List, Optional, TextIO
+import os, sys
+
+from dungeon import DungeonTile
+from helpers.utils import bcolors
+
+# This file contains the helpers that print the dungeon on a terminal:
+#   colorize: adds the ANSI colour codes to a printed dungeon in a single pass over the text (using str.translate)
+#   TerminalDiffPrinter: draws the frames at the top of the terminal and only redraws the rows that changed since the last frame
+# The grid itself is printed by DungeonState.__str__ which copies the static part of the layout then writes the player and the coins
+
+# The colour of every tile
+TILE_COLORS = {
+    DungeonTile.COIN: bcolors.BRIGHT_GREEN,
+    DungeonTile.PLAYER: bcolors.YELLOW,
+    DungeonTile.WALL: bcolors.BRIGHT_BLACK,
+    DungeonTile.EMPTY: bcolors.BRIGHT_BLACK,
+    DungeonTile.EXIT: bcolors.BRIGHT_BLUE,
+}
+
+# The translation table that replaces every tile character with the coloured character
+COLOR_TABLE = str.maketrans({tile.value: f"{color}{tile.value}{bcolors.ENDC}" for tile, color in TILE_COLORS.items()})
+
+# Returns the text with every tile character coloured (the other characters are unchanged)
+def colorize(text: str) -> str:
+    return text.translate(COLOR_TABLE)
+
+# The ANSI codes used by the diff printer
+CLEAR_SCREEN = "\033[H\033[2J"
+CLEAR_LINE_END = "\033[K"
+CLEAR_SCREEN_END = "\033[J"
+
+# Returns the ANSI code that moves the cursor to the start of the row (the rows are numbered from 0)
+def move_to_row(row: int) -> str:
+    return f"\033[{row + 1};1H"
+
+# This printer keeps the frame at the top of the terminal: the first frame clears the screen and draws every row,
+# then every following frame only rewrites the rows that differ from the previous frame (the other rows stay on the screen).
+# A frame is a list of rows, so the lines printed with the dungeon (such as the step and the action) can be part of it.
+# These header rows come first and are never coloured (only the dungeon rows after them are).
+# After every frame, the cursor is left below the frame so that anything printed later appears under it,
+# and everything under the frame (such as the previous prompt of the human agent) is cleared by the next frame.
+# A frame that does not fit in the terminal (with a row left below it) cannot be positioned,
+# so it is printed normally and the next frame clears the screen.
+class TerminalDiffPrinter:
+    def __init__(self, colors: bool = False, stream: Optional[TextIO] = None) -> None:
+        self.colors = colors
+        self.stream = stream or sys.stdout
+        self.rows: List[str] = [] # The rows currently on the screen
+        self.redrawn_rows = 0 # The number of rows written so far (for statistics)
+
+    # Returns the number of rows of the terminal (or None if the stream is not a terminal)
+    def terminal_lines(self) -> Optional[int]:
+        try:
+            return os.get_terminal_size(self.stream.fileno()).lines
+        except (OSError, ValueError):
+            return None
+
+    # Returns the row as written to the terminal (the dungeon rows are coloured if requested)
+    def render(self, index: int, row: str, header: int) -> str:
+        return colorize(row) if self.colors and index >= header else row
+
+    # Draw the frame whose first "header" rows are not part of the dungeon
+    def show(self, rows: List[str], header: int = 0) -> None:
+        lines = self.terminal_lines()
+        if lines is not None and len(rows) >= lines:
+            self.stream.write(''.join(f"{self.render(index, row, header)}\n" for index, row in enumerate(rows)))
+            self.redrawn_rows += len(rows)
+            self.stream.flush()
+            self.rows = [] # The frame scrolled the screen, so the next frame starts from a cleared screen
+            return
+        output = [] if self.rows else [CLEAR_SCREEN]
+        for index, row in enumerate(rows):
+            if index < len(self.rows) and self.rows[index] == row: continue
+            output.append(f"{move_to_row(index)}{self.render(index, row, header)}{CLEAR_LINE_END}")
+            self.redrawn_rows += 1
+        # Clear everything below the new frame (the rows of a taller previous frame and anything printed after it)
+        output.append(f"{move_to_row(len(rows))}{CLEAR_SCREEN_END}")
+        self.stream.write(''.join(output))
+        self.stream.flush()
+        self.rows = list(rows)
@@ -0,0 +1,148 @@
+from array import array
+from typing import Optional, Sequence
+import hashlib, os
+
+from agents import GoalBasedAgent
+from array_file import load_arrays, save_arrays
+from dungeon import DungeonProblem, DungeonState
+from mathutils import Direction
+
+# This file contains a retrograde solver for the dungeon problem: it computes the optimal action for every state at once
+# A single backward breadth first search from the goal state (the exit with no remaining coins) visits every state
+# that can reach the goal, and stores its distance to the goal in a table with a byte per state.
+# The table is indexed by the state's key (coins * cell_count + cell, which is also the hash of DungeonState)
+# so the table covers every cell with every subset of the coins (2^coins * cells bytes).
+# To fit the distances in a byte, they are stored modulo 255 (the value 255 marks the states that cannot reach the goal).
+# This is enough to find the optimal action: a move changes the distance to the goal by at most 1
+# (after any move, the player can walk back then follow the old path since it can only have fewer coins to collect)
+# so the optimal action is the one whose successor has the stored value (distance - 1) modulo 255
+
+# The value of the states that cannot reach the goal
+UNKNOWN = 255
+# The maximum number of states in a table (the table of 2^26 states takes 64MB)
+MAX_STATES = 2**26
+# The format version written in the header of the table files (increase it when the format changes)
+FORMAT_VERSION = 1
+
+# Returns a string that identifies the dungeon layout (its walls, its coins and its exit) but not the player's position
+def layout_signature(problem: DungeonProblem) -> str:
+    layout = problem.layout
+    walkable = [cell for cell, point in enumerate(layout.points) if point in layout.walkable]
+    return hashlib.sha1(repr((layout.width, layout.height, walkable, layout.coins, layout.exit_cell)).encode()).hexdigest()
+
+# Returns the number of states in the retrograde table of the dungeon (every cell with every subset of the coins)
+def table_size(problem: DungeonProblem) -> int:
+    return (1 << len(problem.layout.coins)) * len(problem.layout.points)
+
+class RetrogradeTable:
+    signature: str
+    cell_count: int
+    table: Sequence[int] # The distance to the goal (modulo 255) of every state key, or UNKNOWN
+
+    def __init__(self, signature: str, cell_count: int, table: Sequence[int]) -> None:
+        self.signature = signature
+        self.cell_count = cell_count
+        self.table = table
+
+    # Compute the table using a backward breadth first search from the goal state
+    # The predecessors of a state are found by moving from a neighbouring cell: if the cell has a coin, the player
+    # either collected it by moving in (the coin is remaining before the move) or it was already collected
+    @staticmethod
+    def build(problem: DungeonProblem) -> 'RetrogradeTable':
+        layout = problem.layout
+        cell_count, coin_bits = len(layout.points), layout.coin_bits
+        size = table_size(problem)
+        if size > MAX_STATES:
+            raise ValueError(f"The retrograde table supports at most {MAX_STATES} states, this dungeon has {size}")
+        neighbours = [[neighbour for neighbour in moves if neighbour >= 0] for moves in layout.moves]
+        table = bytearray([UNKNOWN]) * size
+        table[layout.exit_cell] = 0 # The goal state has no remaining coins so its key is the exit cell
+        layer, distance = [layout.exit_cell], 0
+        while layer:
+            distance += 1
+            value = distance % 255
+            next_layer = []
+            for state in layer:
+                coins, cell = divmod(state, cell_count)
+                bit = coin_bits[cell]
+                options = (coins, coins | bit) if bit else (coins,)
+                for neighbour in neighbours[cell]:
+                    neighbour_bit = coin_bits[neighbour]
+                    for option in options:
+                        if option & neighbour_bit: continue # The player cannot stand on a remaining coin
+                        index = option * cell_count + neighbour
+                        if table[index] == UNKNOWN:
+                            table[index] = value
+                            next_layer.append(index)
+            layer = next_layer
+        return RetrogradeTable(layout_signature(problem), cell_count, table)
+
+    # Write the table to a file (a JSON header followed by the raw table, see array_file)
+    def save(self, path: str) -> None:
+        header = {"kind": "dungeon-retrograde", "version": FORMAT_VERSION, "signature": self.signature, "cells": self.cell_count}
+        save_arrays(path, header, {"table": array('B', self.table)})
+
+    # Read a table from a file. The table is memory-mapped (not read into memory)
+    @staticmethod
+    def load(path: str) -> 'RetrogradeTable':
+        header, arrays = load_arrays(path)
+        if header.get("kind") != "dungeon-retrograde" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a retrograde table (version {FORMAT_VERSION})")
+        return RetrogradeTable(header["signature"], header["cells"], arrays["table"])
+
+    # Returns whether the goal can be reached from the state
+    def is_solvable(self, state: DungeonState) -> bool:
+        return self.table[state.coins * self.cell_count + state.cell] != UNKNOWN
+
+    # Returns an optimal action from the state, or None if the goal cannot be reached (or the state is already the goal)
+    def best_action(self, problem: DungeonProblem, state: DungeonState) -> Optional[Direction]:
+        table, cell_count, layout = self.table, self.cell_count, problem.layout
+        value = table[state.coins * cell_count + state.cell]
+        if value == UNKNOWN: return None
+        expected = (value - 1) % 255
+        moves, coin_bits = layout.moves[state.cell], layout.coin_bits
+        for action in layout.actions[state.cell]:
+            cell = moves[action]
+            if table[(state.coins & ~coin_bits[cell]) * cell_count + cell] == expected: return action
+        return None
+
+    # Returns the distance from the state to the goal (or None if it cannot be reached)
+    # Since the table only stores the distances modulo 255, the optimal path is followed to count its length
+    def distance(self, problem: DungeonProblem, state: DungeonState) -> Optional[int]:
+        if not self.is_solvable(state): return None
+        distance = 0
+        while not (state.coins == 0 and state.cell == problem.layout.exit_cell):
+            state = problem.get_successor(state, self.best_action(problem, state))
+            distance += 1
+        return distance
+
+    # The size of the table in bytes
+    @property
+    def nbytes(self) -> int:
+        return len(self.table)
+
+# Returns the retrograde table of the problem (it is created once then cached in the problem's cache)
+# If a path is given, the table is loaded from it if it exists and matches the dungeon, otherwise it is built then saved to it
+def get_retrograde_table(problem: DungeonProblem, path: Optional[str] = None) -> RetrogradeTable:
+    cache = problem.cache()
+    table: Optional[RetrogradeTable] = cache.get("retrograde_table")
+    if table is None:
+        if path is not None and os.path.exists(path):
+            table = RetrogradeTable.load(path)
+            if table.signature != layout_signature(problem):
+                raise ValueError(f"The retrograde table '{path}' was built for a different dungeon")
+        else:
+            table = RetrogradeTable.build(problem)
+            if path is not None: table.save(path)
+        cache["retrograde_table"] = table
+    return table
+
+# This agent plays the optimal action of every state by looking it up in the retrograde table (so it never searches)
+# If a path is given, the table is kept in this file between runs (see get_retrograde_table)
+class RetrogradeAgent(GoalBasedAgent[DungeonState, Direction]):
+    def __init__(self, path: Optional[str] = None) -> None:
+        super().__init__()
+        self.path = path
+
+    def act(self, problem: DungeonProblem, state: DungeonState) -> Direction:
+        return get_retrograde_table(problem, self.path).best_action(problem, state)
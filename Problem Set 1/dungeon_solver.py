@@ -0,0 +1,102 @@
+from array import array
+from typing import List
+
+from dungeon import DungeonProblem, DungeonState
+from maze_distances import UNREACHABLE, get_maze_distances
+from mathutils import Direction
+from problem import Solution
+from search_stats import NULL_STATS, SearchStats
+
+# This file contains an exact solver for the dungeon problem using the Held-Karp dynamic programming algorithm
+# Collecting all the coins then reaching the exit is a shortest path that starts at the player, visits every coin
+# and ends at the exit, so instead of searching over (player position x remaining coins) states,
+# we solve it over the maze distances between the player, the coins and the exit:
+#   cost[mask][i] = the least cost to start at the player, collect the coins in "mask" and end at coin 'i'
+# The table has 2^n x n entries (where n is the number of remaining coins) so it is only practical for small n
+
+# The maximum number of remaining coins the solver accepts
+# The table for 16 coins has 2^16 x 16 entries (5 bytes each, about 5MB) and it takes a few seconds to fill in pure python
+# (every extra coin doubles the size and more than doubles the time)
+MAX_COINS = 16
+
+# Returns the optimal sequence of actions to collect the remaining coins then reach the exit from the given state
+# It can be used as the search function of an UninformedSearchAgent
+# If statistics are requested, every (mask, coin) entry of the table that is extended counts as an expanded node
+def HeldKarpSearch(problem: DungeonProblem, initial_state: DungeonState, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    layout = problem.layout
+    distances = get_maze_distances(problem)
+    indices = [index for index in range(len(layout.coins)) if initial_state.coins >> index & 1]
+    n = len(indices)
+    if n > MAX_COINS:
+        raise ValueError(f"The Held-Karp solver supports at most {MAX_COINS} remaining coins, got {n}")
+
+    fields = [distances.coin_fields[index] for index in indices]
+    start = [field[initial_state.cell] for field in fields] # The distance from the player to every coin
+    to_exit = [field[layout.exit_cell] for field in fields] # The distance from every coin to the exit
+    between = [[fields[j][layout.coins[i]] for j in range(n)] for i in indices] # The distance between every pair of coins
+
+    if n == 0:
+        if distances.exit_field[initial_state.cell] == UNREACHABLE: return stats.end(None)
+        return stats.end(walk(problem, initial_state.cell, distances.exit_field))
+
+    full = (1 << n) - 1
+    cost = array('i', [UNREACHABLE]) * ((full + 1) * n) # cost[mask * n + i] as defined above
+    previous = array('b', [-1]) * ((full + 1) * n)      # The coin collected before coin 'i' in the best path for "mask" (-1 for the player)
+    for j in range(n):
+        cost[(1 << j) * n + j] = start[j]
+
+    extended = 0
+    for mask in range(1, full + 1):
+        base = mask * n
+        for i in range(n):
+            if not mask >> i & 1: continue
+            current = cost[base + i]
+            if current >= UNREACHABLE: continue
+            extended += 1
+            row = between[i]
+            for j in range(n):
+                if mask >> j & 1 or row[j] >= UNREACHABLE: continue
+                index = (mask | (1 << j)) * n + j
+                if current + row[j] < cost[index]:
+                    cost[index] = current + row[j]
+                    previous[index] = i
+
+    if stats is not NULL_STATS: stats.expansions += extended
+
+    # Choose the last coin that gives the least total cost after walking to the exit
+    best_cost, last = UNREACHABLE, -1
+    for i in range(n):
+        if cost[full * n + i] >= UNREACHABLE or to_exit[i] >= UNREACHABLE: continue
+        if cost[full * n + i] + to_exit[i] < best_cost:
+            best_cost, last = cost[full * n + i] + to_exit[i], i
+    if last < 0: return stats.end(None) # Some coin or the exit cannot be reached
+
+    # Follow the previous coins back from the last coin to get the order in which the coins are collected
+    order, mask = [], full
+    while last >= 0:
+        order.append(last)
+        last, mask = previous[mask * n + last], mask & ~(1 << last)
+    order.reverse()
+
+    # Expand the order into actions by walking along the shortest paths between the consecutive targets
+    path, cell = [], initial_state.cell
+    for i in order:
+        path += walk(problem, cell, fields[i])
+        cell = layout.coins[indices[i]]
+    path += walk(problem, cell, distances.exit_field)
+    return stats.end(path)
+
+# Returns the actions of a shortest path from the cell to the source of the distance field
+# At every step, it takes the first action (in the order of get_actions) that decreases the distance by 1
+def walk(problem: DungeonProblem, cell: int, field: array) -> List[Direction]:
+    layout = problem.layout
+    actions = []
+    while field[cell] > 0:
+        for action in layout.actions[cell]:
+            neighbour = layout.moves[cell][action]
+            if field[neighbour] == field[cell] - 1:
+                actions.append(action)
+                cell = neighbour
+                break
+    return actions
@@ -0,0 +1,219 @@
+from collections import deque
+from typing import Dict, List, Set, Tuple
+import argparse, json, math, os, random
+
+# This file contains seeded generators of random instances for the 3 problems, in the same file formats as the shipped levels:
+#   Dungeons: mazes (carved by a randomized depth first search) where some walls are removed to create loops
+#   Parking lots: a random connected lot with N cars where the congestion is the fraction of the passages occupied by cars
+#   Routing graphs: random geometric graphs (every node is connected to its nearest nodes) or grids with missing roads
+# Every generator has a "solvable" option which guarantees that the goal can be reached from the initial state
+# The generators return the text (or the JSON object) of the level so they can also be used directly by the benchmarks
+
+Cell = Tuple[int, int]
+
+# Returns the cells connected to the start cell through the open cells
+def connected_cells(open_cells: Set[Cell], start: Cell) -> Set[Cell]:
+    reached, queue = {start}, deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for neighbour in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if neighbour in open_cells and neighbour not in reached:
+                reached.add(neighbour)
+                queue.append(neighbour)
+    return reached
+
+# Generate a dungeon maze of the given size with the given number of coins
+#   loops: the probability that a wall between 2 corridors of the maze is removed (0 gives a perfect maze where every path is unique)
+#   walls: the probability that a corridor cell is blocked after the maze is carved (which can split the maze)
+# If solvable is True, the player, the exit and the coins are placed in the same connected part of the maze
+def generate_dungeon(width: int, height: int, coins: int, rng: random.Random, loops: float = 0.1, walls: float = 0.0, solvable: bool = True) -> str:
+    # The maze cells are the cells with odd coordinates, and the cells between them are the walls that the carving can remove
+    cells = [(x, y) for y in range(1, height - 1, 2) for x in range(1, width - 1, 2)]
+    if not cells: raise ValueError(f"A {width}x{height} dungeon is too small for a maze")
+    open_cells = {cells[0]}
+    stack = [cells[0]]
+    while stack:
+        x, y = stack[-1]
+        neighbours = [(x + dx, y + dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                      if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and (x + dx, y + dy) not in open_cells]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(neighbours)
+        open_cells.add(((x + nx) // 2, (y + ny) // 2))
+        open_cells.add((nx, ny))
+        stack.append((nx, ny))
+    # Remove some of the walls between 2 corridors to create loops
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if (x, y) in open_cells or (x % 2) == (y % 2): continue
+            between = ((x-1, y), (x+1, y)) if x % 2 == 0 else ((x, y-1), (x, y+1))
+            if all(cell in open_cells for cell in between) and rng.random() < loops:
+                open_cells.add((x, y))
+    if walls > 0:
+        open_cells = {cell for cell in open_cells if rng.random() >= walls}
+    candidates = sorted(open_cells)
+    if solvable:
+        # Place everything in the largest connected part
+        parts, remaining = [], set(open_cells)
+        while remaining:
+            part = connected_cells(open_cells, min(remaining))
+            parts.append(part)
+            remaining -= part
+        candidates = sorted(max(parts, key=len))
+    if len(candidates) < coins + 2:
+        raise ValueError(f"The dungeon has {len(candidates)} usable cells which is not enough for {coins} coins, the player and the exit")
+    player, exit, *coin_cells = rng.sample(candidates, coins + 2)
+    grid = [['.' if (x, y) in open_cells else '#' for x in range(width)] for y in range(height)]
+    grid[player[1]][player[0]] = '@'
+    grid[exit[1]][exit[0]] = 'E'
+    for x, y in coin_cells: grid[y][x] = '$'
+    return '\n'.join(''.join(row) for row in grid)
+
+# Generate a parking lot with the given number of cars (at most 10 since the cars are the letters A to J)
+#   congestion: the fraction of the passage cells that are occupied by cars (the lot has N / congestion passage cells,
+#               but at least 2N + 1 since the cars cannot start on the slots and they need a free cell to move)
+# If solvable is True, the cars start on their slots then they make random moves (which are all reversible)
+# until no car is on a slot, so the cars can always go back. Otherwise, the cars are placed at random.
+def generate_parking(cars: int, congestion: float, rng: random.Random, solvable: bool = True, shuffle_moves: int = 0) -> str:
+    if not 1 <= cars <= 10: raise ValueError(f"A parking lot has 1 to 10 cars, got {cars}")
+    if not 0 < congestion <= 1: raise ValueError(f"The congestion must be in (0, 1], got {congestion}")
+    passages_count = max(math.ceil(cars / congestion), 2 * cars + 1)
+    side = math.ceil(math.sqrt(passages_count * 2)) + 2
+    shuffle_moves = shuffle_moves or 20 * cars
+    while True:
+        # Grow a connected lot from the center by opening random walls next to it
+        center = (side // 2, side // 2)
+        passages, frontier = {center}, []
+        def add_frontier(cell: Cell):
+            x, y = cell
+            frontier.extend(neighbour for neighbour in ((x+1, y), (x-1, y), (x, y+1), (x, y-1))
+                            if 0 < neighbour[0] < side - 1 and 0 < neighbour[1] < side - 1 and neighbour not in passages)
+        add_frontier(center)
+        while len(passages) < passages_count and frontier:
+            cell = frontier.pop(rng.randrange(len(frontier)))
+            if cell in passages: continue
+            passages.add(cell)
+            add_frontier(cell)
+        ordered = sorted(passages)
+        slots = rng.sample(ordered, cars)
+        if solvable:
+            positions = list(slots)
+            occupied = set(positions)
+            slot_set = set(slots)
+            for move in range(shuffle_moves * 10):
+                car = rng.randrange(cars)
+                x, y = positions[car]
+                target = rng.choice(((x+1, y), (x-1, y), (x, y+1), (x, y-1)))
+                if target in passages and target not in occupied:
+                    occupied.remove(positions[car])
+                    occupied.add(target)
+                    positions[car] = target
+                if move >= shuffle_moves and not occupied & slot_set: break
+            if occupied & slot_set: continue # Some car could not leave the slots, so try another lot
+        else:
+            positions = rng.sample([cell for cell in ordered if cell not in slots], cars)
+        grid = [['.' if (x, y) in passages else '#' for x in range(side)] for y in range(side)]
+        for index, (x, y) in enumerate(slots): grid[y][x] = str(index)
+        for index, (x, y) in enumerate(positions): grid[y][x] = chr(ord('A') + index)
+        return '\n'.join(''.join(row) for row in grid)
+
+# Generate a routing graph with the given number of nodes (as the JSON object of the graph files)
+#   kind: "geometric" places the nodes at random integer positions in a square and connects every node to its "degree" nearest nodes
+#         "grid" places the nodes on a square grid and connects every node to its 4 neighbours except for a fraction ("drop") of the roads
+# All the roads go both ways. If solvable is True, the goal is chosen among the nodes that can be reached from the start
+def generate_graph(nodes: int, rng: random.Random, kind: str = "geometric", degree: int = 3, drop: float = 0.1, solvable: bool = True) -> Dict:
+    positions: Dict[str, Tuple[int, int]] = {}
+    adjacency: Dict[str, Set[str]] = {}
+    if kind == "geometric":
+        size = math.ceil(math.sqrt(nodes)) * 10
+        points = rng.sample(range(size * size), nodes)
+        for index, point in enumerate(points):
+            positions[f"n{index}"] = (point % size, point // size)
+        # The nodes are put in buckets of 10x10 so that the nearest nodes are found by searching the rings of buckets around every node
+        buckets: Dict[Tuple[int, int], List[str]] = {}
+        for name, (x, y) in positions.items():
+            buckets.setdefault((x // 10, y // 10), []).append(name)
+        for name, (x, y) in positions.items():
+            bx, by, ring = x // 10, y // 10, 0
+            while True:
+                candidates = [other for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                              for other in buckets.get((bx + dx, by + dy), ()) if other != name]
+                distance = lambda other: (positions[other][0] - x) ** 2 + (positions[other][1] - y) ** 2
+                nearest = sorted(candidates, key=distance)[:degree]
+                # The nodes outside the rings are farther than ring * 10, so the nearest nodes are found if they are closer than that
+                if len(candidates) == nodes - 1 or (len(nearest) == degree and distance(nearest[-1]) <= (ring * 10) ** 2): break
+                ring += 1
+            for other in nearest:
+                adjacency.setdefault(name, set()).add(other)
+                adjacency.setdefault(other, set()).add(name)
+    elif kind == "grid":
+        side = math.ceil(math.sqrt(nodes))
+        for y in range(side):
+            for x in range(side):
+                positions[f"n{x}_{y}"] = (x, y)
+        for (x, y) in list(positions.values()):
+            for nx, ny in ((x+1, y), (x, y+1)):
+                if nx < side and ny < side and rng.random() >= drop:
+                    adjacency.setdefault(f"n{x}_{y}", set()).add(f"n{nx}_{ny}")
+                    adjacency.setdefault(f"n{nx}_{ny}", set()).add(f"n{x}_{y}")
+    else:
+        raise ValueError(f"Unknown graph kind '{kind}'")
+    names = list(positions)
+    start = rng.choice(names)
+    if solvable:
+        reached, queue = {start}, deque([start])
+        while queue:
+            for other in sorted(adjacency.get(queue.popleft(), ())):
+                if other not in reached:
+                    reached.add(other)
+                    queue.append(other)
+        candidates = sorted(reached - {start}) or [start]
+    else:
+        candidates = [name for name in names if name != start] or [start]
+    goal = rng.choice(candidates)
+    graph = {name: {"position": list(positions[name]), "adjacent": sorted(adjacency.get(name, ()))} for name in names}
+    return {"graph": graph, "start": start, "goal": goal}
+
+def main(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    for index in range(args.count):
+        path = args.output.format(index=index)
+        if args.problem == "dungeon":
+            content = generate_dungeon(args.width, args.height, args.coins, rng, args.loops, args.walls, not args.unsolvable)
+        elif args.problem == "parking":
+            content = generate_parking(args.cars, args.congestion, rng, not args.unsolvable, args.shuffle_moves)
+        else:
+            content = json.dumps(generate_graph(args.nodes, rng, args.kind, args.degree, args.drop, not args.unsolvable), indent=4)
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        print(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate random levels for the dungeon, parking and graph routing problems")
+    subparsers = parser.add_subparsers(dest="problem", required=True)
+    dungeon = subparsers.add_parser("dungeon", help="generate dungeon mazes")
+    dungeon.add_argument("--output", "-o", default="dungeons/generated{index}.txt", help="the path of every level ({index} is replaced by its index)")
+    dungeon.add_argument("--width", type=int, default=31, help="the width of the dungeons")
+    dungeon.add_argument("--height", type=int, default=15, help="the height of the dungeons")
+    dungeon.add_argument("--coins", type=int, default=6, help="the number of coins")
+    dungeon.add_argument("--loops", type=float, default=0.1, help="the probability that a wall between 2 corridors is removed")
+    dungeon.add_argument("--walls", type=float, default=0.0, help="the probability that a corridor cell is blocked")
+    parking = subparsers.add_parser("parking", help="generate parking lots")
+    parking.add_argument("--output", "-o", default="parks/generated{index}.txt", help="the path of every level ({index} is replaced by its index)")
+    parking.add_argument("--cars", type=int, default=4, help="the number of cars (1 to 10)")
+    parking.add_argument("--congestion", type=float, default=0.3, help="the fraction of the passage cells occupied by cars")
+    parking.add_argument("--shuffle-moves", type=int, default=0, help="the number of random moves from the goal (0 for 20 per car)")
+    graph = subparsers.add_parser("graph", help="generate routing graphs")
+    graph.add_argument("--output", "-o", default="graphs/graph_generated{index}.json", help="the path of every level ({index} is replaced by its index)")
+    graph.add_argument("--nodes", type=int, default=100, help="the number of nodes")
+    graph.add_argument("--kind", choices=["geometric", "grid"], default="geometric", help="the kind of graph")
+    graph.add_argument("--degree", type=int, default=3, help="the number of nearest nodes connected to every node (geometric graphs)")
+    graph.add_argument("--drop", type=float, default=0.1, help="the fraction of missing roads (grid graphs)")
+    for subparser in (dungeon, parking, graph):
+        subparser.add_argument("--count", "-n", type=int, default=1, help="the number of levels to generate")
+        subparser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+        subparser.add_argument("--unsolvable", action="store_true", default=False, help="do not guarantee that the levels are solvable")
+    main(parser.parse_args())
@@ -0,0 +1,261 @@
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+import heapq, math, os
+
+from array_file import load_arrays, save_arrays
+from graph import GraphRoutingProblem
+from graph_csr import CSRGraph, get_csr_graph
+from problem import Solution
+from search_stats import NULL_STATS, SearchStats
+
+# This file contains a contraction hierarchy (CH) for fast shortest path queries on static routing graphs
+# In the preprocessing, the nodes are contracted one by one in the order of their importance (their rank):
+# when a node is contracted, it is removed from the graph, and for every pair of its neighbours (u, x),
+# a shortcut edge u -> x is added if the path u -> node -> x is the only shortest path between them (checked by a witness search).
+# After the preprocessing, every shortest path can be found by a bidirectional Dijkstra that only follows edges
+# to nodes with higher ranks: forward from the start and backward from the goal, meeting at the highest ranked node on the path.
+# Every shortcut remembers the contracted node in its middle so the path can be unpacked into the original edges.
+# The upward edges are stored in 2 CSR graphs (with the same layout as CSRGraph):
+#   forward: for every node 'u', the edges u -> v where rank(v) > rank(u)
+#   backward: for every node 'v', the edges u -> v where rank(u) > rank(v) (stored reversed as v -> u)
+
+# The format version written in the header of the hierarchy files (increase it when the format changes)
+FORMAT_VERSION = 1
+# The maximum number of nodes settled by a witness search (a limited search may add unneeded shortcuts but never misses one)
+WITNESS_SETTLE_LIMIT = 64
+
+# The upward edges of a hierarchy in the CSR layout (middles[e] is the contracted node of a shortcut or -1 for an original edge)
+class UpwardGraph:
+    offsets: Sequence[int]
+    targets: Sequence[int]
+    weights: Sequence[float]
+    middles: Sequence[int]
+
+    def __init__(self, offsets, targets, weights, middles) -> None:
+        self.offsets, self.targets, self.weights, self.middles = offsets, targets, weights, middles
+
+    # Build the CSR arrays from the list of (target, weight, middle) edges of every node
+    @staticmethod
+    def from_lists(edges: List[List[Tuple[int, float, int]]]) -> 'UpwardGraph':
+        offsets, targets, weights, middles = array('q', [0]), array('i'), array('d'), array('i')
+        for node_edges in edges:
+            for target, weight, middle in node_edges:
+                targets.append(target)
+                weights.append(weight)
+                middles.append(middle)
+            offsets.append(len(targets))
+        return UpwardGraph(offsets, targets, weights, middles)
+
+    # Returns the middle node of the edge from node to target
+    def middle(self, node: int, target: int) -> int:
+        for edge in range(self.offsets[node], self.offsets[node + 1]):
+            if self.targets[edge] == target: return self.middles[edge]
+        raise KeyError(f"There is no edge from {node} to {target}")
+
+class ContractionHierarchy:
+    ranks: Sequence[int]    # The rank of every node (the order in which the nodes were contracted)
+    forward: UpwardGraph    # The edges from every node to the higher ranked nodes
+    backward: UpwardGraph   # The edges to every node from the higher ranked nodes (reversed)
+
+    def __init__(self, ranks: Sequence[int], forward: UpwardGraph, backward: UpwardGraph) -> None:
+        self.ranks = ranks
+        self.forward = forward
+        self.backward = backward
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.forward.targets) + len(self.backward.targets)
+
+    # Contract all the nodes of the graph
+    # The next node to contract is the one with the least edge difference (the number of shortcuts that its contraction adds
+    # minus the number of edges that it removes) plus the number of its contracted neighbours (which spreads the contractions over the graph)
+    # The priorities are updated lazily: a node is contracted only if its updated priority is still the least
+    @staticmethod
+    def build(graph: CSRGraph) -> 'ContractionHierarchy':
+        count = graph.node_count
+        # The edges of the remaining graph: outgoing[u][v] = incoming[v][u] = (weight, middle) (keeping the cheapest parallel edge)
+        outgoing: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(count)]
+        incoming: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(count)]
+        for source in range(count):
+            for edge in range(graph.offsets[source], graph.offsets[source + 1]):
+                target, weight = graph.targets[edge], graph.weights[edge]
+                if target == source: continue # A self loop is never on a shortest path
+                if target not in outgoing[source] or weight < outgoing[source][target][0]:
+                    outgoing[source][target] = incoming[target][source] = (weight, -1)
+        contracted_neighbours = [0] * count
+
+        # Returns the shortcuts (source, target, weight) needed to contract the node
+        def shortcuts(node: int) -> List[Tuple[int, int, float]]:
+            if not outgoing[node]: return []
+            longest_out = max(weight for weight, _ in outgoing[node].values())
+            needed = []
+            for source, (in_weight, _) in incoming[node].items():
+                distances = witness_search(outgoing, source, node, in_weight + longest_out)
+                for target, (out_weight, _) in outgoing[node].items():
+                    if target != source and distances.get(target, math.inf) > in_weight + out_weight:
+                        needed.append((source, target, in_weight + out_weight))
+            return needed
+
+        def priority(node: int, needed: List[Tuple[int, int, float]]) -> int:
+            return len(needed) - len(incoming[node]) - len(outgoing[node]) + contracted_neighbours[node]
+
+        queue = [(priority(node, shortcuts(node)), node) for node in range(count)]
+        heapq.heapify(queue)
+        ranks = array('i', [-1]) * count
+        forward_edges: List[List[Tuple[int, float, int]]] = [[] for _ in range(count)]
+        backward_edges: List[List[Tuple[int, float, int]]] = [[] for _ in range(count)]
+        rank = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if ranks[node] >= 0: continue # This node was already contracted
+            needed = shortcuts(node)
+            current = priority(node, needed)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, node)) # The priority increased, so another node may come first
+                continue
+            for source, target, weight in needed:
+                if target not in outgoing[source] or weight < outgoing[source][target][0]:
+                    outgoing[source][target] = incoming[target][source] = (weight, node)
+            # The remaining neighbours will be contracted later (so they will have higher ranks)
+            # so the remaining edges of the node are its upward edges
+            forward_edges[node] = [(target, weight, middle) for target, (weight, middle) in outgoing[node].items()]
+            backward_edges[node] = [(source, weight, middle) for source, (weight, middle) in incoming[node].items()]
+            for target in outgoing[node]:
+                del incoming[target][node]
+                contracted_neighbours[target] += 1
+            for source in incoming[node]:
+                del outgoing[source][node]
+                contracted_neighbours[source] += 1
+            outgoing[node], incoming[node] = {}, {}
+            ranks[node] = rank
+            rank += 1
+        return ContractionHierarchy(ranks, UpwardGraph.from_lists(forward_edges), UpwardGraph.from_lists(backward_edges))
+
+    # Write the hierarchy to a file (a JSON header followed by the raw arrays, see array_file)
+    def save(self, path: str) -> None:
+        header = {"kind": "contraction-hierarchy", "version": FORMAT_VERSION, "nodes": len(self.ranks)}
+        arrays = {"ranks": self.ranks}
+        for direction in ("forward", "backward"):
+            for name in ("offsets", "targets", "weights", "middles"):
+                arrays[f"{direction}_{name}"] = getattr(getattr(self, direction), name)
+        save_arrays(path, header, arrays)
+
+    # Read a hierarchy from a file. The arrays are memory-mapped (not read into memory)
+    @staticmethod
+    def load(path: str) -> 'ContractionHierarchy':
+        header, arrays = load_arrays(path)
+        if header.get("kind") != "contraction-hierarchy" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a contraction hierarchy file (version {FORMAT_VERSION})")
+        forward, backward = (UpwardGraph(*(arrays[f"{direction}_{name}"] for name in ("offsets", "targets", "weights", "middles")))
+                             for direction in ("forward", "backward"))
+        return ContractionHierarchy(arrays["ranks"], forward, backward)
+
+    # Returns the cost of the shortest path from the source to the target and the nodes it visits after the source
+    # (or infinity and None if there is no path), and the number of nodes settled by the bidirectional search
+    def query(self, source: int, target: int) -> Tuple[float, Optional[List[int]], int]:
+        graphs = (self.forward, self.backward)
+        distances: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0}, {target: 0})
+        parents: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        queues = ([(0.0, source)], [(0.0, target)])
+        best, meeting, settled = math.inf, -1, 0
+        while True:
+            # Continue the direction with the least key, and stop when no direction can find a better path
+            side = min((side for side in (0, 1) if queues[side] and queues[side][0][0] < best), key=lambda side: queues[side][0][0], default=None)
+            if side is None: break
+            distance, node = heapq.heappop(queues[side])
+            if distance > distances[side][node]: continue # This entry is outdated
+            settled += 1
+            other = distances[1 - side].get(node)
+            if other is not None and distance + other < best:
+                best, meeting = distance + other, node
+            graph = graphs[side]
+            for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+                neighbour, cost = graph.targets[edge], distance + graph.weights[edge]
+                if cost < distances[side].get(neighbour, math.inf):
+                    distances[side][neighbour] = cost
+                    parents[side][neighbour] = node
+                    heapq.heappush(queues[side], (cost, neighbour))
+        if meeting < 0: return math.inf, None, settled
+        # The upward path from the source to the meeting node, then the downward path to the target
+        nodes = [meeting]
+        while nodes[-1] != source: nodes.append(parents[0][nodes[-1]])
+        nodes.reverse()
+        while nodes[-1] != target: nodes.append(parents[1][nodes[-1]])
+        path = []
+        for start, end in zip(nodes, nodes[1:]):
+            self.unpack(start, end, path)
+        return best, path, settled
+
+    # Appends the original nodes (excluding the start) on the edge from start to end (which may be a shortcut) to the path
+    def unpack(self, start: int, end: int, path: List[int]) -> None:
+        stack = [(start, end)]
+        while stack:
+            start, end = stack.pop()
+            if self.ranks[start] < self.ranks[end]:
+                middle = self.forward.middle(start, end)
+            else:
+                middle = self.backward.middle(end, start)
+            if middle < 0:
+                path.append(end)
+            else:
+                # Unpack the first half before the second half
+                stack.append((middle, end))
+                stack.append((start, middle))
+
+# Limited Dijkstra from the source over the remaining graph that avoids the excluded node and stops after the limit
+# It returns the distances of the reached nodes
+def witness_search(outgoing: List[Dict[int, Tuple[float, int]]], source: int, excluded: int, limit: float) -> Dict[int, float]:
+    distances = {source: 0}
+    queue = [(0.0, source)]
+    settled = 0
+    while queue and settled < WITNESS_SETTLE_LIMIT:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]: continue # This entry is outdated
+        if distance > limit: break
+        settled += 1
+        for neighbour, (weight, _) in outgoing[node].items():
+            if neighbour == excluded: continue
+            cost = distance + weight
+            if cost < distances.get(neighbour, math.inf):
+                distances[neighbour] = cost
+                heapq.heappush(queue, (cost, neighbour))
+    return distances
+
+# Returns the contraction hierarchy of the problem's graph (it is created once then cached in the problem's cache)
+# If the path of the graph file is given, the hierarchy is stored in a file next to it: it is loaded from it
+# if it exists and is newer than the graph file, otherwise it is built then saved to it
+def get_contraction_hierarchy(problem: GraphRoutingProblem, graph_path: Optional[str] = None) -> ContractionHierarchy:
+    cache = problem.cache()
+    hierarchy: Optional[ContractionHierarchy] = cache.get("contraction_hierarchy")
+    if hierarchy is None:
+        graph, _ = get_csr_graph(problem)
+        path = None if graph_path is None else f"{graph_path}.ch"
+        if path is not None and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(graph_path):
+            hierarchy = ContractionHierarchy.load(path)
+        else:
+            hierarchy = ContractionHierarchy.build(graph)
+            if path is not None: hierarchy.save(path)
+        cache["contraction_hierarchy"] = hierarchy
+    return hierarchy
+
+# Returns the shortest path from the initial state to the problem's goal using the contraction hierarchy
+# It has the same signature and returns the same kind of path as UniformCostSearch (so the results can be cross-checked)
+# and it works for both GraphRoutingProblem and CSRGraphRoutingProblem
+# NOTE: only the path cost is guaranteed to match UniformCostSearch. When several shortest paths tie (as in grids),
+# the path can be a different one since the meeting node and the shortcuts do not follow the expansion order of UCS
+# If statistics are requested, every node settled by the bidirectional search counts as an expanded node
+def ContractionHierarchySearch(problem: GraphRoutingProblem, initial_state, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    hierarchy = get_contraction_hierarchy(problem)
+    _, node_id = get_csr_graph(problem)
+    _, nodes, settled = hierarchy.query(node_id(initial_state), node_id(problem.goal))
+    if stats is not NULL_STATS: stats.expansions += settled
+    if nodes is None: return stats.end(None)
+    # Convert every step to the cheapest action of the problem that leads to the next node
+    path, state = [], initial_state
+    for node in nodes:
+        action = min((action for action in problem.get_actions(state) if node_id(problem.get_successor(state, action)) == node),
+                     key=lambda action: problem.get_cost(state, action))
+        path.append(action)
+        state = problem.get_successor(state, action)
+    return stats.end(path)
@@ -0,0 +1,289 @@
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import csv, heapq, json, math, os
+
+from array_file import load_arrays, save_arrays
+from graph import GraphNode, GraphRoutingProblem
+from mathutils import Point
+
+# This file contains a compact graph backend for large routing graphs (such as road graphs with millions of nodes)
+# The graph is stored in the compressed sparse row (CSR) format where every node has an integer id:
+#   the outgoing edges of node 'i' are the edges offsets[i] to offsets[i+1]-1,
+#   and edge 'e' goes to the node targets[e] with the cost weights[e] (which is precomputed)
+# The coordinates of node 'i' are (xs[i], ys[i]) and its name is stored in a single utf-8 buffer
+# All of these are flat arrays, so the graph can be saved in a binary file and memory-mapped when loaded (see array_file)
+
+# The format version written in the header of the binary files (increase it when the format changes)
+# Version 2: the weights are computed with math.hypot (see distance)
+FORMAT_VERSION = 2
+
+class CSRGraph:
+    offsets: Sequence[int]      # The index of the first outgoing edge of every node (with a final entry for the edge count)
+    targets: Sequence[int]      # The node that every edge goes to
+    weights: Sequence[float]    # The cost of every edge
+    xs: Sequence[float]         # The x coordinate of every node
+    ys: Sequence[float]         # The y coordinate of every node
+    name_data: Sequence[int]    # The utf-8 bytes of all the node names
+    name_offsets: Sequence[int] # The index of the first byte of every node name (with a final entry for the total size)
+
+    def __init__(self, offsets, targets, weights, xs, ys, name_data, name_offsets) -> None:
+        self.offsets, self.targets, self.weights = offsets, targets, weights
+        self.xs, self.ys = xs, ys
+        self.name_data, self.name_offsets = name_data, name_offsets
+        self._ids: Optional[Dict[str, int]] = None
+
+    @property
+    def node_count(self) -> int:
+        return len(self.xs)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def name(self, node: int) -> str:
+        return bytes(self.name_data[self.name_offsets[node]:self.name_offsets[node+1]]).decode()
+
+    # Returns the id of the node with the given name (the name dictionary is only built on the first call)
+    def id_of(self, name: str) -> int:
+        if self._ids is None:
+            self._ids = {self.name(node): node for node in range(self.node_count)}
+        return self._ids[name]
+
+    # Converts a node id to a GraphNode (for display and for comparing with GraphRoutingProblem)
+    def node(self, node: int) -> GraphNode:
+        return GraphNode(self.name(node), Point(self.xs[node], self.ys[node]))
+
+    # Build the graph from the JSON format read by GraphRoutingProblem.from_file
+    # The edges of every node are sorted by the target name (as in GraphRoutingProblem) and weighted by the euclidean distance
+    @staticmethod
+    def from_json(path: str) -> 'CSRGraph':
+        with open(path, 'r') as f:
+            graph_def: Dict[str, Dict] = json.load(f).get("graph", {})
+        names = list(graph_def)
+        ids = {name: node for node, name in enumerate(names)}
+        xs, ys = array('d'), array('d')
+        for item in graph_def.values():
+            x, y = item.get("position", [0, 0])
+            xs.append(x)
+            ys.append(y)
+        offsets, targets = array('q', [0]), array('i')
+        for item in graph_def.values():
+            targets.extend(ids[adjacent] for adjacent in sorted(item.get("adjacent", [])) if adjacent in ids)
+            offsets.append(len(targets))
+        weights = array('d', (distance(xs[source], ys[source], xs[target], ys[target])
+                              for source in range(len(names)) for target in targets[offsets[source]:offsets[source+1]]))
+        return CSRGraph(offsets, targets, weights, xs, ys, *pack_names(names))
+
+    # Build the graph from the adjacency of a GraphRoutingProblem (the edges keep the order of get_actions)
+    # The node ids follow the order of the adjacency dictionary (which is the order of the nodes in the file)
+    @staticmethod
+    def from_problem(problem: GraphRoutingProblem) -> 'CSRGraph':
+        nodes = list(problem.adjacency)
+        ids = {node: index for index, node in enumerate(nodes)}
+        for adjacent in problem.adjacency.values():
+            for node in adjacent:
+                if node not in ids:
+                    ids[node] = len(nodes)
+                    nodes.append(node)
+        offsets, targets, weights = array('q', [0]), array('i'), array('d')
+        for node in nodes:
+            for action in problem.get_actions(node):
+                targets.append(ids[problem.get_successor(node, action)])
+                weights.append(problem.get_cost(node, action))
+            offsets.append(len(targets))
+        xs, ys = array('d', (node.position.x for node in nodes)), array('d', (node.position.y for node in nodes))
+        return CSRGraph(offsets, targets, weights, xs, ys, *pack_names(node.name for node in nodes))
+
+    # Returns the graph with every edge reversed (and the id of the original edge of every reversed edge)
+    # The reversed edges of every node are sorted by the id of their original edges
+    def reversed(self) -> Tuple['CSRGraph', array]:
+        offsets = array('q', [0]) * (self.node_count + 1)
+        for target in self.targets:
+            offsets[target + 1] += 1
+        for node in range(self.node_count):
+            offsets[node + 1] += offsets[node]
+        cursors = array('q', offsets[:-1])
+        targets, weights, edges = array('i', [0]) * self.edge_count, array('d', [0]) * self.edge_count, array('q', [0]) * self.edge_count
+        for source in range(self.node_count):
+            for edge in range(self.offsets[source], self.offsets[source + 1]):
+                reversed_edge = cursors[self.targets[edge]]
+                cursors[self.targets[edge]] += 1
+                targets[reversed_edge], weights[reversed_edge], edges[reversed_edge] = source, self.weights[edge], edge
+        return CSRGraph(offsets, targets, weights, self.xs, self.ys, self.name_data, self.name_offsets), edges
+
+    # Build the graph from 2 CSV files without loading them entirely into memory:
+    #   The nodes file contains a row per node: name, x, y
+    #   The edges file contains a row per edge: source name, target name and optionally the cost
+    # If an edge has no cost, it is the euclidean distance between its nodes. A header row is skipped if present.
+    # The edges file is read twice: once to count the outgoing edges of every node, then once to fill them in place,
+    # so the edges of every node keep the order in which they appear in the file
+    @staticmethod
+    def from_csv(nodes_path: str, edges_path: str) -> 'CSRGraph':
+        ids: Dict[str, int] = {}
+        names, xs, ys = [], array('d'), array('d')
+        for row in read_rows(nodes_path, numeric_columns=(1, 2)):
+            ids[row[0]] = len(names)
+            names.append(row[0])
+            xs.append(float(row[1]))
+            ys.append(float(row[2]))
+        counts = array('q', [0]) * (len(names) + 1)
+        # The edges file has no column that must be numeric, but a header row is skipped anyway since its names are not nodes
+        for row in read_rows(edges_path, numeric_columns=()):
+            if row[0] in ids and row[1] in ids: counts[ids[row[0]] + 1] += 1
+        offsets = counts
+        for node in range(len(names)):
+            offsets[node + 1] += offsets[node]
+        cursors = array('q', offsets[:-1])
+        targets = array('i', [0]) * offsets[-1]
+        weights = array('d', [0]) * offsets[-1]
+        for row in read_rows(edges_path, numeric_columns=()):
+            source, target = ids.get(row[0]), ids.get(row[1])
+            if source is None or target is None: continue
+            edge = cursors[source]
+            cursors[source] += 1
+            targets[edge] = target
+            weights[edge] = float(row[2]) if len(row) > 2 and row[2] else distance(xs[source], ys[source], xs[target], ys[target])
+        return CSRGraph(offsets, targets, weights, xs, ys, *pack_names(names))
+
+    # Write the graph to a binary file (a JSON header followed by the raw arrays, see array_file)
+    def save(self, path: str) -> None:
+        header = {"kind": "csr-graph", "version": FORMAT_VERSION, "nodes": self.node_count, "edges": self.edge_count}
+        save_arrays(path, header, {name: as_array(getattr(self, name), typecode) for name, typecode in ARRAY_TYPES.items()})
+
+    # Read a graph from a binary file. The arrays are memory-mapped (not read into memory)
+    @staticmethod
+    def load(path: str) -> 'CSRGraph':
+        header, arrays = load_arrays(path)
+        if header.get("kind") != "csr-graph" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a CSR graph file (version {FORMAT_VERSION})")
+        return CSRGraph(*(arrays[name] for name in ARRAY_TYPES))
+
+    # Read a graph from a JSON file (see from_json) or from CSV files (see from_csv), using a binary cache file next to the first file
+    # The cache is rebuilt if it is missing, older than the source files or written with another format version
+    @staticmethod
+    def open(path: str, edges_path: Optional[str] = None) -> 'CSRGraph':
+        cache_path = path + ".csr"
+        sources = [path] if edges_path is None else [path, edges_path]
+        if os.path.exists(cache_path) and all(os.path.getmtime(cache_path) >= os.path.getmtime(source) for source in sources):
+            try:
+                return CSRGraph.load(cache_path)
+            except ValueError: # The cache was written with another format version
+                pass
+        graph = CSRGraph.from_json(path) if edges_path is None else CSRGraph.from_csv(path, edges_path)
+        graph.save(cache_path)
+        return graph
+
+# The type of every array stored in the binary files (in the order of the constructor arguments)
+ARRAY_TYPES = {"offsets": 'q', "targets": 'i', "weights": 'd', "xs": 'd', "ys": 'd', "name_data": 'B', "name_offsets": 'q'}
+
+# Returns the data as an array of the given type (without copying it if it already is one)
+def as_array(data: Sequence, typecode: str) -> array:
+    return data if isinstance(data, array) and data.typecode == typecode else array(typecode, data)
+
+# The euclidean distance between 2 points (computed as in mathutils.euclidean_distance so that the costs are exactly the same)
+def distance(x1: float, y1: float, x2: float, y2: float) -> float:
+    return math.hypot(x1 - x2, y1 - y2)
+
+# Store the names in a single utf-8 buffer and returns it with the offset of every name
+def pack_names(names: Iterable[str]):
+    name_data, name_offsets = bytearray(), array('q', [0])
+    for name in names:
+        name_data += name.encode()
+        name_offsets.append(len(name_data))
+    return array('B', name_data), name_offsets
+
+# Yields the rows of a CSV file one at a time, skipping empty rows and the first row if it is a header
+# (the first row is considered a header if any of the numeric columns cannot be parsed as a number)
+def read_rows(path: str, numeric_columns: Sequence[int]) -> Iterable[List[str]]:
+    with open(path, 'r', newline='') as f:
+        for index, row in enumerate(csv.reader(f)):
+            if not row: continue
+            row = [column.strip() for column in row]
+            if index == 0 and is_header(row, numeric_columns): continue
+            yield row
+
+def is_header(row: List[str], numeric_columns: Sequence[int]) -> bool:
+    try:
+        for column in numeric_columns:
+            float(row[column])
+    except (ValueError, IndexError):
+        return True
+    return False
+
+# Compute the shortest path tree from the source node using Dijkstra's algorithm
+# It returns the distance to every node (infinity if unreachable) and the edge used to reach every node (-1 for the source and unreachable nodes)
+def shortest_path_tree(graph: CSRGraph, source: int) -> Tuple[array, array]:
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = array('d', [math.inf]) * graph.node_count
+    parents = array('q', [-1]) * graph.node_count
+    distances[source] = 0
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]: continue # This entry is outdated
+        for edge in range(offsets[node], offsets[node + 1]):
+            target, cost = targets[edge], distance + weights[edge]
+            if cost < distances[target]:
+                distances[target] = cost
+                parents[target] = edge
+                heapq.heappush(queue, (cost, target))
+    return distances, parents
+
+# Returns the CSR form of the problem's graph and a function that converts a state of the problem to its node id
+# For a CSRGraphRoutingProblem, it is the problem's own graph. Otherwise, the graph is converted once then cached in the problem's cache
+def get_csr_graph(problem: GraphRoutingProblem) -> Tuple[CSRGraph, Callable[[Any], int]]:
+    if isinstance(problem, CSRGraphRoutingProblem):
+        return problem.graph, int
+    cache = problem.cache()
+    result = cache.get("csr_graph")
+    if result is None:
+        graph = CSRGraph.from_problem(problem)
+        ids = {graph.node(node): node for node in range(graph.node_count)}
+        result = cache["csr_graph"] = (graph, ids.__getitem__)
+    return result
+
+# This is the graph routing problem running on a CSR graph
+# The states are node ids and the actions are edge ids (so the successor and the cost of an action are array lookups)
+# The search functions work on it without any change, and the path can be converted to GraphNodes using "path_nodes"
+# Unlike GraphRoutingProblem, the goal test calls are not recorded (since recording them does not scale to large graphs)
+class CSRGraphRoutingProblem(GraphRoutingProblem):
+    def __init__(self, graph: CSRGraph, start: int, goal: int) -> None:
+        super().__init__(start, goal, None)
+        self.graph = graph
+
+    # Create a problem on the graph where the start and the goal are given by their names
+    @staticmethod
+    def from_names(graph: CSRGraph, start: str, goal: str) -> 'CSRGraphRoutingProblem':
+        return CSRGraphRoutingProblem(graph, graph.id_of(start), graph.id_of(goal))
+
+    # Read a graph routing problem from a JSON file (the same format as GraphRoutingProblem.from_file)
+    @staticmethod
+    def from_file(path: str) -> 'CSRGraphRoutingProblem':
+        with open(path, 'r') as f:
+            problem_def: Dict[str, Dict] = json.load(f)
+        return CSRGraphRoutingProblem.from_names(CSRGraph.open(path), problem_def.get("start", ""), problem_def.get("goal", ""))
+
+    def get_initial_state(self) -> int:
+        return self.start
+
+    def is_goal(self, state: int) -> bool:
+        return state == self.goal
+
+    # The actions are the ids of the outgoing edges of the node
+    def get_actions(self, state: int) -> Iterable[int]:
+        return range(self.graph.offsets[state], self.graph.offsets[state + 1])
+
+    def get_successor(self, state: int, action: int) -> int:
+        return self.graph.targets[action]
+
+    def get_cost(self, state: int, action: int) -> float:
+        return self.graph.weights[action]
+
+    # Converts a path (a list of edge ids) to the list of nodes it visits (excluding the start as in GraphRoutingProblem)
+    def path_nodes(self, path: List[int]) -> List[GraphNode]:
+        return [self.graph.node(self.graph.targets[edge]) for edge in path]
+
+# The euclidean distance between the node and the goal (it is admissible if no edge is cheaper than the distance between its nodes)
+def csr_graphrouting_heuristic(problem: CSRGraphRoutingProblem, state: int) -> float:
+    graph = problem.graph
+    return distance(graph.xs[state], graph.ys[state], graph.xs[problem.goal], graph.ys[problem.goal])
@@ -0,0 +1,115 @@
+from array import array
+from typing import List, Optional, Sequence
+import math, os
+
+from array_file import load_arrays, save_arrays
+from graph import GraphRoutingProblem
+from graph_csr import CSRGraph, distance, get_csr_graph, shortest_path_tree
+
+# This file contains the ALT heuristic (A*, Landmarks and the Triangle inequality) for the graph routing problem
+# A few nodes are chosen as landmarks and the distances from every landmark to every node (forward)
+# and from every node to every landmark (backward) are precomputed once per graph using Dijkstra's algorithm.
+# Then, for any node 'v', goal 't' and landmark 'L', the triangle inequality gives 2 lower bounds for the distance d(v, t):
+#   d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+# The heuristic is the maximum of these bounds over all the landmarks and the euclidean distance (which is also a lower bound).
+# Every bound is consistent, so their maximum is consistent too.
+# Good landmarks lie "behind" the nodes relative to the goal, so they are chosen to be far from each other (farthest-point selection)
+
+# The format version written in the header of the landmark files (increase it when the format changes)
+FORMAT_VERSION = 1
+
+class Landmarks:
+    nodes: List[int]                # The node id of every landmark
+    forward: List[Sequence[float]]  # forward[i][v] is the distance from landmark 'i' to node 'v' (infinity if unreachable)
+    backward: List[Sequence[float]] # backward[i][v] is the distance from node 'v' to landmark 'i' (infinity if unreachable)
+
+    def __init__(self, nodes: List[int], forward: List[Sequence[float]], backward: List[Sequence[float]]) -> None:
+        self.nodes = nodes
+        self.forward = forward
+        self.backward = backward
+
+    # Choose the landmarks using the farthest-point selection then compute their distance tables
+    # The first landmark is the farthest node from the first node, and every next landmark is the node
+    # whose distance to its nearest landmark is the largest (ignoring the nodes that the landmarks cannot reach)
+    @staticmethod
+    def build(graph: CSRGraph, count: int = 8) -> 'Landmarks':
+        reversed_graph, _ = graph.reversed()
+        nodes, forward, backward = [], [], []
+        nearest, _ = shortest_path_tree(graph, 0) # The distance from the nearest landmark (the first node until a landmark is chosen)
+        while len(nodes) < min(count, graph.node_count):
+            candidates = [node for node in range(graph.node_count) if nearest[node] < math.inf and node not in nodes]
+            if not candidates: break
+            landmark = max(candidates, key=nearest.__getitem__)
+            distances, _ = shortest_path_tree(graph, landmark)
+            nodes.append(landmark)
+            forward.append(distances)
+            backward.append(shortest_path_tree(reversed_graph, landmark)[0])
+            nearest = distances if len(nodes) == 1 else array('d', map(min, nearest, distances))
+        return Landmarks(nodes, forward, backward)
+
+    # Write the landmark tables to a file (a JSON header followed by the raw tables, see array_file)
+    def save(self, path: str) -> None:
+        header = {"kind": "alt-landmarks", "version": FORMAT_VERSION, "nodes": self.nodes}
+        tables = {}
+        for index in range(len(self.nodes)):
+            tables[f"forward{index}"] = self.forward[index]
+            tables[f"backward{index}"] = self.backward[index]
+        save_arrays(path, header, tables)
+
+    # Read the landmark tables from a file. The tables are memory-mapped (not read into memory)
+    @staticmethod
+    def load(path: str) -> 'Landmarks':
+        header, tables = load_arrays(path)
+        if header.get("kind") != "alt-landmarks" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a landmark file (version {FORMAT_VERSION})")
+        count = len(header["nodes"])
+        return Landmarks(header["nodes"], [tables[f"forward{index}"] for index in range(count)], [tables[f"backward{index}"] for index in range(count)])
+
+    # Returns the largest triangle-inequality lower bound for the distance from node to the goal
+    def lower_bound(self, node: int, goal: int) -> float:
+        bound = 0
+        for forward, backward in zip(self.forward, self.backward):
+            to_goal, to_node = forward[goal], forward[node]
+            if to_goal < math.inf and to_node < math.inf and to_goal - to_node > bound: bound = to_goal - to_node
+            from_node, from_goal = backward[node], backward[goal]
+            if from_node < math.inf and from_goal < math.inf and from_node - from_goal > bound: bound = from_node - from_goal
+            # If the landmark can reach the node but not the goal, or the goal can reach the landmark but the node cannot,
+            # then the node cannot reach the goal
+            if to_node < math.inf and to_goal == math.inf: return math.inf
+            if from_goal < math.inf and from_node == math.inf: return math.inf
+        return bound
+
+# Returns the path of the landmark file for the graph file with the given number of landmarks
+def landmarks_path(graph_path: str, count: int) -> str:
+    return f"{graph_path}.alt{count}"
+
+# The number of landmarks used if none was requested
+DEFAULT_LANDMARKS = 8
+
+# Returns the landmarks of the problem's graph (they are created once for every count then cached in the problem's cache)
+# If the path of the graph file is given, the landmarks are stored in a file next to it: they are loaded from it
+# if it exists and is newer than the graph file, otherwise they are built then saved to it
+# If no count is given, the count of the last call is used (so the heuristic uses the landmarks loaded before the search)
+def get_landmarks(problem: GraphRoutingProblem, graph_path: Optional[str] = None, count: Optional[int] = None) -> Landmarks:
+    cache = problem.cache()
+    if count is None: count = cache.get("landmarks_count", DEFAULT_LANDMARKS)
+    landmarks: Optional[Landmarks] = cache.get(f"landmarks{count}")
+    if landmarks is None:
+        graph, _ = get_csr_graph(problem)
+        path = None if graph_path is None else landmarks_path(graph_path, count)
+        if path is not None and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(graph_path):
+            landmarks = Landmarks.load(path)
+        else:
+            landmarks = Landmarks.build(graph, count)
+            if path is not None: landmarks.save(path)
+        cache[f"landmarks{count}"] = landmarks
+    cache["landmarks_count"] = count
+    return landmarks
+
+# The ALT heuristic for both GraphRoutingProblem and CSRGraphRoutingProblem
+# To use a landmark file, call get_landmarks with the graph file path before the search
+def alt_heuristic(problem: GraphRoutingProblem, state) -> float:
+    graph, node_id = get_csr_graph(problem)
+    node, goal = node_id(state), node_id(problem.goal)
+    euclidean = distance(graph.xs[node], graph.ys[node], graph.xs[goal], graph.ys[goal])
+    return max(euclidean, get_landmarks(problem).lower_bound(node, goal))
@@ -1,11 +1,15 @@
 from problem import A, S, Problem
 from .utils import add_call_listener
+import random
 
 class InconsistentHeuristicException(Exception):
     pass
 
-def test_heuristic_consistency(heuristic):
+# If a sample rate is given, only this fraction of the transitions (chosen at random) is checked
+def test_heuristic_consistency(heuristic, sample_rate: float = 1.0, seed = None):
+    sample = random.Random(seed).random
     def listener(next_state: S, problem: Problem[S, A], state: S, action: A):
+        if sample_rate < 1 and sample() >= sample_rate: return
         h = heuristic(problem, state)
         next_h = heuristic(problem, next_state)
         c = problem.get_cost(state, action)
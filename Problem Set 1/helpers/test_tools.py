@@ -1,12 +1,12 @@
 from typing import List, Optional, Set, Tuple
-from agents import HeuristicFunction
+from agents import GoalBasedAgent, HeuristicFunction
 from graph import GraphRoutingProblem, graphrouting_heuristic
 from dungeon import DungeonProblem, Direction
-from problem import A, S, Problem
+from problem import A, S, Problem, get_heuristic_batch
 from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
 from .heuristic_checks import InconsistentHeuristicException, test_heuristic_consistency
 from functools import lru_cache
-import time
+import math, os, random, tempfile, time
 
 def run_parking_trajectory(
     problem: Problem[S, A],
@@ -164,4 +164,260 @@ def compare_heuristic_for_dungeon(
         for i, (u, l) in enumerate(zip(thresholds[:-1], thresholds[1:])):
             message += '\n' + f'grade = {i+1} if {u} >= nodes > {l}'
         message += '\n' + f'grade = {len(thresholds)} if {thresholds[-1]} >= nodes'
-    return Result(grade != 0, grade, message)
\ No newline at end of file
+    return Result(grade != 0, grade, message)
+
+# Follows the path from the initial state and returns the last state and the total cost of the path
+def follow_path(
+    problem: Problem[S, A],
+    initial_state: S,
+    path: List[A]) -> Tuple[S, float]:
+    state, total_cost = initial_state, 0
+    for action in path:
+        total_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return state, total_cost
+
+# Runs the search function (with the heuristic if given) and returns the cost and the length of the path
+# and whether it ends at a goal (the cost and the length are None if no path is found)
+def run_search_for_path_cost(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic: Optional[HeuristicFunction] = None,
+    **kwargs) -> Tuple[Optional[float], Optional[int], bool]:
+    search_fn = load_function(function_path)
+    initial_state = problem.get_initial_state()
+    if heuristic is None:
+        path = search_fn(problem, initial_state, **kwargs)
+    else:
+        path = search_fn(problem, initial_state, heuristic, **kwargs)
+    if path is None:
+        return None, None, False
+    state, path_cost = follow_path(problem, initial_state, path)
+    return path_cost, len(path), problem.is_goal(state)
+
+# Runs the informed search function while checking the consistency of the heuristic on every transition
+# and returns the same results as run_search_for_path_cost
+def run_informed_search_with_consistency_checks(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic: HeuristicFunction) -> Tuple[Optional[float], Optional[int], bool]:
+    problem_type = type(problem)
+    original_get_successor = problem_type.get_successor
+    problem_type.get_successor = test_heuristic_consistency(heuristic)(original_get_successor)
+    try:
+        path = load_function(function_path)(problem, problem.get_initial_state(), heuristic)
+    finally:
+        problem_type.get_successor = original_get_successor
+    if path is None:
+        return None, None, False
+    state, path_cost = follow_path(problem, problem.get_initial_state(), path)
+    return path_cost, len(path), problem.is_goal(state)
+
+# Runs the search function (with the heuristic if given) and returns the name of the exception it raised (or None)
+def run_search_for_exception(
+    function_path: str,
+    problem: Problem[S, A],
+    heuristic: Optional[HeuristicFunction] = None,
+    **kwargs) -> Optional[str]:
+    search_fn = load_function(function_path)
+    initial_state = problem.get_initial_state()
+    try:
+        if heuristic is None:
+            search_fn(problem, initial_state, **kwargs)
+        else:
+            search_fn(problem, initial_state, heuristic, **kwargs)
+    except Exception as err:
+        return type(err).__name__
+    return None
+
+def compare_path_cost(
+    output: Tuple[Optional[float], Optional[int], bool],
+    expected_path_cost: Optional[float],
+    level_path: str) -> Result:
+    path_cost, path_length, is_goal = output
+    nl = '\n'
+    level = open(level_path, 'r').read()
+    if path_cost is not None and not is_goal:
+        return Result(False, 0, f"Level:{nl}{level}{nl}The path does not end at a goal")
+    if path_cost is None or expected_path_cost is None:
+        success = path_cost == expected_path_cost
+    else:
+        success = math.isclose(path_cost, expected_path_cost)
+    if success:
+        return Result(True, 1, "No solution" if path_cost is None else f"Path cost: {path_cost} ({path_length} steps)")
+    cost_to_str = lambda cost: "No solution" if cost is None else str(cost)
+    return Result(False, 0, f"Level:{nl}{level}{nl}Expected path cost: {cost_to_str(expected_path_cost)}{nl}Got: {cost_to_str(path_cost)}")
+
+def compare_path_length(
+    output: Tuple[Optional[float], Optional[int], bool],
+    expected_path_length: Optional[int],
+    level_path: str) -> Result:
+    path_cost, path_length, is_goal = output
+    nl = '\n'
+    level = open(level_path, 'r').read()
+    if path_length is not None and not is_goal:
+        return Result(False, 0, f"Level:{nl}{level}{nl}The path does not end at a goal")
+    if path_length == expected_path_length:
+        return Result(True, 1, "No solution" if path_length is None else f"Path length: {path_length} steps")
+    length_to_str = lambda length: "No solution" if length is None else f"{length} steps"
+    return Result(False, 0, f"Level:{nl}{level}{nl}Expected path length: {length_to_str(expected_path_length)}{nl}Got: {length_to_str(path_length)}")
+
+# Routes between every pair of nodes of the graph with the search function (with the heuristic if given)
+# on a GraphRoutingProblem, or on a CSRGraphRoutingProblem if "csr" is true, and returns the pairs where the path
+# is not made of edges of the graph or where its cost differs from the cost found by the uniform cost search on the GraphRoutingProblem
+# (the paths themselves are not compared since the searches may choose different paths among the shortest ones)
+def run_routing_for_all_pairs(
+    function_path: str,
+    graph_path: str,
+    heuristic: Optional[HeuristicFunction] = None,
+    csr: bool = False) -> List[Tuple[str, str, Optional[float], Optional[float]]]:
+    from graph_csr import CSRGraph, CSRGraphRoutingProblem
+    search_fn = load_function(function_path)
+    uniform_cost_search = load_function("search.UniformCostSearch")
+    problem = GraphRoutingProblem.from_file(graph_path)
+    graph = CSRGraph.from_json(graph_path) if csr else None
+    # The cost of the path (NaN if it does not end at the goal or if one of its actions is not an edge of the graph)
+    def path_cost(problem: Problem[S, A], path: Optional[List[A]]) -> Optional[float]:
+        if path is None: return None
+        state, cost = problem.get_initial_state(), 0
+        for action in path:
+            if action not in problem.get_actions(state): return math.nan
+            cost += problem.get_cost(state, action)
+            state = problem.get_successor(state, action)
+        return cost if problem.is_goal(state) else math.nan
+    mismatches = []
+    for start in problem.adjacency:
+        for goal in problem.adjacency:
+            problem.start, problem.goal = start, goal
+            expected = path_cost(problem, uniform_cost_search(problem, start))
+            routed = problem if graph is None else CSRGraphRoutingProblem.from_names(graph, start.name, goal.name)
+            initial_state = routed.get_initial_state()
+            if heuristic is None:
+                path = search_fn(routed, initial_state)
+            else:
+                path = search_fn(routed, initial_state, heuristic)
+            cost = path_cost(routed, path)
+            if (cost is None or expected is None) and cost != expected or \
+                cost is not None and expected is not None and not math.isclose(cost, expected):
+                mismatches.append((start.name, goal.name, expected, cost))
+    fetch_recorded_calls(GraphRoutingProblem.is_goal)
+    return mismatches
+
+def compare_routing_mismatches(
+    output: List[Tuple[str, str, Optional[float], Optional[float]]],
+    fig_path: Optional[str] = None) -> Result:
+    if not output:
+        return Result(True, 1, "")
+    nl = '\n'
+    cost_to_str = lambda cost: "No solution" if cost is None else "Invalid path" if math.isnan(cost) else str(cost)
+    mismatches = nl.join(f"- From {start} to {goal}: Expected {cost_to_str(expected)}, Got {cost_to_str(cost)}"
+                         for start, goal, expected, cost in output)
+    fig = "" if fig_path is None else f"Graph:{nl}{open(fig_path, 'r').read()}{nl}"
+    return Result(False, 0, f"{fig}The path costs differ from the uniform cost search:{nl}{mismatches}")
+
+# Plays the agent from the initial state of the dungeon until it reaches the goal or returns None (no solution)
+# If cells are given as (x, y) positions, the agent acts once on the dungeon, then the walkability of the cells is toggled
+# (see toggle_cells in dungeon_incremental) before the agent starts walking, so it has to repair its plan on the edited dungeon
+# Returns the same results as run_search_for_path_cost (where the path is the sequence of actions played by the agent)
+def run_agent_for_dungeon(
+    agent: GoalBasedAgent,
+    problem: DungeonProblem,
+    edited_cells: Optional[List[Tuple[int, int]]] = None,
+    max_steps: int = 10000) -> Tuple[Optional[float], Optional[int], bool]:
+    from dungeon_incremental import toggle_cells
+    state = problem.get_initial_state()
+    if edited_cells:
+        agent.act(problem, state)
+        width = problem.layout.width
+        problem = toggle_cells(problem, state, [y * width + x for x, y in edited_cells])
+        state = problem.get_initial_state()
+    path_cost, path_length = 0, 0
+    while not problem.is_goal(state) and path_length < max_steps:
+        action = agent.act(problem, state)
+        if action is None:
+            return None, None, False
+        path_cost += problem.get_cost(state, action)
+        path_length += 1
+        state = problem.get_successor(state, action)
+    return path_cost, path_length, problem.is_goal(state)
+
+# Compares the distance stored in the retrograde table with the uniform cost search from every state reachable from the initial state
+# and returns the states where they differ with the table's distance and the search's path cost
+def run_retrograde_distances(
+    problem: DungeonProblem) -> List[Tuple[str, Optional[int], Optional[float]]]:
+    from dungeon_retrograde import get_retrograde_table
+    uniform_cost_search = load_function("search.UniformCostSearch")
+    table = get_retrograde_table(problem)
+    initial_state = problem.get_initial_state()
+    reached, frontier = {initial_state}, [initial_state]
+    while frontier:
+        state = frontier.pop()
+        for action in problem.get_actions(state):
+            successor = problem.get_successor(state, action)
+            if successor not in reached:
+                reached.add(successor)
+                frontier.append(successor)
+    mismatches = []
+    for state in reached:
+        path = uniform_cost_search(problem, state)
+        expected = None if path is None else follow_path(problem, state, path)[1]
+        distance = table.distance(problem, state)
+        if distance != expected:
+            mismatches.append((str(state), distance, expected))
+    return mismatches
+
+def compare_retrograde_distances(
+    output: List[Tuple[str, Optional[int], Optional[float]]],
+    level_path: str) -> Result:
+    if not output:
+        return Result(True, 1, "")
+    nl = '\n'
+    state, distance, expected = output[0]
+    to_str = lambda cost: "No solution" if cost is None else str(cost)
+    level = open(level_path, 'r').read()
+    return Result(False, 0, f"Level:{nl}{level}{nl}The table differs from the uniform cost search at {len(output)} states, for example:{nl}"
+                            f"{state}{nl}Expected distance: {to_str(expected)}{nl}Got: {to_str(distance)}")
+
+# Samples states with random walks from the initial state, then evaluates the children of every sampled state
+# with the batched version of the heuristic (see get_heuristic_batch) and with the heuristic itself
+# Returns the number of children where the two values differ
+def run_heuristic_batch(
+    problem: Problem[S, A],
+    heuristic: HeuristicFunction,
+    samples: int = 200,
+    walk_length: int = 100,
+    seed: int = 0) -> int:
+    heuristic_batch = get_heuristic_batch(heuristic)
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(samples):
+        state = problem.get_initial_state()
+        for _ in range(rng.randint(0, walk_length)):
+            state = problem.get_successor(state, rng.choice(list(problem.get_actions(state))))
+        children = [problem.get_successor(state, action) for action in problem.get_actions(state)]
+        values = heuristic_batch(problem, children)
+        mismatches += sum(value != heuristic(problem, child) for value, child in zip(values, children))
+    return mismatches
+
+# Runs the operations of every run on a policy store opened under the run's namespace (from the same database if persistent)
+# An operation is either ["set", state, action] or ["get", state]
+# Returns for every run: the states left in memory (from the least to the most recently used),
+# the actions found by the "get" operations (None if not found) and the hit, disk hit and miss counters
+def run_policy_store(
+    runs: List[Tuple[str, List[list]]],
+    max_size: int = 0,
+    persistent: bool = False) -> List[list]:
+    from policy_store import PolicyStore
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "policy.sqlite") if persistent else None
+        for namespace, operations in runs:
+            with PolicyStore(max_size, path, namespace) as store:
+                found = []
+                for operation in operations:
+                    if operation[0] == "set":
+                        store[operation[1]] = operation[2]
+                    else:
+                        found.append(store.get(operation[1]) if operation[1] in store else None)
+                results.append([list(store.entries), found, store.hits, store.disk_hits, store.misses])
+    return results
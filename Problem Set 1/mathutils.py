@@ -1,8 +1,15 @@
+from array import array
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
 import math
 
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, the batched distances fall back to arrays of coordinates
+    np = None
+
 # the class Point will hold a 2D coordinate on a discrete grid
 # We use dataclass with frozen=True to automatically implement:
 #   the constructor, the == operator, the hash function and to make the class immutable
@@ -25,6 +32,13 @@ class Point:
     
     def __str__(self) -> str:
         return f'({self.x}, {self.y})'
+
+    # The == operator compares the coordinates (as the generated one does) but it first checks if both are the same object
+    # which is the common case when the points come from a PointGrid (the hash function is still generated by the dataclass)
+    def __eq__(self, other: object) -> bool:
+        if self is other: return True
+        if other.__class__ is not Point: return NotImplemented
+        return self.x == other.x and self.y == other.y
     
     # this allow points to be used as iterators such as writing:
     # x, y = point
@@ -32,14 +46,83 @@ class Point:
     def __iter__(self) -> Iterator[int]:
         return iter((self.x, self.y))
 
+    # Frozen dataclasses with __slots__ cannot be unpickled by default (the default unpickling assigns the slots)
+    # so we rebuild the point using the constructor instead. This allows points to be sent between processes.
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
 
 # This is a helper function to compute the euclidean distance between 2 points
-def euclidean_distance(p1: Point, p2: Point) -> int:
-    difference = p1 - p2
-    return math.sqrt(difference.x * difference.x + difference.y * difference.y)
+# It works on the coordinates directly instead of creating the difference point
+def euclidean_distance(p1: Point, p2: Point) -> float:
+    return math.hypot(p1.x - p2.x, p1.y - p2.y)
+
+# The coordinates of many points stored in two arrays (one for x and one for y) for the batched distances below
+# The arrays are NumPy arrays if NumPy is available, otherwise they are arrays of integers from the array module
+class PointArray:
+    __slots__ = ("xs", "ys")
+
+    def __init__(self, points: Iterable[Point]) -> None:
+        points = list(points)
+        if np is not None:
+            self.xs = np.fromiter((point.x for point in points), dtype=np.int64, count=len(points))
+            self.ys = np.fromiter((point.y for point in points), dtype=np.int64, count=len(points))
+        else:
+            self.xs = array('q', [point.x for point in points])
+            self.ys = array('q', [point.y for point in points])
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+# The following functions compute the distances from one point to many points, or between many points and many points, at once
+# They return lists of python numbers (like the functions above) whichever backend is used.
+# With NumPy, the distances are computed by array operations. Without it, the loops go over the coordinate arrays
+# which is still cheaper than calling the distance functions above for every pair of points.
+# The euclidean distances are computed as sqrt(dx*dx + dy*dy) with NumPy, which is exactly math.hypot for integer coordinates
+
+# The manhattan distance from the point to every point in the array
+def manhattan_distances(point: Point, points: PointArray) -> List[int]:
+    px, py = point.x, point.y
+    if np is not None:
+        return (np.abs(points.xs - px) + np.abs(points.ys - py)).tolist()
+    return [abs(x - px) + abs(y - py) for x, y in zip(points.xs, points.ys)]
+
+# The euclidean distance from the point to every point in the array
+def euclidean_distances(point: Point, points: PointArray) -> List[float]:
+    px, py = point.x, point.y
+    if np is not None:
+        dx, dy = (points.xs - px).astype(np.float64), (points.ys - py).astype(np.float64)
+        return np.sqrt(dx * dx + dy * dy).tolist()
+    hypot = math.hypot
+    return [hypot(x - px, y - py) for x, y in zip(points.xs, points.ys)]
+
+# The manhattan distances between every source and every target (matrix[i][j] is the distance from sources[i] to targets[j])
+def manhattan_distance_matrix(sources: PointArray, targets: PointArray) -> List[List[int]]:
+    if np is not None:
+        return (np.abs(sources.xs[:, None] - targets.xs[None, :]) + np.abs(sources.ys[:, None] - targets.ys[None, :])).tolist()
+    txs, tys = targets.xs, targets.ys
+    return [[abs(x - px) + abs(y - py) for x, y in zip(txs, tys)] for px, py in zip(sources.xs, sources.ys)]
+
+# The euclidean distances between every source and every target (matrix[i][j] is the distance from sources[i] to targets[j])
+def euclidean_distance_matrix(sources: PointArray, targets: PointArray) -> List[List[float]]:
+    if np is not None:
+        dx = (sources.xs[:, None] - targets.xs[None, :]).astype(np.float64)
+        dy = (sources.ys[:, None] - targets.ys[None, :]).astype(np.float64)
+        return np.sqrt(dx * dx + dy * dy).tolist()
+    txs, tys, hypot = targets.xs, targets.ys, math.hypot
+    return [[hypot(x - px, y - py) for x, y in zip(txs, tys)] for px, py in zip(sources.xs, sources.ys)]
+
+# The manhattan distance from every source to its nearest target (infinity if there are no targets)
+# This is the reduction that most heuristics need, so the matrix is not converted to lists with NumPy
+def nearest_manhattan_distances(sources: PointArray, targets: PointArray) -> List[float]:
+    if len(targets) == 0: return [math.inf] * len(sources)
+    if np is not None:
+        return (np.abs(sources.xs[:, None] - targets.xs[None, :]) + np.abs(sources.ys[:, None] - targets.ys[None, :])).min(axis=1).tolist()
+    txs, tys = targets.xs, targets.ys
+    return [min([abs(x - px) + abs(y - py) for x, y in zip(txs, tys)]) for px, py in zip(sources.xs, sources.ys)]
 
 # This enum represent 4 directions (RIGHT, UP, LEFT, RIGHT)
 class Direction(IntEnum):
@@ -75,4 +158,53 @@ Direction._Vectors = [
     Point( 0, -1),
     Point(-1,  0),
     Point( 0,  1)
-]
\ No newline at end of file
+]
+
+# A table of the points of a grid (points[y * width + x] == Point(x, y)) so that the same Point objects are reused
+# instead of creating new ones whenever a position is computed (the points are said to be interned).
+# The neighbours of every point are also precomputed so that moving a point in a direction is a lookup.
+# Since the interned points are ordinary points, they can be mixed with the points created elsewhere.
+class PointGrid:
+    __slots__ = ("width", "height", "points", "neighbours")
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.points: Tuple[Point, ...] = tuple(Point(x, y) for y in range(height) for x in range(width))
+        # For every cell index and direction, the interned neighbour (None if it is outside the grid)
+        self.neighbours: Tuple[Tuple[Optional[Point], ...], ...] = tuple(
+            tuple(self.point_or_none(point.x + vector.x, point.y + vector.y) for vector in Direction._Vectors)
+            for point in self.points)
+
+    def point_or_none(self, x: int, y: int) -> Optional[Point]:
+        if 0 <= x < self.width and 0 <= y < self.height: return self.points[y * self.width + x]
+        return None
+
+    # Returns the interned point (or a new point if it is outside the grid)
+    def point(self, x: int, y: int) -> Point:
+        if 0 <= x < self.width and 0 <= y < self.height: return self.points[y * self.width + x]
+        return Point(x, y)
+
+    # Returns the interned version of the point (or the point itself if it is outside the grid)
+    def intern(self, point: Point) -> Point:
+        x, y = point.x, point.y
+        if 0 <= x < self.width and 0 <= y < self.height: return self.points[y * self.width + x]
+        return point
+
+    # Returns the cell index of a point in the grid
+    def index(self, point: Point) -> int:
+        return point.y * self.width + point.x
+
+    # Returns the point moved one step in the direction (the same as point + direction.to_vector() without creating a point
+    # if both the point and its neighbour are in the grid)
+    def translate(self, point: Point, direction: Direction) -> Point:
+        x, y = point.x, point.y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            neighbour = self.neighbours[y * self.width + x][direction]
+            if neighbour is not None: return neighbour
+        return point + Direction._Vectors[direction]
+
+# Returns the point grid of the given size (the grids are shared by all the levels of the same size)
+@lru_cache(maxsize=64)
+def point_grid(width: int, height: int) -> PointGrid:
+    return PointGrid(width, height)
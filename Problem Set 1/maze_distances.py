@@ -0,0 +1,56 @@
+from array import array
+from collections import deque
+from typing import Dict, Tuple
+import math
+
+from dungeon import DungeonLayout, DungeonProblem
+
+# This file contains an oracle for the true maze distances (the number of moves around the walls) in a dungeon
+# It computes a breadth first distance field from the exit and from every coin once per layout,
+# so the distance between any cell and a coin or the exit is a single array lookup
+# The oracle only contains integer arrays that are never modified after it is built,
+# so it can be shared read-only between processes (for example, by forking the workers after building it)
+
+# The value stored in a distance field for the cells that cannot reach the source
+UNREACHABLE = 2**31 - 1
+
+# Compute the maze distance from the source cell to every cell using a breadth first traversal
+# The result is a flat array indexed by the cell index (y * width + x)
+def distance_field(layout: DungeonLayout, source: int) -> array:
+    field = array('i', [UNREACHABLE]) * len(layout.points)
+    field[source] = 0
+    queue = deque([source])
+    while queue:
+        cell = queue.popleft()
+        distance = field[cell] + 1
+        for neighbour in layout.moves[cell]:
+            if neighbour >= 0 and field[neighbour] == UNREACHABLE:
+                field[neighbour] = distance
+                queue.append(neighbour)
+    return field
+
+class MazeDistances:
+    exit_field: array               # The distance from the exit to every cell
+    coin_fields: Tuple[array, ...]  # The distance from coin 'i' to every cell
+    fields: Dict[int, array]        # The distance field of every coin and exit cell (keyed by the cell index)
+
+    def __init__(self, layout: DungeonLayout) -> None:
+        self.exit_field = distance_field(layout, layout.exit_cell)
+        self.coin_fields = tuple(distance_field(layout, cell) for cell in layout.coins)
+        self.fields = dict(zip(layout.coins, self.coin_fields))
+        self.fields[layout.exit_cell] = self.exit_field
+
+    # Returns the maze distance between 2 cells where at least one of them must be a coin or the exit cell
+    # If the cells are not connected, it returns infinity
+    def distance(self, cell_a: int, cell_b: int) -> float:
+        field = self.fields.get(cell_a)
+        distance = field[cell_b] if field is not None else self.fields[cell_b][cell_a]
+        return math.inf if distance == UNREACHABLE else distance
+
+# Returns the maze distances of the problem's layout (they are computed once then cached in the problem's cache)
+def get_maze_distances(problem: DungeonProblem) -> MazeDistances:
+    cache = problem.cache()
+    distances = cache.get("maze_distances")
+    if distances is None:
+        distances = cache["maze_distances"] = MazeDistances(problem.layout)
+    return distances
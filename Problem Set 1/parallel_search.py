@@ -0,0 +1,270 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+import heapq, io, math, os, pickle, queue, time, traceback
+import multiprocessing as mp
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import NULL_STATS, SearchStats
+
+# This file contains a Hash Distributed A* (HDA*) search which runs A* on multiple worker processes
+# Every state is owned by exactly one worker (chosen by hashing the state) and only its owner can add it to a fronteir
+# Each worker keeps its own fronteir and its own dictionary of the best known path costs,
+# and the children generated by a worker are sent to their owners in batches through the worker queues (pipes)
+# NOTE: the workers are forked from the current process so the problem and the heuristic are shared without pickling,
+# which means that this search needs the "fork" start method (available on Linux and macOS)
+
+# This will be filled by the parallel search (if given) to report how much work each worker did
+@dataclass
+class ParallelSearchReport:
+    cost: float = math.inf                                  # The cost of the returned path (inf if no path was found)
+    workers: int = 0                                        # The number of worker processes
+    expansions: List[int] = field(default_factory=list)     # The number of expanded nodes per worker
+    generations: List[int] = field(default_factory=list)    # The number of generated nodes per worker
+    messages: int = 0                                       # The number of batches sent between the processes
+    elapsed: float = 0                                      # The wall time of the search (in seconds)
+
+    @property
+    def total_expansions(self) -> int:
+        return sum(self.expansions)
+
+    @property
+    def expansions_per_second(self) -> float:
+        return self.total_expansions / self.elapsed if self.elapsed > 0 else 0
+
+
+# States sent between the processes are pickled, but some states compare parts of themselves by identity
+# (for example, a dungeon state contains a reference to the layout which is compared by pointers).
+# So the attributes of the problem are never pickled, they are replaced by their index
+# and the receiving process replaces the index by its own copy of the same attribute.
+class _SharedPickler(pickle.Pickler):
+    def __init__(self, file, shared: Dict[int, int]) -> None:
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.shared = shared
+
+    def persistent_id(self, obj: Any):
+        return self.shared.get(id(obj))
+
+class _SharedUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared: List[Any]) -> None:
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, pid: int) -> Any:
+        return self.shared[pid]
+
+class _Channel:
+    def __init__(self, problem: Problem) -> None:
+        self.objects = list(vars(problem).values())
+        self.ids = {id(obj): index for index, obj in enumerate(self.objects)}
+
+    def dumps(self, data: Any) -> bytes:
+        buffer = io.BytesIO()
+        _SharedPickler(buffer, self.ids).dump(data)
+        return buffer.getvalue()
+
+    def loads(self, data: bytes) -> Any:
+        return _SharedUnpickler(io.BytesIO(data), self.objects).load()
+
+
+# The shared data used to communicate between the workers and the coordinator (the process that called the search)
+@dataclass
+class _SharedContext:
+    inboxes: List[Any]  # A queue per worker that receives batches of (g(n), state, path) owned by this worker
+    results: Any        # A queue that receives the solutions and the final statistics of the workers
+    counters: Any       # The number of batches [sent, received] (used for termination detection)
+    idle: Any           # A flag per worker which is set when the worker has no node to expand
+    incumbent: Any      # The cost of the best solution found so far (shared by all the workers)
+    stop: Any           # An event that is set by the coordinator to stop the workers
+    batch_size: int     # The number of nodes a worker expands before sending the generated children
+
+
+def _owner(state: S, workers: int) -> int:
+    return hash(state) % workers
+
+# The error raised by the search when a worker fails (its cause is the exception raised in the worker, when it can be sent)
+class ParallelSearchError(RuntimeError):
+    pass
+
+# The body of a worker process: it runs the search and reports any exception to the coordinator before exiting with code 1
+def _worker(index: int, problem: Problem[S, A], heuristic: HeuristicFunction, context: _SharedContext) -> None:
+    try:
+        _search(index, problem, heuristic, context)
+    except BaseException as error:
+        details = traceback.format_exc()
+        try:
+            data = pickle.dumps(error)
+        except Exception: # The exception cannot be sent, so only its traceback is reported
+            data = None
+        for inbox in context.inboxes:
+            inbox.cancel_join_thread()
+        context.results.put(("error", index, data, details))
+        raise SystemExit(1)
+
+def _search(index: int, problem: Problem[S, A], heuristic: HeuristicFunction, context: _SharedContext) -> None:
+    workers = len(context.inboxes)
+    channel = _Channel(problem)
+    inbox = context.inboxes[index]
+    fronteir = [] # A heap of tuples (priority --> g(n) + h(n), index, g(n), state, path from the initial state to this state)
+    best_g: Dict[S, float] = {} # The best known path cost for every state owned by this worker
+    x = 0 # The index of entrance, it's added to solve the ambiguity in case the priorities are equal
+    expansions, generations = 0, 0
+    outgoing = [[] for _ in range(workers)] # The children waiting to be sent to each worker
+
+    # Add a state owned by this worker (if it improves the best known path cost to it)
+    def receive(g: float, state: S, path: List[A]):
+        nonlocal x
+        if g >= best_g.get(state, math.inf): return
+        best_g[state] = g
+        if problem.is_goal(state): # If it's the goal, publish it if it is better than the current solution
+            with context.incumbent.get_lock():
+                if g < context.incumbent.value:
+                    context.incumbent.value = g
+                    context.results.put(("solution", g, channel.dumps(path)))
+            return
+        f = g + heuristic(problem, state)
+        if f >= context.incumbent.value: return # This state cannot lead to a better solution
+        x += 1
+        heapq.heappush(fronteir, (f, x, g, state, path))
+
+    while not context.stop.is_set():
+        # Receive all the batches waiting in the inbox (and wait for a short while if there is nothing to expand)
+        has_work = bool(fronteir) and fronteir[0][0] < context.incumbent.value
+        while True:
+            try:
+                data = inbox.get(block=not has_work, timeout=0.001) if not has_work else inbox.get_nowait()
+            except queue.Empty:
+                break
+            # The worker must be marked as busy before the batch is counted as received
+            with context.counters.get_lock():
+                context.idle[index] = 0
+                context.counters[1] += 1
+            for g, state, path in channel.loads(data):
+                receive(g, state, path)
+            has_work = True
+
+        # Expand a batch of nodes from the fronteir
+        for _ in range(context.batch_size):
+            if not fronteir or fronteir[0][0] >= context.incumbent.value: break
+            _, _, g, node, path = heapq.heappop(fronteir)
+            if g > best_g[node]: continue # A better path to this node was found after it was added
+            expansions += 1
+            for action in problem.get_actions(node): # Loop on all possible actions
+                child = problem.get_successor(node, action) # Apply this action and get its result node (child)
+                generations += 1
+                new_cost = g + problem.get_cost(node, action)
+                owner = _owner(child, workers)
+                if owner == index:
+                    receive(new_cost, child, path + [action])
+                else:
+                    outgoing[owner].append((new_cost, child, path + [action]))
+
+        # Send the generated children to their owners (a batch is counted as sent before it is put in the queue)
+        for owner, batch in enumerate(outgoing):
+            if not batch: continue
+            with context.counters.get_lock():
+                context.counters[0] += 1
+            context.inboxes[owner].put(channel.dumps(batch))
+            outgoing[owner] = []
+
+        if not fronteir or fronteir[0][0] >= context.incumbent.value:
+            context.idle[index] = 1
+
+    # The other workers may never read what we sent them after the stop, so we do not wait for the queues to be flushed
+    for inbox in context.inboxes:
+        inbox.cancel_join_thread()
+    context.results.put(("stats", index, expansions, generations))
+
+
+# The search is done when every worker is idle and no batch is on its way to a worker
+# To avoid missing a worker that woke up while we were checking, the counters must not change during the check
+def _is_terminated(context: _SharedContext) -> bool:
+    with context.counters.get_lock():
+        before = tuple(context.counters)
+    if before[0] != before[1]: return False
+    if not all(context.idle): return False
+    with context.counters.get_lock():
+        after = tuple(context.counters)
+    return before == after
+
+
+def HashDistributedAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                         workers: int = None, batch_size: int = 64, report: ParallelSearchReport = None,
+                         stats: SearchStats = None) -> Solution:
+    # Only the totals of the expanded and generated nodes are collected from the workers
+    stats = (stats or NULL_STATS).begin()
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    report = ParallelSearchReport() if report is None else report
+    report.workers = workers
+
+    if problem.is_goal(initial_state): # Check if the initial state is actually the goal
+        report.cost, report.expansions, report.generations = 0, [0] * workers, [0] * workers
+        report.elapsed = time.perf_counter() - start
+        return stats.end([])
+
+    ctx = mp.get_context("fork")
+    context = _SharedContext(
+        inboxes = [ctx.Queue() for _ in range(workers)],
+        results = ctx.Queue(),
+        counters = ctx.Array('q', 2),
+        idle = ctx.Array('b', workers, lock=False),
+        incumbent = ctx.Value('d', math.inf),
+        stop = ctx.Event(),
+        batch_size = batch_size
+    )
+    # The initial state is marked as sent before starting the workers, so they cannot be considered done before receiving it
+    channel = _Channel(problem)
+    context.counters[0] = 1
+    context.inboxes[_owner(initial_state, workers)].put(channel.dumps([(0, initial_state, [])]))
+
+    processes = [ctx.Process(target=_worker, args=(index, problem, heuristic, context), daemon=True) for index in range(workers)]
+    for process in processes: process.start()
+
+    try:
+        while not _is_terminated(context):
+            # The workers only exit after the stop, so a worker that exited already has failed (it reports why below)
+            if any(process.exitcode is not None for process in processes): break
+            time.sleep(0.001)
+
+        # Collect the solutions and the statistics of all the workers (the best solution is the one with the least cost)
+        path, cost = None, math.inf
+        report.expansions, report.generations = [0] * workers, [0] * workers
+        remaining = workers
+        context.stop.set()
+        while remaining > 0:
+            try:
+                message = context.results.get(timeout=0.1)
+            except queue.Empty:
+                # A worker that was killed (for example, by the system when it ran out of memory) cannot report anything
+                # A worker that exited by itself flushed its messages before exiting, so they are already received at this point
+                failed = [index for index, process in enumerate(processes) if process.exitcode not in (None, 0)]
+                if failed and context.results.empty():
+                    raise ParallelSearchError(f"The worker {failed[0]} exited with code {processes[failed[0]].exitcode}")
+                continue
+            if message[0] == "solution":
+                _, solution_cost, data = message
+                if solution_cost < cost:
+                    path, cost = channel.loads(data), solution_cost
+            elif message[0] == "error":
+                _, index, data, details = message
+                error = ParallelSearchError(f"The worker {index} failed:\n{details}")
+                if data is None: raise error
+                raise pickle.loads(data) from error
+            else:
+                _, index, expansions, generations = message
+                report.expansions[index], report.generations[index] = expansions, generations
+                remaining -= 1
+        for process in processes: process.join()
+    finally:
+        # If the search failed (or was interrupted), the remaining workers are stopped
+        context.stop.set()
+        for process in processes:
+            if process.is_alive(): process.terminate()
+
+    report.cost = cost
+    report.messages = context.counters[0]
+    report.elapsed = time.perf_counter() - start
+    if stats is not NULL_STATS:
+        stats.expansions += report.total_expansions
+        stats.generations += sum(report.generations)
+    return stats.end(path)
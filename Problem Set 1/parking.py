@@ -1,75 +1,99 @@
-from typing import Any, Dict, Set, Tuple, List
+from typing import Any, Dict, Iterable, Set, Tuple, List
 from problem import Problem
-from mathutils import Direction, Point
+from mathutils import Direction, Point, point_grid
 from helpers import utils
 
-#TODO: (Optional) Instead of Any, you can define a type for the parking state
-ParkingState = Tuple[Point]
+# To keep the states compact, every position in the parking lot has a flat cell index (y * width + x)
+# and the state is a tuple where state[i] is the cell index of car 'i'.
+# Use ParkingProblem.encode_state and ParkingProblem.decode_state to convert between it and a tuple of points.
+ParkingState = Tuple[int, ...]
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
 # This is the implementation of the parking problem
 class ParkingProblem(Problem[ParkingState, ParkingAction]):
     passages: Set[Point]    # A set of points which indicate where a car can be (in other words, every position except walls).
-    cars: Tuple[Point]      # A tuple of points where state[i] is the position of car 'i'. 
+    cars: Tuple[Point]      # A tuple of points where cars[i] is the initial position of car 'i'.
     slots: Dict[Point, int] # A dictionary which indicate the index of the parking slot (if it is 'i' then it is the lot of car 'i') for every position.
                             # if a position does not contain a parking slot, it will not be in this dictionary.
     width: int              # The width of the parking lot.
     height: int             # The height of the parking lot.
+    # The following tables are precomputed in from_text so that the problem never has to compute a neighbour:
+    points: Tuple[Point, ...]                               # The point of every cell index (points[y * width + x] == Point(x, y))
+    moves: Tuple[Tuple[int, ...], ...]                      # For every cell index and direction, the index of the neighbouring cell (-1 if it is a wall)
+    neighbours: Tuple[Tuple[Tuple[Direction, int], ...], ...] # For every cell index, the (direction, neighbouring cell) pairs that are not walls
+    slot_owner: Tuple[int, ...]                             # For every cell index, the car whose slot is in this cell (-1 if it is not a slot)
+    goal: Tuple[Tuple[int, int], ...]                       # The (car index, slot cell index) pairs that must hold in a goal state
+    initial_state: ParkingState
 
     # This function should return the initial state
     def get_initial_state(self) -> ParkingState:
         #TODO: ADD YOUR CODE HERE
 
-        return self.cars # Return cars initial state
-    
+        return self.initial_state # Return cars initial state (as cell indices)
+
     # This function should return True if the given state is a goal. Otherwise, it should return False.
     def is_goal(self, state: ParkingState) -> bool:
         #TODO: ADD YOUR CODE HERE
 
-        for car_position, slot_index in self.slots.items(): # Loop on slots which contains the true slots that the cars should be in
-            if state[slot_index] != car_position:  # If any car position in the current state doesn't equal its correct position in slots, then it's not goal yet
+        for car_index, slot_cell in self.goal: # Loop on slots which contains the true slots that the cars should be in
+            if state[car_index] != slot_cell:  # If any car position in the current state doesn't equal its correct position in slots, then it's not goal yet
                 return False
         return True # else, it's the goal state, meaning the above condition hasn't been entered any time
-    
+
     # This function returns a list of all the possible actions that can be applied to the given state
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
         #TODO: ADD YOUR CODE HERE
 
-        actions = []
-        for i, car_position in enumerate(state):
-            for direction in Direction: # Try every possible direction
-                position = car_position + direction.to_vector() # new car position is old position + the direction vector it will take
+        occupied = 0
+        for cell in state: occupied |= 1 << cell # An occupancy bitmask where bit 'c' is set if a car is in cell 'c'
 
-                if position not in self.passages or position in set(state): continue # If the position is in state then its occupied slot
-                                                                                     # If the position isn't in passages then its not a slot (wall)
-                actions.append((i,direction)) # else, append the direction as possible action
+        actions = []
+        for i, cell in enumerate(state):
+            for direction, neighbour in self.neighbours[cell]: # Try every direction that does not lead into a wall
+                if occupied >> neighbour & 1: continue # If the neighbour is occupied by another car, the car cannot move there
+                actions.append((i, direction)) # else, append the direction as possible action
         return actions
-    
+
     # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
         #TODO: ADD YOUR CODE HERE
 
-        car_index, action_dir = action 
-        new_car_position = state[car_index] + action_dir.to_vector() # new car position is old position + the direction vector it will take
+        car_index, action_dir = action
+        new_car_cell = self.moves[state[car_index]][action_dir] # new car cell is the neighbour of the old cell in the direction it will take
 
-        new_state=list(state) # Convert the state to list to be mutable
-        new_state[car_index]=new_car_position # update the position of the car 
-        new_state=tuple(new_state) # Convert back to tuple
+        return state[:car_index] + (new_car_cell,) + state[car_index+1:] # Replace the cell of the car
 
-        return new_state
-    
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         #TODO: ADD YOUR CODE HERE
         car_index, action_dir = action
-        new_car_position = state[car_index] + action_dir.to_vector() # New car position is old position + the direction vector it will take
+        owner = self.slot_owner[self.moves[state[car_index]][action_dir]] # The owner of the slot the car will enter (if any)
 
-        if new_car_position in self.slots and self.slots[new_car_position] != car_index: # If the new position is another car's correct position then the cost is 101
+        if owner >= 0 and owner != car_index: # If the new position is another car's correct position then the cost is 101
             return 101
         else: # else, it's an empty slot that's no one's property, then cost is 1
             return 1
-    
+
+    # Converts a tuple of car positions (as points) to a state
+    def encode_state(self, positions: Iterable[Point]) -> ParkingState:
+        return tuple(position.y * self.width + position.x for position in positions)
+
+    # Converts a state to a tuple of car positions (as points)
+    def decode_state(self, state: ParkingState) -> Tuple[Point, ...]:
+        return tuple(self.points[cell] for cell in state)
+
+    # Returns a string containing the grid representation of the parking lot at the given state
+    # Cars are drawn as letters, empty slots as the digits of their owners and walls as '#'
+    def format_state(self, state: ParkingState) -> str:
+        cars = {cell: chr(ord('A') + index) for index, cell in enumerate(state)}
+        def cell_to_str(cell):
+            if cell in cars: return cars[cell]
+            if self.points[cell] not in self.passages: return '#'
+            owner = self.slot_owner[cell]
+            return '.' if owner < 0 else str(owner)
+        return '\n'.join(''.join(cell_to_str(y * self.width + x) for x in range(self.width)) for y in range(self.height))
+
      # Read a parking problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'ParkingProblem':
@@ -77,22 +101,38 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         cars, slots = {}, {}
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
         width, height = max(len(line) for line in lines), len(lines)
+        grid = point_grid(width, height) # The points are interned so that the points of the problem are shared objects
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
                 if char != "#":
-                    passages.add(Point(x, y))
+                    point = grid.point(x, y)
+                    passages.add(point)
                     if char == '.':
                         pass
                     elif char in "ABCDEFGHIJ":
-                        cars[ord(char) - ord('A')] = Point(x, y)
+                        cars[ord(char) - ord('A')] = point
                     elif char in "0123456789":
-                        slots[int(char)] = Point(x, y)
+                        slots[int(char)] = point
         problem = ParkingProblem()
         problem.passages = passages
         problem.cars = tuple(cars[i] for i in range(len(cars)))
         problem.slots = {position:index for index, position in slots.items()}
         problem.width = width
         problem.height = height
+        # Precompute the neighbour and slot tables of every cell
+        problem.points = grid.points
+        moves = []
+        for point in problem.points:
+            neighbours = [grid.translate(point, direction) for direction in Direction]
+            moves.append(tuple(neighbour.y * width + neighbour.x if point in passages and neighbour in passages else -1 for neighbour in neighbours))
+        problem.moves = tuple(moves)
+        problem.neighbours = tuple(tuple((direction, cell_moves[direction]) for direction in Direction if cell_moves[direction] >= 0) for cell_moves in moves)
+        slot_owner = [-1] * len(problem.points)
+        for index, position in slots.items():
+            slot_owner[position.y * width + position.x] = index
+        problem.slot_owner = tuple(slot_owner)
+        problem.goal = tuple((index, position.y * width + position.x) for index, position in sorted(slots.items()))
+        problem.initial_state = problem.encode_state(problem.cars)
         return problem
 
     # Read a parking problem from file containing a grid of tiles
@@ -100,4 +140,4 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
     def from_file(path: str) -> 'ParkingProblem':
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
-    
+
@@ -0,0 +1,52 @@
+from array import array
+from typing import List, Optional, Tuple
+import heapq, math
+
+from parking import ParkingProblem, ParkingState
+
+# This file contains an admissible and consistent heuristic for the parking problem
+# Every action moves exactly one car, so the path cost is the sum of the costs paid by every car
+# and the cost paid by car 'i' is at least the cheapest cost for car 'i' to reach its slot if the other cars did not exist.
+# That cheapest cost is computed once per car (for every cell) by a backward Dijkstra from the car's slot
+# where entering the slot of another car costs 101 (as in ParkingProblem.get_cost) and entering any other cell costs 1.
+# So a detour around another car's slot is preferred when it is cheaper and the 101 penalty is only counted
+# when every path to the slot must cross a slot of another car (which is a provable lower bound for the penalties)
+# It is consistent: an action only changes the term of the moved car and by at most the action cost.
+
+# The value stored in a distance table for the cells that cannot reach the slot
+UNREACHABLE = 2**31 - 1
+
+# Compute the cheapest cost for the given car to reach its slot from every cell (ignoring the other cars)
+# The result is a flat array indexed by the cell index (y * width + x)
+def slot_distances(problem: ParkingProblem, car: int, slot: int) -> array:
+    table = array('i', [UNREACHABLE]) * len(problem.points)
+    table[slot] = 0
+    queue = [(0, slot)]
+    while queue:
+        distance, cell = heapq.heappop(queue)
+        if distance > table[cell]: continue # This entry is outdated
+        # Since the moves are reversible, a neighbour reaches this cell by entering it
+        owner = problem.slot_owner[cell]
+        distance += 101 if owner >= 0 and owner != car else 1
+        for _, neighbour in problem.neighbours[cell]:
+            if distance < table[neighbour]:
+                table[neighbour] = distance
+                heapq.heappush(queue, (distance, neighbour))
+    return table
+
+# Returns the distance table of every car that has a slot as (car index, table) pairs
+# They are computed once then cached in the problem's cache
+def get_slot_distances(problem: ParkingProblem) -> List[Tuple[int, array]]:
+    cache = problem.cache()
+    tables: Optional[List[Tuple[int, array]]] = cache.get("slot_distances")
+    if tables is None:
+        tables = cache["slot_distances"] = [(car, slot_distances(problem, car, slot)) for car, slot in problem.goal]
+    return tables
+
+def parking_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    total = 0
+    for car, table in get_slot_distances(problem):
+        distance = table[state[car]]
+        if distance == UNREACHABLE: return math.inf # This car can never reach its slot
+        total += distance
+    return total
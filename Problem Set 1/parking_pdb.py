@@ -0,0 +1,154 @@
+from array import array
+from typing import List, Optional, Sequence, Tuple
+import hashlib, heapq, math, os
+
+from array_file import load_arrays, save_arrays
+from parking import ParkingProblem, ParkingState
+
+# This file contains a pattern database (PDB) heuristic for the parking problem
+# A pattern is a subset of the cars. In the abstract problem of a pattern, the other cars are removed from the parking lot,
+# and only the moves of the pattern cars are counted (with the same costs as ParkingProblem.get_cost).
+# The exact cost to solve the abstract problem from every abstract state is computed offline by a backward Dijkstra
+# from the abstract goal (every pattern car in its slot), and stored in a table indexed by a perfect hash of the car positions:
+#   index = rank(car_0) + rank(car_1) * P + rank(car_2) * P^2 + ...
+# where rank(cell) is the index of the cell among the P passage cells (so the table has P^k entries for k cars).
+# Since the patterns are disjoint and every action is charged to the pattern of the car that moved,
+# the sum of the values of all the patterns never exceeds the true cost (additive PDBs), so the heuristic is admissible and consistent.
+# Unlike the per-car distances of parking_heuristic, the cars in the same pattern block each other,
+# so larger patterns capture more interactions at the cost of a larger table.
+
+# The value stored for the abstract states that cannot reach the abstract goal (or that are invalid since two cars share a cell)
+UNKNOWN = 2**16 - 1
+# The values are stored as unsigned 16-bit integers, so any larger cost is stored as this cap (which is still a lower bound)
+CAP = UNKNOWN - 1
+# The format version written in the header of the database files (increase it when the format changes)
+FORMAT_VERSION = 1
+
+# Returns a hash of the parts of the problem that do not change across states (the passages and the slots)
+# so that a database file is never used with a different parking lot
+def layout_signature(problem: ParkingProblem) -> str:
+    passages = [cell for cell, point in enumerate(problem.points) if point in problem.passages]
+    return hashlib.sha1(repr((problem.width, problem.height, passages, problem.slot_owner)).encode()).hexdigest()
+
+# Splits the cars that have slots into disjoint patterns of the given size (in the order of the car indices)
+def default_patterns(problem: ParkingProblem, pattern_size: int) -> List[Tuple[int, ...]]:
+    cars = [car for car, _ in problem.goal]
+    return [tuple(cars[start:start + pattern_size]) for start in range(0, len(cars), pattern_size)]
+
+# Returns the rank of every cell among the passage cells (-1 for walls) and the cell of every rank
+def passage_ranks(problem: ParkingProblem) -> Tuple[List[int], List[int]]:
+    cells = [cell for cell, point in enumerate(problem.points) if point in problem.passages]
+    ranks = [-1] * len(problem.points)
+    for rank, cell in enumerate(cells):
+        ranks[cell] = rank
+    return ranks, cells
+
+# Compute the table of a single pattern using a backward Dijkstra from the abstract goal
+def build_pattern_table(problem: ParkingProblem, pattern: Sequence[int]) -> array:
+    ranks, cells = passage_ranks(problem)
+    size, k = len(cells), len(pattern)
+    powers = [size ** j for j in range(k)]
+    neighbours = [[ranks[neighbour] for _, neighbour in problem.neighbours[cell]] for cell in cells] # The neighbours of every rank
+    # The cost paid by the pattern car 'j' to enter every cell (101 if it is the slot of another car, otherwise 1)
+    enter = []
+    for car in pattern:
+        owners = (problem.slot_owner[cell] for cell in cells)
+        enter.append([101 if owner >= 0 and owner != car else 1 for owner in owners])
+    slots = dict(problem.goal)
+    goal = tuple(ranks[slots[car]] for car in pattern)
+    # The distances are kept in full precision while searching then capped when stored
+    distances = array('i', [-1]) * (size ** k)
+    goal_index = sum(rank * power for rank, power in zip(goal, powers))
+    distances[goal_index] = 0
+    queue = [(0, goal_index, goal)]
+    while queue:
+        distance, index, positions = heapq.heappop(queue)
+        if distance > distances[index]: continue # This entry is outdated
+        for j, position in enumerate(positions):
+            # The predecessor moved car 'j' from a neighbour into its current position (the moves are reversible)
+            # so the cost of that move is the cost of entering the current position
+            cost = distance + enter[j][position]
+            for neighbour in neighbours[position]:
+                if neighbour in positions: continue # The cell is occupied by another pattern car
+                predecessor = index + (neighbour - position) * powers[j]
+                if distances[predecessor] < 0 or cost < distances[predecessor]:
+                    distances[predecessor] = cost
+                    heapq.heappush(queue, (cost, predecessor, positions[:j] + (neighbour,) + positions[j+1:]))
+    return array('H', (UNKNOWN if distance < 0 else min(distance, CAP) for distance in distances))
+
+class PatternDatabase:
+    signature: str                      # The layout signature of the problem that the database was built for
+    patterns: List[Tuple[int, ...]]     # The cars of every pattern
+    tables: List[Sequence[int]]         # The table of every pattern (an array or a memoryview over a memory-mapped file)
+
+    def __init__(self, signature: str, patterns: List[Tuple[int, ...]], tables: List[Sequence[int]]) -> None:
+        self.signature = signature
+        self.patterns = patterns
+        self.tables = tables
+        self._weights = None
+
+    # Build the database for the problem's parking lot
+    # If no patterns are given, the cars are split into disjoint patterns of "pattern_size" cars
+    @staticmethod
+    def build(problem: ParkingProblem, patterns: Optional[List[Tuple[int, ...]]] = None, pattern_size: int = 2) -> 'PatternDatabase':
+        patterns = patterns or default_patterns(problem, pattern_size)
+        cars = [car for pattern in patterns for car in pattern]
+        if len(cars) != len(set(cars)):
+            raise ValueError(f"The patterns must be disjoint, got {patterns}")
+        slots = dict(problem.goal)
+        if any(car not in slots for car in cars):
+            raise ValueError(f"Every car in the patterns must have a slot, got {patterns}")
+        tables = [build_pattern_table(problem, pattern) for pattern in patterns]
+        return PatternDatabase(layout_signature(problem), [tuple(pattern) for pattern in patterns], tables)
+
+    # Write the database to a file (a JSON header followed by the raw tables, see array_file)
+    def save(self, path: str) -> None:
+        header = {"kind": "parking-pdb", "version": FORMAT_VERSION, "signature": self.signature, "patterns": self.patterns}
+        save_arrays(path, header, {f"pattern{index}": table for index, table in enumerate(self.tables)})
+
+    # Read a database from a file. The tables are memory-mapped (not read into memory)
+    @staticmethod
+    def load(path: str) -> 'PatternDatabase':
+        header, arrays = load_arrays(path)
+        if header.get("kind") != "parking-pdb" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a parking pattern database (version {FORMAT_VERSION})")
+        patterns = [tuple(pattern) for pattern in header["patterns"]]
+        return PatternDatabase(header["signature"], patterns, [arrays[f"pattern{index}"] for index in range(len(patterns))])
+
+    # The total size of the tables in bytes
+    @property
+    def nbytes(self) -> int:
+        return sum(len(table) * 2 for table in self.tables)
+
+    # Returns the sum of the pattern values for the given state
+    def value(self, problem: ParkingProblem, state: ParkingState) -> float:
+        if self._weights is None:
+            # For every pattern and car in it, the term added to the index by the car's cell (rank * P^j, or -1 for walls)
+            ranks, cells = passage_ranks(problem)
+            self._weights = [[[-1 if rank < 0 else rank * len(cells) ** j for rank in ranks] for j in range(len(pattern))]
+                             for pattern in self.patterns]
+        total = 0
+        for pattern, weights, table in zip(self.patterns, self._weights, self.tables):
+            value = table[sum(weights[j][state[car]] for j, car in enumerate(pattern))]
+            if value == UNKNOWN: return math.inf # These cars can never reach their slots
+            total += value
+        return total
+
+# Returns the pattern database of the problem (it is created once then cached in the problem's cache)
+# If a path is given, the database is loaded from it if it exists and matches the parking lot, otherwise it is built then saved to it
+def get_pattern_database(problem: ParkingProblem, path: Optional[str] = None, pattern_size: int = 2) -> PatternDatabase:
+    cache = problem.cache()
+    database: Optional[PatternDatabase] = cache.get("pattern_database")
+    if database is None:
+        if path is not None and os.path.exists(path):
+            database = PatternDatabase.load(path)
+            if database.signature != layout_signature(problem):
+                raise ValueError(f"The pattern database '{path}' was built for a different parking lot")
+        else:
+            database = PatternDatabase.build(problem, pattern_size=pattern_size)
+            if path is not None: database.save(path)
+        cache["pattern_database"] = database
+    return database
+
+def pdb_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    return get_pattern_database(problem).value(problem, state)
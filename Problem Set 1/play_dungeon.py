@@ -1,19 +1,17 @@
 from typing import List
-from dungeon import DungeonProblem, Direction, DungeonState, DungeonTile
+from dungeon import DungeonProblem, Direction, DungeonState
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from search import DEFAULT_CACHE_SIZE
+from search_stats import SearchStats
 from helpers.utils import fetch_tracked_call_count
 from helpers.heuristic_checks import test_heuristic_consistency
-from functools import lru_cache
+from functools import lru_cache, partial
 import argparse, time
 
+# Colour the printed dungeon (the colours are added in a single pass, see dungeon_render)
 def colored_dungeon(level: str):
-    from helpers.utils import bcolors
-    level = level.replace(DungeonTile.COIN, f'{bcolors.BRIGHT_GREEN}{DungeonTile.COIN}{bcolors.ENDC}')
-    level = level.replace(DungeonTile.PLAYER, f'{bcolors.YELLOW}{DungeonTile.PLAYER}{bcolors.ENDC}')
-    level = level.replace(DungeonTile.WALL, f'{bcolors.BRIGHT_BLACK}{DungeonTile.WALL}{bcolors.ENDC}')
-    level = level.replace(DungeonTile.EMPTY, f'{bcolors.BRIGHT_BLACK}{DungeonTile.EMPTY}{bcolors.ENDC}')
-    level = level.replace(DungeonTile.EXIT, f'{bcolors.BRIGHT_BLUE}{DungeonTile.EXIT}{bcolors.ENDC}')
-    return level
+    from dungeon_render import colorize
+    return colorize(level)
 
 # Return the heuristic selected by the user
 def get_heuristic(name: str):
@@ -25,6 +23,12 @@ def get_heuristic(name: str):
     if name == "strong":
         from dungeon_heuristic import strong_heuristic
         return strong_heuristic
+    if name == "strong-batched":
+        from dungeon_heuristic import batched_strong_heuristic
+        return batched_strong_heuristic
+    if name == "mst":
+        from dungeon_heuristic import mst_heuristic
+        return mst_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
@@ -50,73 +54,139 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(dungeon_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(BreadthFirstSearch, stats=SearchStats())
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(DepthFirstSearch, stats=SearchStats())
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(UniformCostSearch, stats=SearchStats())
     if agent_type == "astar":
         from search import AStarSearch
+        from problem import get_heuristic_batch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # A batched heuristic is not cached since A* would call its batched version instead of the cache
+        heuristic = get_heuristic(args.heuristic)
+        if get_heuristic_batch(heuristic) is None: heuristic = lru_cache(2**16)(heuristic)
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
-        return InformedSearchAgent(AStarSearch, heuristic)
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(DungeonProblem.get_successor)
+        return InformedSearchAgent(AStarSearch, heuristic, stats=SearchStats())
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
         heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            DungeonProblem.get_successor = test_heuristic_consistency(heuristic)(DungeonProblem.get_successor)
-        return InformedSearchAgent(BestFirstSearch, heuristic)
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(DungeonProblem.get_successor)
+        return InformedSearchAgent(BestFirstSearch, heuristic, stats=SearchStats())
+    if agent_type == "iddfs":
+        from search import IterativeDeepeningDFS
+        return UninformedSearchAgent(partial(IterativeDeepeningDFS, cache_size=args.cache_size), stats=SearchStats())
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStar
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(DungeonProblem.get_successor)
+        return InformedSearchAgent(partial(IterativeDeepeningAStar, cache_size=args.cache_size), heuristic, stats=SearchStats())
+    if agent_type == "heldkarp":
+        from dungeon_solver import HeldKarpSearch, MAX_COINS
+        # The Held-Karp table grows as 2^coins, so a state with too many remaining coins is solved by A* with the MST heuristic instead
+        # (main tells the user about it once since this function is called on every act)
+        def held_karp_or_astar(problem: DungeonProblem, state: DungeonState, stats: SearchStats = None):
+            if bin(state.coins).count("1") <= MAX_COINS:
+                return HeldKarpSearch(problem, state, stats=stats)
+            from search import AStarSearch
+            return AStarSearch(problem, state, lru_cache(2**16)(get_heuristic("mst")), stats=stats)
+        return UninformedSearchAgent(held_karp_or_astar, stats=SearchStats())
+    if agent_type == "arastar":
+        from search import AnytimeRepairingAStar
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            DungeonProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(DungeonProblem.get_successor)
+        return InformedSearchAgent(AnytimeRepairingAStar, heuristic, time_budget=args.time_budget, stats=SearchStats())
+    if agent_type == "dstar":
+        from dungeon_incremental import DStarLiteAgent
+        return DStarLiteAgent(stats=SearchStats())
+    if agent_type == "retrograde":
+        from dungeon_retrograde import RetrogradeAgent
+        return RetrogradeAgent(args.table)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
 def main(args: argparse.Namespace):
-    state_printer = lambda state: print(state)
-    if args.ansicolors: state_printer = lambda state: print(colored_dungeon(str(state)))
+    # Print the given lines followed by the state
+    if args.diff:
+        # Keep the dungeon at the top of the terminal and only redraw the rows that changed
+        from dungeon_render import TerminalDiffPrinter
+        printer = TerminalDiffPrinter(args.ansicolors)
+        state_printer = lambda lines, state: printer.show(lines + str(state).split('\n'), header=len(lines))
+    elif args.ansicolors:
+        state_printer = lambda lines, state: print('\n'.join(lines + [colored_dungeon(str(state))]))
+    else:
+        state_printer = lambda lines, state: print('\n'.join(lines + [str(state)]))
     start = time.time() # Track run time
     problem = DungeonProblem.from_file(args.level) # create the problem
+    if args.agent == "retrograde":
+        from dungeon_retrograde import MAX_STATES, table_size
+        # The table is built on the first action, so check that it fits before starting
+        if table_size(problem) > MAX_STATES:
+            print(f"The retrograde table of this dungeon would have {table_size(problem)} states but at most {MAX_STATES} are supported")
+            exit(-1)
+    if args.agent == "heldkarp":
+        from dungeon_solver import MAX_COINS
+        if len(problem.layout.coins) > MAX_COINS:
+            print(f"The Held-Karp solver supports at most {MAX_COINS} remaining coins, the states with more coins are solved by A* with the MST heuristic instead")
     state = problem.get_initial_state() # Get the initial state
-    print("Initial State:")
-    state_printer(state)
+    state_printer(["Initial State:"], state)
     agent = create_agent(args)
-    step = 0 # This will store the current step
-    total_explored_nodes = 0 # This will store the number of traversed nodes during search
-    unsolvable = False # This will store whether the problem is unsolvable or not
-    while not problem.is_goal(state):
-        fetch_tracked_call_count(DungeonProblem.is_goal) # Clear the call counter
-        action = agent.act(problem, state) # Request an action from the agent
-        # If no solution was found, break
-        if action is None:
-            print("Agent cannot find a solution, exiting...")
-            unsolvable = True
-            break
-        # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(DungeonProblem.is_goal)
-        # Apply the action to the state
-        state = problem.get_successor(state, action)
-        step += 1
-        # Print any useful information to the user
-        print("Step:", step)
-        print("Action:", str(action))
-        state_printer(state)
-    if not unsolvable: 
-        # If desired by the user, we check that the heuristic is zero at the goal state
-        if args.checks and isinstance(agent, InformedSearchAgent):
-            goal_heuristic = agent.heuristic(problem, state)
-            if goal_heuristic != 0:
-                print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
-        print("YOU WON!!")
-    # This was a search agent, display the number of traversed nodes
-    if not isinstance(agent, HumanAgent):
-        print(f"Search explored {total_explored_nodes} nodes")
-    # Finally print the elapsed time for the whole process
-    print(f"Elapsed time: {time.time() - start} seconds")
+    if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+        from policy_store import agent_settings, open_policy_store
+        # Store the policy in a size limited LRU (and on disk if requested) keyed by the level and the agent settings
+        agent.policy = open_policy_store(args.level, agent_settings(args), args.policy_size, args.policy_file, state_key=lambda state: f"{state.cell},{state.coins}")
+    # The policy is closed even if the run is interrupted, so that the states stored on disk are kept
+    try:
+        step = 0 # This will store the current step
+        total_explored_nodes = 0 # This will store the number of traversed nodes during search
+        unsolvable = False # This will store whether the problem is unsolvable or not
+        while not problem.is_goal(state):
+            fetch_tracked_call_count(DungeonProblem.is_goal) # Clear the call counter
+            action = agent.act(problem, state) # Request an action from the agent
+            # If no solution was found, break
+            if action is None:
+                print("Agent cannot find a solution, exiting...")
+                unsolvable = True
+                break
+            # Get the number of traversed nodes
+            total_explored_nodes += fetch_tracked_call_count(DungeonProblem.is_goal)
+            # Apply the action to the state
+            state = problem.get_successor(state, action)
+            step += 1
+            # Print any useful information to the user
+            state_printer([f"Step: {step}", f"Action: {str(action)}"], state)
+        if not unsolvable: 
+            # If desired by the user, we check that the heuristic is zero at the goal state
+            if args.checks and isinstance(agent, InformedSearchAgent):
+                goal_heuristic = agent.heuristic(problem, state)
+                if goal_heuristic != 0:
+                    print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
+            print("YOU WON!!")
+        # This was a search agent, display the number of traversed nodes
+        if not isinstance(agent, HumanAgent):
+            print(f"Search explored {total_explored_nodes} nodes")
+            if hasattr(agent, "stats"):
+                print("Search Statistics:")
+                print(agent.stats)
+            if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+                print(agent.policy)
+        # Finally print the elapsed time for the whole process
+        print(f"Elapsed time: {time.time() - start} seconds")
+    finally:
+        if isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)): agent.policy.close()
 
 
 if __name__ == "__main__":
@@ -124,15 +194,29 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Dungeon as Human or AI")
     parser.add_argument("level", help="path to the dungeon to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'iddfs', 'idastar', 'arastar', 'heldkarp', 'dstar', 'retrograde'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
-                        choices=["zero", "weak", "strong"],
-                        help="choose the heuristic to use with A* or Greedy Best First Search")
+                        choices=["zero", "weak", "strong", "strong-batched", "mst"],
+                        help="choose the heuristic to use with A*, IDA*, ARA* or Greedy Best First Search")
+    parser.add_argument("--cache-size", "-cs", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="the size of the transposition cache used by the iterative deepening searches (0 disables it)")
+    parser.add_argument("--time-budget", "-tb", type=float, default=0.05,
+                        help="the time budget (in seconds) of every search done by the anytime A* (ARA*) agent")
+    parser.add_argument("--table", "-t", default=None,
+                        help="a file where the retrograde agent keeps its table of optimal actions (it is built if it does not exist)")
+    parser.add_argument("--policy-size", "-ps", type=int, default=0,
+                        help="the maximum number of states kept in the agent's policy in memory (0 for no limit)")
+    parser.add_argument("--policy-file", "-pf", default=None,
+                        help="a sqlite file where the agent's policy is kept between runs")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
+    parser.add_argument("--check-rate", "-cr", type=float, default=1.0,
+                        help="the fraction of the transitions checked for the heuristic consistency (checking all of them is slow)")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the dungeon on the console with ANSI colors (only works on some terminals)")
+    parser.add_argument("--diff", "-df", action="store_true",
+                        help="Keep the dungeon at the top of the console and only redraw the rows that changed (uses ANSI codes)")
 
     args = parser.parse_args()
     try:
@@ -1,9 +1,21 @@
 import time
 from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from search import DEFAULT_CACHE_SIZE
 from helpers.utils import fetch_recorded_calls
+from functools import partial
 import argparse, os, json
 
+# Return the heuristic selected by the user
+def get_heuristic(name: str):
+    if name == "euclidean":
+        return graphrouting_heuristic
+    if name == "alt":
+        from graph_landmarks import alt_heuristic
+        return alt_heuristic
+    print(f"Requested Heuristic '{name}' is invalid")
+    exit(-1)
+
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
@@ -37,10 +49,22 @@ def create_agent(args: argparse.Namespace):
         return UninformedSearchAgent(UniformCostSearch)
     if agent_type == "astar":
         from search import AStarSearch
-        return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+        return InformedSearchAgent(AStarSearch, get_heuristic(args.heuristic))
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+        return InformedSearchAgent(BestFirstSearch, get_heuristic(args.heuristic))
+    if agent_type == "iddfs":
+        from search import IterativeDeepeningDFS
+        return UninformedSearchAgent(partial(IterativeDeepeningDFS, cache_size=args.cache_size))
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStar
+        return InformedSearchAgent(partial(IterativeDeepeningAStar, cache_size=args.cache_size), get_heuristic(args.heuristic))
+    if agent_type == "arastar":
+        from search import AnytimeRepairingAStar
+        return InformedSearchAgent(AnytimeRepairingAStar, get_heuristic(args.heuristic), time_budget=args.time_budget)
+    if agent_type == "ch":
+        from graph_ch import ContractionHierarchySearch
+        return UninformedSearchAgent(ContractionHierarchySearch)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -48,6 +72,14 @@ def main(args: argparse.Namespace):
     start = time.time() # Track run time
     graph_path = args.graph
     problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+    if args.agent == "ch":
+        from graph_ch import get_contraction_hierarchy
+        # Load the hierarchy from the file next to the graph (or build then save it) before the search
+        get_contraction_hierarchy(problem, graph_path)
+    if args.heuristic == "alt":
+        from graph_landmarks import get_landmarks
+        # Load the landmarks from the file next to the graph (or build then save them) before the search
+        get_landmarks(problem, graph_path, args.landmarks)
     # Check if there is a figure for the graph that we can display on the console
     figure_path = json.load(open(graph_path, 'r')).get("figure")
     figure = None
@@ -61,47 +93,69 @@ def main(args: argparse.Namespace):
         print(figure)
     print("Current Node:", state)
     agent = create_agent(args)
-    step = 0 # This will store the current step
-    path_cost = 0 # This will store the total path cost
-    traversed_nodes = [] # This will store all the traversed nodes in order of traversal
-    unsolvable = False # This will store whether the problem is unsolvable or not
-    while not problem.is_goal(state):
-        fetch_recorded_calls(GraphRoutingProblem.is_goal) # Clear the recorded calls
-        action = agent.act(problem, state) # Request an action from the agent
-        # Retrieve the traversed nodes
-        traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.is_goal))]
-        # If no solution was found, break
-        if action is None:
-            print("Agent cannot find a solution, exiting...")
-            unsolvable = True
-            break
-        # Get the cost and add it to the path cost
-        cost = problem.get_cost(state, action)
-        path_cost += cost
-        # Apply the action to the state
-        state = problem.get_successor(state, action)
-        step += 1
-        # Print any useful information to the user
-        print("Step:", step)
-        print("Action:", str(action), f"(cost: {cost})")
-        if figure:
-            print(figure)
-        print("Current Node:", state)
-    if not unsolvable: print("YOU WON!!")
-    print("Path Cost:", path_cost)
-    # This was a search agent, display the traversed nodes
     if not isinstance(agent, HumanAgent):
-        print(f"Traversal Order: {'->'.join(traversed_nodes)}")
-    # Finally print the elapsed time for the whole process
-    print(f"Elapsed time: {time.time() - start} seconds")
+        from policy_store import agent_settings, open_policy_store
+        # Store the policy in a size limited LRU (and on disk if requested) keyed by the level and the agent settings
+        agent.policy = open_policy_store(graph_path, agent_settings(args), args.policy_size, args.policy_file)
+    # The policy is closed even if the run is interrupted, so that the states stored on disk are kept
+    try:
+        step = 0 # This will store the current step
+        path_cost = 0 # This will store the total path cost
+        traversed_nodes = [] # This will store all the traversed nodes in order of traversal
+        unsolvable = False # This will store whether the problem is unsolvable or not
+        while not problem.is_goal(state):
+            fetch_recorded_calls(GraphRoutingProblem.is_goal) # Clear the recorded calls
+            action = agent.act(problem, state) # Request an action from the agent
+            # Retrieve the traversed nodes
+            traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.is_goal))]
+            # If no solution was found, break
+            if action is None:
+                print("Agent cannot find a solution, exiting...")
+                unsolvable = True
+                break
+            # Get the cost and add it to the path cost
+            cost = problem.get_cost(state, action)
+            path_cost += cost
+            # Apply the action to the state
+            state = problem.get_successor(state, action)
+            step += 1
+            # Print any useful information to the user
+            print("Step:", step)
+            print("Action:", str(action), f"(cost: {cost})")
+            if figure:
+                print(figure)
+            print("Current Node:", state)
+        if not unsolvable: print("YOU WON!!")
+        print("Path Cost:", path_cost)
+        # This was a search agent, display the traversed nodes
+        if not isinstance(agent, HumanAgent):
+            print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+            print(agent.policy)
+        # Finally print the elapsed time for the whole process
+        print(f"Elapsed time: {time.time() - start} seconds")
+    finally:
+        if not isinstance(agent, HumanAgent): agent.policy.close()
 
 if __name__ == "__main__":
     # Read the arguments from the command line
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'iddfs', 'idastar', 'arastar', 'ch'],
                         help="the agent that will play the game")
+    parser.add_argument("--heuristic", '-hf', default="euclidean",
+                        choices=["euclidean", "alt"],
+                        help="choose the heuristic to use with A*, IDA*, ARA* or Greedy Best First Search")
+    parser.add_argument("--landmarks", "-l", type=int, default=8,
+                        help="the number of landmarks used by the ALT heuristic")
+    parser.add_argument("--time-budget", "-tb", type=float, default=0.05,
+                        help="the time budget (in seconds) of every search done by the anytime A* (ARA*) agent")
+    parser.add_argument("--policy-size", "-ps", type=int, default=0,
+                        help="the maximum number of states kept in the agent's policy in memory (0 for no limit)")
+    parser.add_argument("--policy-file", "-pf", default=None,
+                        help="a sqlite file where the agent's policy is kept between runs")
+    parser.add_argument("--cache-size", "-cs", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="the size of the transposition cache used by the iterative deepening searches (0 disables it)")
 
     args = parser.parse_args()
     try:
@@ -0,0 +1,154 @@
+from parking import ParkingProblem, ParkingState, ParkingAction
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from mathutils import Direction
+from search_stats import SearchStats
+from helpers.heuristic_checks import test_heuristic_consistency
+from functools import lru_cache
+import argparse, time
+
+# Return the heuristic selected by the user
+def get_heuristic(name: str):
+    if name == "zero":
+        return lambda *_: 0
+    if name == "slots":
+        from parking_heuristic import parking_heuristic
+        return parking_heuristic
+    if name == "pdb":
+        from parking_pdb import pdb_heuristic
+        return pdb_heuristic
+    print(f"Requested Heuristic '{name}' is invalid")
+    exit(-1)
+
+# Create an agent based on the user selections
+def create_agent(args: argparse.Namespace):
+    agent_type: str = args.agent
+    if agent_type == "human":
+        # This function reads the action from the user (human) as a car letter followed by a direction (WASD)
+        def parking_user_action(problem: ParkingProblem, state: ParkingState) -> ParkingAction:
+            possible_actions = list(problem.get_actions(state))
+            while True:
+                user_input = input("Enter action (car letter then WASD, e.g. 'Ad'): ").strip().lower()
+                if len(user_input) == 2:
+                    action = (ord(user_input[0]) - ord('a'), {
+                        'w': Direction.UP,
+                        's': Direction.DOWN,
+                        'a': Direction.LEFT,
+                        'd': Direction.RIGHT
+                    }.get(user_input[1]))
+                    if action in possible_actions:
+                        return action
+                print("Invalid Action")
+        return HumanAgent(parking_user_action)
+    if agent_type == "bfs":
+        from search import BreadthFirstSearch
+        return UninformedSearchAgent(BreadthFirstSearch, stats=SearchStats())
+    if agent_type == "dfs":
+        from search import DepthFirstSearch
+        return UninformedSearchAgent(DepthFirstSearch, stats=SearchStats())
+    if agent_type == "ucs":
+        from search import UniformCostSearch
+        return UninformedSearchAgent(UniformCostSearch, stats=SearchStats())
+    if agent_type == "astar":
+        from search import AStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            ParkingProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(ParkingProblem.get_successor)
+        return InformedSearchAgent(AStarSearch, heuristic, stats=SearchStats())
+    if agent_type == "gbfs":
+        from search import BestFirstSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            ParkingProblem.get_successor = test_heuristic_consistency(heuristic, args.check_rate)(ParkingProblem.get_successor)
+        return InformedSearchAgent(BestFirstSearch, heuristic, stats=SearchStats())
+    print(f"Requested Agent '{agent_type}' is invalid")
+    exit(-1)
+
+def main(args: argparse.Namespace):
+    start = time.time() # Track run time
+    problem = ParkingProblem.from_file(args.level) # create the problem
+    state = problem.get_initial_state() # Get the initial state
+    if args.heuristic == "pdb":
+        from parking_pdb import get_pattern_database
+        # Load the pattern database (or build it) before the search so that it is not counted in the search time
+        get_pattern_database(problem, args.pdb, args.pattern_size)
+    print("Initial State:")
+    print(problem.format_state(state))
+    agent = create_agent(args)
+    if not isinstance(agent, HumanAgent):
+        from policy_store import open_policy_store
+        # Store the policy in a size limited LRU (and on disk if requested) keyed by the level and the agent settings
+        agent.policy = open_policy_store(args.level, f"{args.agent}:{args.heuristic}", args.policy_size, args.policy_file)
+    # The policy is closed even if the run is interrupted, so that the states stored on disk are kept
+    try:
+        step = 0 # This will store the current step
+        path_cost = 0 # This will store the total path cost
+        unsolvable = False # This will store whether the problem is unsolvable or not
+        while not problem.is_goal(state):
+            action = agent.act(problem, state) # Request an action from the agent
+            # If no solution was found, break
+            if action is None:
+                print("Agent cannot find a solution, exiting...")
+                unsolvable = True
+                break
+            # Get the cost and add it to the path cost
+            cost = problem.get_cost(state, action)
+            path_cost += cost
+            # Apply the action to the state
+            state = problem.get_successor(state, action)
+            step += 1
+            # Print any useful information to the user
+            car, direction = action
+            print("Step:", step)
+            print("Action:", chr(ord('A') + car), str(direction), f"(cost: {cost})")
+            print(problem.format_state(state))
+        if not unsolvable:
+            # If desired by the user, we check that the heuristic is zero at the goal state
+            if args.checks and isinstance(agent, InformedSearchAgent):
+                goal_heuristic = agent.heuristic(problem, state)
+                if goal_heuristic != 0:
+                    print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
+            print("YOU WON!!")
+        print("Path Cost:", path_cost)
+        # This was a search agent, display the search statistics
+        if not isinstance(agent, HumanAgent):
+            print("Search Statistics:")
+            print(agent.stats)
+            print(agent.policy)
+        # Finally print the elapsed time for the whole process
+        print(f"Elapsed time: {time.time() - start} seconds")
+    finally:
+        if not isinstance(agent, HumanAgent): agent.policy.close()
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Play Parking as Human or AI")
+    parser.add_argument("level", help="path to the parking lot to play")
+    parser.add_argument("--agent", "-a", default="human",
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        help="the agent that will play the game")
+    parser.add_argument("--heuristic", '-hf', default="slots",
+                        choices=["zero", "slots", "pdb"],
+                        help="choose the heuristic to use with A* or Greedy Best First Search")
+    parser.add_argument("--pdb", default=None,
+                        help="the pattern database file used by the pdb heuristic (it is built and saved there if it does not exist)")
+    parser.add_argument("--pattern-size", "-k", type=int, default=2,
+                        help="the number of cars in every pattern when the pattern database is built")
+    parser.add_argument("--policy-size", "-ps", type=int, default=0,
+                        help="the maximum number of states kept in the agent's policy in memory (0 for no limit)")
+    parser.add_argument("--policy-file", "-pf", default=None,
+                        help="a sqlite file where the agent's policy is kept between runs")
+    parser.add_argument("--checks", "-c", action='store_true', default=False,
+                        help="Enable consistency checks for the heuristic")
+    parser.add_argument("--check-rate", "-cr", type=float, default=1.0,
+                        help="the fraction of the transitions checked for the heuristic consistency (checking all of them is slow)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
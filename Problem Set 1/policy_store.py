@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+import argparse, hashlib, pickle, sqlite3
+
+# This file contains the policy store used by the search agents to remember the action to do in every state
+# It behaves like a dictionary (in, [], []= and get) with 2 additions:
+#   An optional limit on the number of states kept in memory (the least recently used states are evicted first)
+#   An optional sqlite database on disk that keeps the policy between runs. The states are stored under a namespace
+#   (for example, a fingerprint of the level and the agent settings) so that a database can be shared by many levels and agents
+# The states are stored in the database by a string key (repr by default), and the actions are pickled
+# The writes are committed every "commit_every" writes, whenever flush is called (the agents call it after storing a solution)
+# and when the store is closed, so an interrupted run only loses the writes since the last commit.
+# The store can be used as a context manager that closes it at the end of the block
+
+# Returns a fingerprint of the text of a level file (so that the stored policy is not reused if the level changes)
+def level_fingerprint(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+class PolicyStore:
+    def __init__(self, max_size: int = 0, path: Optional[str] = None, namespace: str = "", state_key: Callable[[Any], str] = repr, commit_every: int = 256) -> None:
+        self.max_size = max_size # The maximum number of states kept in memory (0 for no limit)
+        self.commit_every = commit_every # The number of writes after which they are committed to the database
+        self.pending = 0 # The number of writes that were not committed yet
+        self.namespace = namespace
+        self.state_key = state_key
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0       # The number of lookups found in memory
+        self.disk_hits = 0  # The number of lookups found on disk (but not in memory)
+        self.misses = 0     # The number of lookups that were not found
+        self.database = None
+        if path is not None:
+            self.database = sqlite3.connect(path)
+            self.database.execute("CREATE TABLE IF NOT EXISTS policy (namespace TEXT, state TEXT, action BLOB, PRIMARY KEY (namespace, state))")
+
+    def __contains__(self, state) -> bool:
+        if state in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(state)
+            return True
+        if self.database is not None:
+            row = self.database.execute("SELECT action FROM policy WHERE namespace = ? AND state = ?", (self.namespace, self.state_key(state))).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(state, pickle.loads(row[0]))
+                return True
+        self.misses += 1
+        return False
+
+    def __getitem__(self, state):
+        if state not in self: raise KeyError(state)
+        return self.entries[state]
+
+    def __setitem__(self, state, action) -> None:
+        self._remember(state, action)
+        if self.database is not None:
+            self.database.execute("INSERT OR REPLACE INTO policy VALUES (?, ?, ?)", (self.namespace, self.state_key(state), pickle.dumps(action)))
+            self.pending += 1
+            if self.pending >= self.commit_every: self.flush()
+
+    def get(self, state, default=None):
+        if state in self.entries:
+            self.entries.move_to_end(state)
+            return self.entries[state]
+        return default
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # Store the action in memory and evict the least recently used states if the limit is exceeded
+    def _remember(self, state, action) -> None:
+        self.entries[state] = action
+        self.entries.move_to_end(state)
+        if self.max_size > 0:
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # Commit the pending writes to the database
+    def flush(self) -> None:
+        if self.database is not None and self.pending:
+            self.database.commit()
+            self.pending = 0
+
+    # Write the pending changes to the database and close it
+    def close(self) -> None:
+        if self.database is not None:
+            self.flush()
+            self.database.close()
+            self.database = None
+
+    def __enter__(self) -> 'PolicyStore':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.disk_hits + self.misses
+        rate = (self.hits + self.disk_hits) / lookups if lookups else 0
+        return f"Policy lookups: {lookups} (hits: {self.hits}, disk hits: {self.disk_hits}, misses: {self.misses}, hit rate: {rate:.1%}), stored states: {len(self)}"
+
+# Returns the settings of the play scripts that can change the actions of the agent, so that they are part of the namespace
+# of the stored policy: the agent and heuristic names, the number of landmarks of the ALT heuristic,
+# the time budget of ARA* (it stops with a worse path on a smaller budget) and the cache size of the iterative deepening searches
+def agent_settings(args: argparse.Namespace) -> str:
+    settings = [args.agent, args.heuristic]
+    if args.heuristic == "alt": settings.append(f"landmarks={args.landmarks}")
+    if args.agent == "arastar": settings.append(f"time_budget={args.time_budget}")
+    if args.agent in ("iddfs", "idastar"): settings.append(f"cache_size={args.cache_size}")
+    return ":".join(settings)
+
+# Create the policy store used by the play scripts for the given level and agent settings (such as the agent and heuristic names)
+# If no path is given, the policy is only kept in memory
+def open_policy_store(level_path: str, settings: str, max_size: int = 0, path: Optional[str] = None, state_key: Callable[[Any], str] = repr) -> PolicyStore:
+    namespace = f"{level_fingerprint(level_path)}:{settings}" if path is not None else settings
+    return PolicyStore(max_size, path, namespace, state_key)
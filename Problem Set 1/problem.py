@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, List, Optional, Sequence, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -38,4 +38,16 @@ class Problem(ABC, Generic[S, A], CacheContainer):
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
 # A heuristic function which estimates the path cost to the goal for a given state with a certain problem
-HeuristicFunction = Callable[[Problem[S, A], S],float]
\ No newline at end of file
+HeuristicFunction = Callable[[Problem[S, A], S],float]
+# A batched heuristic function which estimates the path cost for many states at once (it returns the values in the same order)
+HeuristicBatchFunction = Callable[[Problem[S, A], Sequence[S]], Sequence[float]]
+
+# A heuristic function can provide a batched version of itself as its "batch" attribute, for example:
+#   my_heuristic.batch = my_heuristic_batch
+# Then A* calls it once per expansion for all the children instead of calling the heuristic for every child.
+# The batched version must return the same values as the heuristic so that the search is not changed.
+# The attribute is kept by functools wrappers (such as lru_cache) since they copy the function's attributes,
+# but A* then calls the batched version directly so the cache of the wrapper is not used.
+# This function returns the batched version of the heuristic (or None if it does not have one)
+def get_heuristic_batch(heuristic: HeuristicFunction) -> Optional[HeuristicBatchFunction]:
+    return getattr(heuristic, "batch", None)
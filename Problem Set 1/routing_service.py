@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+import argparse, json, math, os, socket, socketserver, stat, sys
+
+from graph_csr import CSRGraph, shortest_path_tree
+
+# This file contains a long-lived routing service that loads a graph once then answers batches of (start, goal) queries
+# The queries of a batch that share the same start are answered together by a single Dijkstra shortest path tree,
+# and the results are stored in an LRU cache whose size (in estimated bytes) is limited.
+# The service can be used from python (RoutingService.route) or through its front ends:
+#   stdin: every input line is a JSON query {"start": "a", "goal": "b"} or a JSON batch {"queries": [["a", "b"], ...]}
+#          and the results are written as a JSON line per query to stdout
+#   unix socket: the same protocol over every connection to the socket (one connection is served at a time)
+# If a line is not valid JSON or contains an unknown node, a single JSON line {"error": ...} is written for the whole line
+
+@dataclass
+class RouteResult:
+    start: str
+    goal: str
+    cost: Optional[float]       # The cost of the shortest path (None if there is no path)
+    path: Optional[List[str]]   # The names of the nodes on the path excluding the start (as in GraphRoutingProblem), or None
+    cached: bool = False        # Whether the result came from the cache
+
+    # The estimated memory used by the result when cached (in bytes)
+    @property
+    def size(self) -> int:
+        return 128 + len(self.start) + len(self.goal) + sum(56 + len(name) for name in self.path or [])
+
+    def to_json(self) -> Dict:
+        return {"start": self.start, "goal": self.goal, "cost": self.cost, "path": self.path, "cached": self.cached}
+
+# An LRU cache where every entry has a size, and the least recently used entries are evicted to keep the total size under a limit
+class SizedLRUCache:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size: int) -> None:
+        if size > self.max_size: return # It would evict everything else
+        old = self.entries.pop(key, None)
+        if old is not None: self.size -= old[1]
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+class RoutingService:
+    graph: CSRGraph
+    cache: SizedLRUCache
+
+    # Load the graph (see CSRGraph.open for the supported files) with a result cache of the given size (in bytes)
+    def __init__(self, graph_path: str, edges_path: Optional[str] = None, cache_size: int = 64 * 2**20) -> None:
+        self.graph = CSRGraph.open(graph_path, edges_path)
+        self.cache = SizedLRUCache(cache_size)
+        self.trees = 0 # The number of shortest path trees computed so far
+
+    # Answers a batch of (start, goal) queries (given by the node names) in the same order
+    def route(self, queries: Iterable[Tuple[str, str]]) -> List[RouteResult]:
+        queries = list(queries)
+        results: List[Optional[RouteResult]] = [None] * len(queries)
+        # Group the queries that are not cached by their start
+        pending: Dict[str, List[int]] = {}
+        for index, (start, goal) in enumerate(queries):
+            cached = self.cache.get((start, goal))
+            if cached is not None:
+                results[index] = RouteResult(cached.start, cached.goal, cached.cost, cached.path, cached=True)
+            else:
+                pending.setdefault(start, []).append(index)
+        for start, indices in pending.items():
+            source = self.graph.id_of(start)
+            distances, parents = shortest_path_tree(self.graph, source)
+            self.trees += 1
+            for index in indices:
+                goal = queries[index][1]
+                result = results[index] = self.extract(start, goal, source, self.graph.id_of(goal), distances, parents)
+                self.cache.put((start, goal), result, result.size)
+        return results
+
+    # Build the result of a query from the shortest path tree of its start
+    def extract(self, start: str, goal: str, source: int, target: int, distances, parents) -> RouteResult:
+        if distances[target] == math.inf: return RouteResult(start, goal, None, None)
+        path, node = [], target
+        while node != source:
+            path.append(self.graph.name(node))
+            node = self.source_of(parents[node]) # The tree stores the edge used to reach every node
+        path.reverse()
+        return RouteResult(start, goal, distances[target], path)
+
+    # Returns the source node of the edge (by a binary search over the CSR offsets)
+    def source_of(self, edge: int) -> int:
+        offsets = self.graph.offsets
+        low, high = 0, self.graph.node_count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if offsets[middle] <= edge: low = middle
+            else: high = middle - 1
+        return low
+
+    # Handle a JSON line of the stdin/socket protocol and returns the JSON lines of the results
+    def handle_line(self, line: str) -> List[str]:
+        try:
+            request = json.loads(line)
+            queries = request["queries"] if "queries" in request else [(request["start"], request["goal"])]
+            return [json.dumps(result.to_json()) for result in self.route(queries)]
+        except (ValueError, KeyError, TypeError) as error:
+            return [json.dumps({"error": f"{type(error).__name__}: {error}"})]
+
+    # Serve the JSON lines protocol from the input stream to the output stream until the input ends
+    def serve_stream(self, input: TextIO, output: TextIO) -> None:
+        for line in input:
+            if not line.strip(): continue
+            for response in self.handle_line(line):
+                output.write(response + "\n")
+            output.flush()
+
+    # Serve the JSON lines protocol on a unix socket until interrupted
+    def serve_socket(self, path: str) -> None:
+        service = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode().strip()
+                    if not line: continue
+                    self.wfile.write(''.join(response + "\n" for response in service.handle_line(line)).encode())
+        if os.path.lexists(path): remove_stale_socket(path)
+        with socketserver.UnixStreamServer(path, Handler) as server:
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(path)
+
+# Remove the socket left at the path by a previous run that did not clean up
+# Anything else at the path (a file that is not a socket, or the socket of a running server) is never removed
+def remove_stale_socket(path: str) -> None:
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise FileExistsError(f"'{path}' exists and it is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path) # Nothing is listening on the socket so it is stale
+            return
+    raise FileExistsError(f"'{path}' is the socket of a running server")
+
+def main(args: argparse.Namespace):
+    service = RoutingService(args.graph, args.edges, args.cache_size)
+    if args.start is not None:
+        # Answer a single query then exit
+        print(json.dumps(service.route([(args.start, args.goal)])[0].to_json()))
+    elif args.socket is not None:
+        try:
+            service.serve_socket(args.socket)
+        except FileExistsError as error:
+            print(error, file=sys.stderr)
+            exit(-1)
+    else:
+        service.serve_stream(sys.stdin, sys.stdout)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer routing queries on a graph that is loaded once")
+    parser.add_argument("graph", help="the graph file (JSON) or the nodes file (CSV) of the graph")
+    parser.add_argument("--edges", "-e", default=None, help="the edges file (CSV) if the graph is given as CSV files")
+    parser.add_argument("--cache-size", "-cs", type=int, default=64 * 2**20, help="the maximum size (in bytes) of the result cache")
+    parser.add_argument("--socket", "-s", default=None, help="serve on this unix socket path instead of stdin/stdout")
+    parser.add_argument("--start", default=None, help="answer a single query from this node (to the goal) then exit")
+    parser.add_argument("--goal", default=None, help="the goal of the single query")
+    try:
+        main(parser.parse_args())
+    except KeyboardInterrupt:
+        print("Goodbye!!", file=sys.stderr)
@@ -0,0 +1,201 @@
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+from collections import deque
+import argparse, csv, json, os, resource, sys, time, traceback
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+from search import DEFAULT_CACHE_SIZE
+from search_stats import SearchStats
+
+# This tool runs a grid of experiments (levels x agents x heuristics) without printing the levels
+# Every run plays the level like the play scripts (the agent acts until the goal is reached) in its own process,
+# so a run can be stopped when it exceeds the timeout and its peak memory can be measured separately.
+# The runs are done in parallel (up to the number of workers), then the results are written to CSV and/or JSON
+# and a summary table is printed. The uninformed agents ignore the heuristic so they are run once per level.
+# NOTE: the runs are forked from the current process (which needs the "fork" start method available on Linux and macOS)
+
+# The agents that use a heuristic
+INFORMED_AGENTS = {"astar", "gbfs", "idastar", "arastar"}
+
+@dataclass
+class RunResult:
+    level: str
+    agent: str
+    heuristic: str
+    status: str = "ok"                  # "ok", "unsolvable", "timeout" or "error"
+    path_cost: Optional[float] = None   # The cost of the actions done by the agent
+    steps: int = 0                      # The number of actions done by the agent
+    explored: Optional[int] = None      # The number of expanded nodes in the agent's search statistics (None if the agent has none)
+    wall_time: float = 0                # The time of the run including loading the level (in seconds)
+    peak_memory: float = 0              # The peak resident memory of the run's process (in MB)
+    error: str = ""
+
+# The options given to create_agent in the play scripts
+def agent_options(args: argparse.Namespace, agent: str, heuristic: str) -> argparse.Namespace:
+    return argparse.Namespace(agent=agent, heuristic=heuristic, checks=False, check_rate=1.0, cache_size=args.cache_size,
+                              time_budget=args.time_budget, landmarks=args.landmarks, table=None)
+
+# Give the agent search statistics if it can take them but was created without them (the graph play script does not create them)
+# Some agents (such as the retrograde agent) do not search so they have no statistics
+def attach_stats(agent) -> None:
+    if hasattr(agent, "stats") and agent.stats is None:
+        agent.stats = SearchStats()
+
+# Returns the number of expanded nodes in the agent's search statistics (or None if it has no statistics)
+# The expansions are used rather than the is_goal calls of the play scripts since some searches
+# (such as D* Lite, Held-Karp and the contraction hierarchy) do not call is_goal for the nodes they explore
+def agent_expansions(agent) -> Optional[int]:
+    stats = getattr(agent, "stats", None)
+    return None if stats is None else stats.expansions
+
+# Play a dungeon level with the agent and return the result
+def run_dungeon(result: RunResult, options: argparse.Namespace) -> None:
+    from dungeon import DungeonProblem
+    from play_dungeon import create_agent
+    problem = DungeonProblem.from_file(result.level)
+    state = problem.get_initial_state()
+    agent = create_agent(options)
+    attach_stats(agent)
+    result.path_cost = 0
+    while not problem.is_goal(state):
+        action = agent.act(problem, state)
+        if action is None:
+            result.status = "unsolvable"
+            break
+        result.path_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+        result.steps += 1
+    result.explored = agent_expansions(agent)
+
+# Play a graph level with the agent and return the result
+def run_graph(result: RunResult, options: argparse.Namespace) -> None:
+    from graph import GraphRoutingProblem
+    from play_graph import create_agent
+    problem = GraphRoutingProblem.from_file(result.level)
+    if options.agent == "ch":
+        from graph_ch import get_contraction_hierarchy
+        get_contraction_hierarchy(problem, result.level)
+    if options.heuristic == "alt":
+        from graph_landmarks import get_landmarks
+        get_landmarks(problem, result.level, options.landmarks)
+    state = problem.get_initial_state()
+    agent = create_agent(options)
+    attach_stats(agent)
+    result.path_cost = 0
+    while not problem.is_goal(state):
+        action = agent.act(problem, state)
+        if action is None:
+            result.status = "unsolvable"
+            break
+        result.path_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+        result.steps += 1
+    result.explored = agent_expansions(agent)
+
+# The body of a run's process: it plays the level then sends the result through the connection
+def _run(connection, problem: str, result: RunResult, options: argparse.Namespace) -> None:
+    sys.stdout = open(os.devnull, 'w') # The agents may print
+    start = time.perf_counter()
+    try:
+        (run_dungeon if problem == "dungeon" else run_graph)(result, options)
+    except (Exception, SystemExit): # The play scripts exit if the agent or the heuristic is invalid
+        result.status = "error"
+        result.error = traceback.format_exc(limit=-1).strip().splitlines()[-1]
+    result.wall_time = time.perf_counter() - start
+    result.peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # ru_maxrss is in KB on Linux
+    connection.send(result)
+    connection.close()
+
+# Run every experiment in its own process (at most "workers" at the same time) and return the results in the same order
+def run_all(problem: str, runs: List[RunResult], args: argparse.Namespace) -> List[RunResult]:
+    context = mp.get_context("fork")
+    pending = deque(enumerate(runs))
+    running: Dict[Any, tuple] = {} # The receiving connection of every running process -> (index, process, start time)
+    results: List[Optional[RunResult]] = [None] * len(runs)
+    def finish(index: int, result: RunResult) -> None:
+        results[index] = result
+        if args.verbose: print(f"{result.status:>10} {result.level} {result.agent} {result.heuristic}", file=sys.stderr)
+    while pending or running:
+        while pending and len(running) < args.workers:
+            index, run = pending.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run, args=(sender, problem, run, agent_options(args, run.agent, run.heuristic)))
+            process.start()
+            sender.close()
+            running[receiver] = (index, process, time.perf_counter())
+        for receiver in wait(list(running), timeout=0.05):
+            index, process, _ = running.pop(receiver)
+            try:
+                finish(index, receiver.recv())
+            except EOFError:
+                # The process died without sending a result (for example, if it ran out of memory)
+                finish(index, RunResult(runs[index].level, runs[index].agent, runs[index].heuristic, status="error",
+                                        error=f"The process exited with code {process.exitcode}"))
+            process.join()
+        now = time.perf_counter()
+        for receiver, (index, process, start) in list(running.items()):
+            if args.timeout > 0 and now - start > args.timeout:
+                process.kill()
+                process.join()
+                del running[receiver]
+                finish(index, RunResult(runs[index].level, runs[index].agent, runs[index].heuristic, status="timeout", wall_time=now - start))
+    return results
+
+def write_csv(path: str, results: List[RunResult]) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(RunResult)])
+        writer.writeheader()
+        for result in results:
+            writer.writerow(asdict(result))
+
+def write_json(path: str, results: List[RunResult]) -> None:
+    with open(path, 'w') as f:
+        json.dump([asdict(result) for result in results], f, indent=2)
+
+def print_summary(results: List[RunResult]) -> None:
+    print(f"{'level':<28} {'agent':<10} {'heuristic':<10} {'status':<10} {'cost':>8} {'explored':>9} {'time (s)':>9} {'memory (MB)':>11}")
+    for result in results:
+        cost = "-" if result.path_cost is None else f"{result.path_cost:g}"
+        explored = "-" if result.explored is None else result.explored
+        print(f"{result.level:<28} {result.agent:<10} {result.heuristic:<10} {result.status:<10} {cost:>8} {explored:>9} {result.wall_time:>9.3f} {result.peak_memory:>11.1f}")
+    # The totals of every agent and heuristic over the levels
+    print()
+    print(f"{'agent':<10} {'heuristic':<10} {'solved':>8} {'explored':>9} {'time (s)':>9} {'memory (MB)':>11}")
+    groups: Dict[tuple, List[RunResult]] = {}
+    for result in results:
+        groups.setdefault((result.agent, result.heuristic), []).append(result)
+    for (agent, heuristic), group in groups.items():
+        solved = sum(result.status == "ok" for result in group)
+        explored = [result.explored for result in group if result.explored is not None]
+        explored = sum(explored) if explored else "-"
+        print(f"{agent:<10} {heuristic:<10} {f'{solved}/{len(group)}':>8} {explored:>9} "
+              f"{sum(result.wall_time for result in group):>9.3f} {max(result.peak_memory for result in group):>11.1f}")
+
+def main(args: argparse.Namespace):
+    heuristics = args.heuristics or (["zero"] if args.problem == "dungeon" else ["euclidean"])
+    runs = []
+    for level in args.levels:
+        for agent in args.agents:
+            for heuristic in (heuristics if agent in INFORMED_AGENTS else ["-"]):
+                runs.append(RunResult(level, agent, heuristic))
+    results = run_all(args.problem, runs, args)
+    if args.csv: write_csv(args.csv, results)
+    if args.json: write_json(args.json, results)
+    print_summary(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a grid of levels x agents x heuristics without rendering and collect the results")
+    parser.add_argument("problem", choices=["dungeon", "graph"], help="the problem of the levels")
+    parser.add_argument("levels", nargs="+", help="paths to the levels (dungeons or graphs)")
+    parser.add_argument("--agents", "-a", nargs="+", default=["bfs", "ucs", "astar"], help="the agents to run (as named by the play script)")
+    parser.add_argument("--heuristics", "-hf", nargs="+", default=None, help="the heuristics used by the informed agents (as named by the play script)")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="the number of runs done at the same time")
+    parser.add_argument("--timeout", "-t", type=float, default=60, help="the maximum time of a run in seconds (0 for no limit)")
+    parser.add_argument("--csv", default=None, help="write the results to this CSV file")
+    parser.add_argument("--json", default=None, help="write the results to this JSON file")
+    parser.add_argument("--cache-size", "-cs", type=int, default=DEFAULT_CACHE_SIZE, help="the size of the transposition cache used by the iterative deepening searches")
+    parser.add_argument("--time-budget", "-tb", type=float, default=0.05, help="the time budget (in seconds) of every search done by ARA*")
+    parser.add_argument("--landmarks", "-l", type=int, default=8, help="the number of landmarks used by the ALT heuristic")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="report every finished run on stderr")
+    main(parser.parse_args())
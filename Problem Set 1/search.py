@@ -1,9 +1,13 @@
-from problem import HeuristicFunction, Problem, S, A, Solution
+from problem import HeuristicFunction, Problem, S, A, Solution, get_heuristic_batch
+from search_stats import NULL_STATS, SearchStats
 from collections import deque
 from helpers import utils
 
 #TODO: Import any modules you want to use
 from queue import PriorityQueue
+from collections import OrderedDict
+from dataclasses import dataclass
+import heapq, math, time
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
@@ -12,6 +16,7 @@ from queue import PriorityQueue
 # All the search functions should return one of two possible type:
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
+# All the search functions optionally receive a SearchStats object ("stats") which they fill with statistics about the search
 
 # This function checks if the element is found in the fronteir queue or not for a normal deque
 def in_queue_fronteir(fronteir: deque,child: S):
@@ -35,50 +40,65 @@ def in_pqueue_Astar_fronteir(fronteir: PriorityQueue,child: S):
     return False
 
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
 
     if problem.is_goal(initial_state): # Check if the initial state is actually the goal
-        return [] # Then return empty list (no steps needed, we're already at the goal)
+        return stats.end([]) # Then return empty list (no steps needed, we're already at the goal)
     
     fronteir = deque([(initial_state,[])]) # Initialize the fronteir as FIFO queue of tuple (state,path from the parent to reach this state)
     explored = set() # Initialize the explored set
     while fronteir: # While fronteir not empty
         node,path = fronteir.popleft() # Pop the first entered element (leftmost) to treat the deque as a FIFO queue
         explored.add(node) # Add to explored set
+        stats.expand(node, len(fronteir), len(explored))
 
         for action in problem.get_actions(node):   # Loop on possible actions from this node
-            child = problem.get_successor(node,action)  # Apply this action and get its result node (child)
+            child = get_successor(node,action)  # Apply this action and get its result node (child)
+            stats.generate(node, action, child)
             if child not in explored and not in_queue_fronteir(fronteir,child): # If the child is not in explored set 
                                                                                   # and not in the fronteir
 
                 if problem.is_goal(child): # If it's the goal             
-                    return path+[action]   # return the path of this child plus the last action that got us to the goal
+                    return stats.end(path+[action])   # return the path of this child plus the last action that got us to the goal
                 fronteir.append((child,path+[action])) # if not the goal, add to fronteir
-    return None # if fronteir is empty, this means that all nodes are searched and goal is not found
+            else:
+                stats.prune()
+    return stats.end(None) # if fronteir is empty, this means that all nodes are searched and goal is not found
 
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
     fronteir = deque([(initial_state, [])])  # Initialize the fronteir as LIFO stack of tuple (state,path from the parent to reach this state)
     explored = set() # Initialize the explored set
     while fronteir: # While fronteir not empty
         node,path = fronteir.pop() # Pop the last entered element (rightmost) to treat the deque as a LIFO stack
 
         if problem.is_goal(node):  # Check if the state is the goal
-            return path # then return the path from the parent to this node
+            return stats.end(path) # then return the path from the parent to this node
         
         if node not in explored:
             explored.add(node) # Add to explored set
+            stats.expand(node, len(fronteir), len(explored))
             for action in problem.get_actions(node): # Loop on possible actions from this node
-                child = problem.get_successor(node, action) # Apply this action and get its result node (child)
+                child = get_successor(node, action) # Apply this action and get its result node (child)
+                stats.generate(node, action, child)
 
                 if child not in explored and not in_queue_fronteir(fronteir,child):# If the child is not in explored set 
                                                                                   # and not in the fronteir
                     fronteir.append((child, path + [action])) # Append to fronteir with the path= path + last action
+                else:
+                    stats.prune()
+    return stats.end(None) # if fronteir is empty, this means that all nodes are searched and goal is not found
 
 
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
 
     fronteir = PriorityQueue() # Initialize the fronteir as a priority queue
     x = 0 
@@ -90,13 +110,15 @@ def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
         cost, _, node, path = fronteir.get()  # Pop the node with the least cost
 
         if problem.is_goal(node): # If it's the goal             
-            return path # return the path from the parent to this node
+            return stats.end(path) # return the path from the parent to this node
         
         if node not in explored or explored[node] > cost: 
             explored[node] = cost   # Add the node to explored if it's not explored or it's old cost is larger than current cost 
+        stats.expand(node, fronteir.qsize(), len(explored))
 
         for action in problem.get_actions(node): # Loop on all possible actions
-            child = problem.get_successor(node, action)  # Apply this action and get its result node (child)
+            child = get_successor(node, action)  # Apply this action and get its result node (child)
+            stats.generate(node, action, child)
 
             new_cost = cost + problem.get_cost(node, action) # calculate the new cost to be old cost + the cost to apply this action
 
@@ -107,16 +129,29 @@ def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
                 x += 1  # increment the index of entrance
 
             elif in_pqueue_fronteir(fronteir,child): # If it's already in the fronteir
+                    replaced = False
                     for got_cost,got_x,element,got_path in fronteir.queue:  
                         if element == child and got_cost > new_cost: # check if it exists with a cost larger than the new cost, then replace the existing one with the new
                             fronteir.queue.remove((got_cost,got_x,element,got_path)) # remove existing
                             fronteir.put((new_cost, x, child, path + [action])) # add the new
                             x += 1   # increment the index of entrance
-    return None 
+                            replaced = True
+                    if replaced: stats.decrease_key() # The child was not expanded yet, only its queued path cost improved
+                    else: stats.prune()
+            else:
+                stats.prune()
+    return stats.end(None)
 
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
+    # If the heuristic has a batched version, it is called once per expansion for the children (see get_heuristic_batch)
+    # It is taken before the heuristic is wrapped by the statistics since the wrapper does not have the attribute
+    heuristic_batch = get_heuristic_batch(heuristic)
+    if heuristic_batch is not None: heuristic_batch = stats.timed_heuristic(heuristic_batch)
+    heuristic = stats.timed_heuristic(heuristic)
     fronteir = PriorityQueue() # Initialize the fronteir as a priority queue
     x = 0
     fronteir.put((heuristic(problem,initial_state),0, x, initial_state, []))   # Tuple (priority--> heuristic + path cost to reach this state , index, state, path from the parent to reach this state)
@@ -128,27 +163,45 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
         f,g, _, node, path = fronteir.get()   # Pop the node with the least f(n)
 
         if problem.is_goal(node):# If it's the goal    
-            return path # return the path from the parent to this node
+            return stats.end(path) # return the path from the parent to this node
         
         if node not in explored or explored[node] > g:
             explored[node] = g  # Add the node to explored if it's not explored or it's old g(n) is larger than current g(n) 
-
-        for action in problem.get_actions(node):  # Loop on all possible actions
-            child = problem.get_successor(node, action)  # Apply this action and get its result node (child)
+        stats.expand(node, fronteir.qsize(), len(explored))
+
+        actions = problem.get_actions(node)
+        if heuristic_batch is not None:
+            # Generate all the children first then compute the heuristic of the unexplored ones at once
+            # (the explored children are skipped below anyway, and the children are still visited in the same order)
+            actions = list(actions)
+            children = [get_successor(node, action) for action in actions]
+            unexplored = [child for child in children if child not in explored]
+            values = dict(zip(unexplored, heuristic_batch(problem, unexplored))) if unexplored else {}
+
+        for index, action in enumerate(actions):  # Loop on all possible actions
+            # Apply this action and get its result node (child)
+            child = get_successor(node, action) if heuristic_batch is None else children[index]
+            stats.generate(node, action, child)
 
             new_cost = g + problem.get_cost(node, action) # calculate the new cost to be old cost + the cost to apply this action
 
             if child not in explored and not in_pqueue_Astar_fronteir(fronteir,child): # If the child is not in explored dict 
                                                                                   # and not in the fronteir
-                f_cost = new_cost + heuristic(problem, child) # calculate the f(n) = g(n) + h(n)
+                h = heuristic(problem, child) if heuristic_batch is None else values[child]
+                f_cost = new_cost + h # calculate the f(n) = g(n) + h(n)
                 fronteir.put((f_cost,new_cost, x, child, path + [action])) # add to fronteir 
                 explored[child] = new_cost # add child to explored dict
                 x += 1  # increment the index of entrance
-    return None 
+            else:
+                stats.prune()
+    return stats.end(None)
 
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: SearchStats = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
+    heuristic = stats.timed_heuristic(heuristic)
     fronteir = PriorityQueue() # Initialize the fronteir as a priority queue
     x = 0
     fronteir.put((heuristic(problem,initial_state), x, initial_state, []))  # Tuple (priority-->heuristic, index, state, path from the parent to reach this state)
@@ -159,17 +212,243 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
         h, _, node, path = fronteir.get()   # Pop the node with the least heuristic
 
         if problem.is_goal(node): # If it's the goal    
-            return path # return the path from the parent to this node
+            return stats.end(path) # return the path from the parent to this node
         
         if node not in explored or explored[node] > h:
             explored[node] = h  # Add the node to explored if it's not explored or it's old heuristic is larger than current heuristic 
+        stats.expand(node, fronteir.qsize(), len(explored))
 
         for action in problem.get_actions(node): # Loop on all possible actions
-            child = problem.get_successor(node, action) # Apply this action and get its result node (child)
+            child = get_successor(node, action) # Apply this action and get its result node (child)
+            stats.generate(node, action, child)
 
             if child not in explored and not in_pqueue_fronteir(fronteir,child):  # If the child is not in explored dict 
                                                                                   # and not in the fronteir
                 fronteir.put((heuristic(problem,child), x, child, path + [action]))  # add to fronteir 
                 explored[child] = h   # add child to explored dict
                 x += 1  # increment the index of entrance
-    return None 
\ No newline at end of file
+            else:
+                stats.prune()
+    return stats.end(None) 
+
+# The size of the transposition cache used by the play scripts and run_experiments for the iterative deepening searches
+# The search functions default to no cache (O(depth) memory), but then the passes re-expand the states reached
+# through the many cycles of the grids over and over
+DEFAULT_CACHE_SIZE = 2**16
+
+# This is a sentinel used to mark an exhausted action iterator in the bounded depth first search below
+_EXHAUSTED = object()
+
+# This function runs a single depth first pass that does not go beyond the given bound on f(n) = g(n) + h(n)
+# It is shared by the iterative deepening searches and only keeps the current path in memory (O(depth))
+# The search returns a tuple (path or None, next bound) where the next bound is the smallest f(n) that exceeded the bound
+# If cache_size > 0, a small transposition table {state: g(n)} is used to skip states that were already reached
+# with a smaller or equal g(n) during this pass (the oldest entries are evicted when it gets full)
+def _bounded_depth_first(problem: Problem[S, A], initial_state: S, cost_fn, heuristic_fn, bound: float, cache_size: int, stats: SearchStats):
+    get_successor = stats.timed_successor(problem)
+    stats.expand(initial_state, 1, 0)
+    next_bound = math.inf # The smallest f(n) that was pruned by the bound (used as the bound of the next pass)
+    cache = OrderedDict() if cache_size > 0 else None
+    states = [initial_state] # The states along the current path
+    on_path = {initial_state} # The same states in a set to quickly prevent cycles along the current path
+    costs = [0] # The g(n) for each state along the current path
+    actions = [] # The actions along the current path
+    iterators = [iter(problem.get_actions(initial_state))] # The remaining actions to try for each state along the current path
+
+    while iterators:
+        action = next(iterators[-1], _EXHAUSTED)
+        if action is _EXHAUSTED: # All the actions of the deepest state were tried, so we backtrack
+            iterators.pop()
+            on_path.discard(states.pop())
+            costs.pop()
+            if actions: actions.pop()
+            continue
+
+        node, g = states[-1], costs[-1]
+        child = get_successor(node, action) # Apply this action and get its result node (child)
+        stats.generate(node, action, child)
+        if child in on_path: # Skip the child if it creates a cycle along the current path
+            stats.prune()
+            continue
+
+        new_g = g + cost_fn(node, action)
+        f = new_g + heuristic_fn(child)
+        if f > bound: # The child is beyond the bound, remember the smallest f(n) we pruned to use it as the next bound
+            next_bound = min(next_bound, f)
+            continue
+
+        if cache is not None:
+            if cache.get(child, math.inf) <= new_g: # This state was already searched with a smaller or equal g(n)
+                stats.prune()
+                continue
+            cache[child] = new_g
+            cache.move_to_end(child)
+            if len(cache) > cache_size: cache.popitem(last=False) # Evict the oldest entry
+
+        if problem.is_goal(child): # If it's the goal
+            return actions + [action], next_bound # return the path from the initial state to this child
+
+        # Go deeper by pushing the child to the current path
+        states.append(child)
+        on_path.add(child)
+        costs.append(new_g)
+        actions.append(action)
+        iterators.append(iter(problem.get_actions(child)))
+        stats.expand(child, len(states), 0 if cache is None else len(cache))
+
+    return None, next_bound
+
+
+def IterativeDeepeningAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, cache_size: int = 0, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    heuristic = stats.timed_heuristic(heuristic)
+    if problem.is_goal(initial_state): # Check if the initial state is actually the goal
+        return stats.end([])
+    cost_fn = problem.get_cost
+    heuristic_fn = lambda state: heuristic(problem, state)
+    bound = heuristic_fn(initial_state) # The first bound is f(initial state) = h(initial state)
+    while bound < math.inf:
+        # Search all the paths with f(n) <= bound, then raise the bound to the smallest f(n) that exceeded it
+        path, bound = _bounded_depth_first(problem, initial_state, cost_fn, heuristic_fn, bound, cache_size, stats)
+        if path is not None:
+            return stats.end(path)
+    return stats.end(None) # Nothing was pruned in the last pass, so all the reachable states were searched and the goal is not found
+
+
+def IterativeDeepeningDFS(problem: Problem[S, A], initial_state: S, cache_size: int = 0, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    if problem.is_goal(initial_state): # Check if the initial state is actually the goal
+        return stats.end([])
+    # Here the bound is on the depth (the number of actions) so every action costs 1 and there is no heuristic
+    cost_fn = lambda state, action: 1
+    heuristic_fn = lambda state: 0
+    depth = 0
+    while depth < math.inf:
+        # Search all the paths with at most "depth" actions, then go one level deeper
+        path, depth = _bounded_depth_first(problem, initial_state, cost_fn, heuristic_fn, depth, cache_size, stats)
+        if path is not None:
+            return stats.end(path)
+    return stats.end(None) # Nothing was pruned in the last pass, so all the reachable states were searched and the goal is not found
+
+
+# This will be filled by the anytime search (if given) to report what it found when the budget ran out
+@dataclass
+class AnytimeReport:
+    path: Solution = None       # The best path found so far (None if no path was found)
+    cost: float = math.inf      # The cost of the best path
+    bound: float = math.inf     # The suboptimality bound: the best path cost is at most "bound" times the optimal cost
+    weight: float = math.inf    # The heuristic weight used in the last search iteration
+    iterations: int = 0         # The number of search iterations (one per weight)
+    expansions: int = 0         # The total number of expanded nodes across all the iterations
+    elapsed: float = 0          # The total time spent in the search (in seconds)
+
+
+# This is an implementation of Anytime Repairing A* (ARA*)
+# It starts with a high heuristic weight (f(n) = g(n) + w * h(n)) to find a first solution quickly,
+# then it keeps decreasing the weight and repairing the previous search (instead of starting from scratch) to improve the solution
+# It stops when the weight reaches 1 (the solution is optimal) or when the time or expansion budget runs out
+# NOTE: the budget is only checked after the first solution is found, so the search never returns None if a solution exists
+def AnytimeRepairingAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                          time_budget: float = None, expansion_budget: int = None,
+                          initial_weight: float = 3.0, weight_step: float = 0.5,
+                          report: AnytimeReport = None, stats: SearchStats = None) -> Solution:
+    stats = (stats or NULL_STATS).begin() # Statistics are only collected if requested
+    get_successor = stats.timed_successor(problem)
+    heuristic = stats.timed_heuristic(heuristic)
+    start = time.perf_counter()
+    deadline = math.inf if time_budget is None else start + time_budget
+    max_expansions = math.inf if expansion_budget is None else expansion_budget
+    report = AnytimeReport() if report is None else report
+
+    if problem.is_goal(initial_state): # Check if the initial state is actually the goal
+        report.path, report.cost, report.bound, report.weight = [], 0, 1, 1
+        report.elapsed = time.perf_counter() - start
+        return stats.end([])
+
+    h_values = {} # We store the heuristic of every generated state since the keys are recomputed whenever the weight changes
+    def h(state: S) -> float:
+        value = h_values.get(state)
+        if value is None:
+            value = h_values[state] = heuristic(problem, state)
+        return value
+
+    g = {initial_state: 0} # The best known path cost for every generated state
+    parents = {initial_state: None} # The (parent, action) used to reach each state with its best known path cost
+    weight = initial_weight
+    x = 0 # The index of entrance, it's added to solve the ambiguity in case the priorities are equal
+    fronteir = [(weight * h(initial_state), x, 0, initial_state)] # A heap of tuples (priority --> g(n) + w * h(n), index, g(n) when added, state)
+    closed = set() # The states expanded in the current iteration
+    expanded = set() # The states expanded in any iteration (only used to count the reopenings in the statistics)
+    incons = set() # The states whose path cost improved after they were expanded in the current iteration
+    goal_state, goal_cost = None, math.inf
+
+    # An entry in the heap is stale if the state was expanded or reached with a better path cost since it was added
+    def is_stale(entry) -> bool:
+        _, _, added_g, state = entry
+        return state in closed or g[state] != added_g
+
+    out_of_budget = False
+    while True:
+        report.iterations += 1
+        # Expand nodes until no node in the fronteir can lead to a path better than the current one (for the current weight)
+        while fronteir and fronteir[0][0] < goal_cost:
+            if goal_state is not None and (report.expansions >= max_expansions or time.perf_counter() >= deadline):
+                out_of_budget = True
+                break
+            entry = heapq.heappop(fronteir)
+            if is_stale(entry): continue
+            node = entry[3]
+            closed.add(node)
+            expanded.add(node)
+            report.expansions += 1
+            stats.expand(node, len(fronteir), len(closed))
+            for action in problem.get_actions(node): # Loop on all possible actions
+                child = get_successor(node, action) # Apply this action and get its result node (child)
+                stats.generate(node, action, child)
+                new_cost = g[node] + problem.get_cost(node, action)
+                if new_cost >= g.get(child, math.inf): # We already know a path to the child that is as good or better
+                    stats.prune()
+                    continue
+                if child in expanded: stats.reopen() # The child was already expanded but we found a better path to it
+                elif child in g: stats.decrease_key() # The child is still waiting in the fronteir (or it is the goal)
+                g[child] = new_cost
+                parents[child] = (node, action)
+                if problem.is_goal(child): # If it's the goal, keep it if it is better than the current solution
+                    if new_cost < goal_cost: goal_state, goal_cost = child, new_cost
+                    continue
+                if child in closed:
+                    incons.add(child) # It will be revisited in the next iteration
+                else:
+                    x += 1
+                    heapq.heappush(fronteir, (new_cost + weight * h(child), x, new_cost, child))
+
+        # Store the best path found so far by following the parents from the goal back to the initial state
+        if goal_state is not None:
+            path, state = [], goal_state
+            while parents[state] is not None:
+                state, action = parents[state]
+                path.append(action)
+            report.path, report.cost = path[::-1], goal_cost
+        report.weight = weight
+
+        # The optimal cost is at least the smallest g(n) + h(n) over the states that may still improve the solution
+        candidates = {entry[3] for entry in fronteir if not is_stale(entry)} | incons
+        lower_bound = min((g[state] + h(state) for state in candidates), default=goal_cost)
+        lower_bound = min(lower_bound, goal_cost)
+        if goal_state is not None:
+            report.bound = min(weight, goal_cost / lower_bound) if lower_bound > 0 else 1
+
+        if goal_state is None or out_of_budget or weight <= 1: break
+
+        # Decrease the weight and move the inconsistent states back to the fronteir (with updated priorities) to repair the search
+        weight = max(1.0, weight - weight_step)
+        fronteir = []
+        for state in candidates:
+            x += 1
+            fronteir.append((g[state] + weight * h(state), x, g[state], state))
+        heapq.heapify(fronteir)
+        closed = set()
+        incons = set()
+
+    report.elapsed = time.perf_counter() - start
+    return stats.end(report.path)
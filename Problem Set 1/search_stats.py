@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import time
+
+from problem import HeuristicFunction, Problem, Solution
+
+# This file contains the statistics that the search functions can optionally fill while searching
+# To collect them, pass a SearchStats object to the search function as "stats"
+# If the same object is passed to multiple searches, the statistics are accumulated across all of them
+
+@dataclass
+class SearchStats:
+    expansions: int = 0             # The number of expanded nodes (nodes whose actions were generated)
+    generations: int = 0            # The number of generated nodes (calls to get_successor)
+    duplicates_pruned: int = 0      # The number of generated nodes that were dropped since they were already reached
+    reopenings: int = 0             # The number of times an already expanded state was queued again with a better path cost
+    decreased_keys: int = 0         # The number of times a state still in the fronteir got a better path cost (a decrease-key)
+    peak_frontier: int = 0          # The largest fronteir size seen during the search
+    peak_closed: int = 0            # The largest explored set size seen during the search
+    solution_depth: int = 0         # The number of actions in the last solution found
+    searches: int = 0               # The number of searches that filled these statistics
+    heuristic_time: float = 0       # The time spent in the heuristic (in seconds)
+    successor_time: float = 0       # The time spent in get_successor (in seconds)
+    elapsed: float = 0              # The total time spent in the searches (in seconds)
+    # Optional callbacks for custom telemetry:
+    #   on_expand(state) is called whenever a node is expanded
+    #   on_generate(state, action, child) is called whenever a child is generated
+    on_expand: Optional[Callable[[Any], None]] = None
+    on_generate: Optional[Callable[[Any, Any, Any], None]] = None
+
+    # This is called at the start of a search (it returns itself so that it can be used as "stats = stats.begin()")
+    def begin(self) -> 'SearchStats':
+        self._start = time.perf_counter()
+        return self
+
+    # This is called with the result of a search when it ends, and it returns the same result
+    def end(self, solution: Solution) -> Solution:
+        self.elapsed += time.perf_counter() - self._start
+        self.searches += 1
+        if solution is not None: self.solution_depth = len(solution)
+        return solution
+
+    def expand(self, state: Any, frontier_size: int, closed_size: int) -> None:
+        self.expansions += 1
+        if frontier_size > self.peak_frontier: self.peak_frontier = frontier_size
+        if closed_size > self.peak_closed: self.peak_closed = closed_size
+        if self.on_expand is not None: self.on_expand(state)
+
+    def generate(self, state: Any, action: Any, child: Any) -> None:
+        self.generations += 1
+        if self.on_generate is not None: self.on_generate(state, action, child)
+
+    def prune(self) -> None:
+        self.duplicates_pruned += 1
+
+    def reopen(self) -> None:
+        self.reopenings += 1
+
+    def decrease_key(self) -> None:
+        self.decreased_keys += 1
+
+    # Returns the problem's get_successor wrapped to accumulate the time spent in it
+    def timed_successor(self, problem: Problem) -> Callable[[Any, Any], Any]:
+        get_successor = problem.get_successor
+        def timed(state, action):
+            start = time.perf_counter()
+            child = get_successor(state, action)
+            self.successor_time += time.perf_counter() - start
+            return child
+        return timed
+
+    # Returns the heuristic wrapped to accumulate the time spent in it
+    def timed_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def timed(problem, state):
+            start = time.perf_counter()
+            value = heuristic(problem, state)
+            self.heuristic_time += time.perf_counter() - start
+            return value
+        return timed
+
+    # The branching factor b that a uniform tree with the same depth as the solution would need
+    # to contain the same number of generated nodes: N = b + b^2 + ... + b^d (solved by bisection)
+    @property
+    def effective_branching_factor(self) -> float:
+        nodes, depth = self.generations, self.solution_depth
+        if depth == 0 or nodes == 0: return 0
+        total = lambda b: sum(b ** i for i in range(1, depth + 1))
+        low, high = 0.0, max(1.0, nodes ** (1 / depth)) # Since N >= b^d, then b <= N^(1/d)
+        for _ in range(64):
+            middle = (low + high) / 2
+            if total(middle) < nodes: low = middle
+            else: high = middle
+        return (low + high) / 2
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.expansions / self.elapsed if self.elapsed > 0 else 0
+
+    def __str__(self) -> str:
+        return '\n'.join([
+            f"Searches: {self.searches}",
+            f"Expanded nodes: {self.expansions}",
+            f"Generated nodes: {self.generations}",
+            f"Duplicates pruned: {self.duplicates_pruned}",
+            f"Reopenings: {self.reopenings}",
+            f"Decreased keys: {self.decreased_keys}",
+            f"Peak fronteir size: {self.peak_frontier}",
+            f"Peak explored size: {self.peak_closed}",
+            f"Effective branching factor: {self.effective_branching_factor:.3f}",
+            f"Time in heuristic: {self.heuristic_time:.6f} seconds",
+            f"Time in get_successor: {self.successor_time:.6f} seconds",
+            f"Search time: {self.elapsed:.6f} seconds ({self.nodes_per_second:.0f} expanded nodes/second)",
+        ])
+
+# This is used by the search functions when no statistics are requested, so every hook does nothing
+class NullSearchStats(SearchStats):
+    def begin(self) -> 'SearchStats': return self
+    def end(self, solution: Solution) -> Solution: return solution
+    def expand(self, state: Any, frontier_size: int, closed_size: int) -> None: pass
+    def generate(self, state: Any, action: Any, child: Any) -> None: pass
+    def prune(self) -> None: pass
+    def reopen(self) -> None: pass
+    def decrease_key(self) -> None: pass
+    def timed_successor(self, problem: Problem) -> Callable[[Any, Any], Any]: return problem.get_successor
+    def timed_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction: return heuristic
+
+NULL_STATS = NullSearchStats()
@@ -0,0 +1,205 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+import argparse, heapq, math, os, random, time
+import multiprocessing as mp
+
+from problem import HeuristicFunction, Problem
+from search import UniformCostSearch
+
+# This tool checks a heuristic offline (instead of checking every transition during a search with --checks)
+# It collects states from a level, then it checks every transition (edge) from these states for:
+#   Consistency:   h(state) <= cost(state, action) + h(next state)
+#   Admissibility: h(state) <= the cost of the optimal path from the state to a goal
+# The states are either all the reachable states of the level (enumerated by a breadth first traversal)
+# or a random sample of them (the end points of random walks from the initial state) when the level is too big.
+# The heuristic is computed once per state, and the states are split between worker processes to compute it in parallel.
+# When all the reachable states are enumerated, the optimal costs are computed by a single backward Dijkstra over the enumerated edges,
+# otherwise the workers can compute the optimal cost of every sampled state using a uniform cost search (if requested, since it is slow).
+# Finally, the worst violations of each kind are reported.
+# NOTE: the workers are forked from the current process so the problem and the heuristic are shared without pickling
+
+@dataclass
+class Violation:
+    kind: str       # "consistency" or "admissibility"
+    amount: float   # By how much the heuristic exceeds its bound
+    state: Any
+    action: Any = None
+    next_state: Any = None
+    message: str = ""
+
+# The job shared with the worker processes (it is set before they are forked)
+_job: Dict[str, Any] = {}
+
+# Collect all the states reachable from the initial state (up to a limit), and the edges between them as (action, next state index, cost)
+def enumerate_states(problem: Problem, limit: int) -> Tuple[List[Any], List[List[Tuple[Any, int, float]]], bool]:
+    initial_state = problem.get_initial_state()
+    states, indices, edges = [initial_state], {initial_state: 0}, []
+    queue = deque([initial_state])
+    while queue:
+        state = queue.popleft()
+        state_edges = []
+        for action in problem.get_actions(state):
+            child = problem.get_successor(state, action)
+            index = indices.get(child)
+            if index is None:
+                if len(states) >= limit: return states, edges, False
+                index = indices[child] = len(states)
+                states.append(child)
+                queue.append(child)
+            state_edges.append((action, index, problem.get_cost(state, action)))
+        edges.append(state_edges)
+    return states, edges, True
+
+# Sample states using random walks from the initial state (every walk has a random length up to the given maximum)
+# The samples are followed by their successors so that the edges of every sample can be checked
+def sample_states(problem: Problem, samples: int, walk_length: int, rng: random.Random) -> Tuple[List[Any], List[List[Tuple[Any, int, float]]]]:
+    initial_state = problem.get_initial_state()
+    sampled = set()
+    for _ in range(samples):
+        state = initial_state
+        for _ in range(rng.randint(0, walk_length)):
+            actions = list(problem.get_actions(state))
+            if not actions or problem.is_goal(state): break
+            state = problem.get_successor(state, rng.choice(actions))
+        sampled.add(state)
+    states = list(sampled)
+    indices = {state: index for index, state in enumerate(states)}
+    edges = []
+    for state in list(states):
+        state_edges = []
+        for action in problem.get_actions(state):
+            child = problem.get_successor(state, action)
+            index = indices.get(child)
+            if index is None:
+                index = indices[child] = len(states)
+                states.append(child)
+            state_edges.append((action, index, problem.get_cost(state, action)))
+        edges.append(state_edges)
+    return states, edges
+
+# Compute the optimal cost from every enumerated state to a goal using Dijkstra's algorithm over the reversed edges
+def optimal_costs(problem: Problem, states: List[Any], edges: List[List[Tuple[Any, int, float]]]) -> List[float]:
+    reverse = [[] for _ in states]
+    for index, state_edges in enumerate(edges):
+        for _, child, cost in state_edges:
+            reverse[child].append((index, cost))
+    costs = [math.inf] * len(states)
+    queue = []
+    for index, state in enumerate(states):
+        if problem.is_goal(state):
+            costs[index] = 0
+            queue.append((0, index))
+    heapq.heapify(queue)
+    while queue:
+        cost, index = heapq.heappop(queue)
+        if cost > costs[index]: continue
+        for parent, edge_cost in reverse[index]:
+            if cost + edge_cost < costs[parent]:
+                costs[parent] = cost + edge_cost
+                heapq.heappush(queue, (cost + edge_cost, parent))
+    return costs
+
+# The task of a worker: compute the heuristic of the states in the range (and their optimal costs if requested)
+def _evaluate(bounds: Tuple[int, int]) -> Tuple[List[float], List[Optional[float]]]:
+    problem, heuristic, states = _job["problem"], _job["heuristic"], _job["states"]
+    exact_count = _job["exact_count"]
+    values, exact = [], []
+    for index in range(*bounds):
+        values.append(heuristic(problem, states[index]))
+        if index < exact_count:
+            path = UniformCostSearch(problem, states[index])
+            state, cost = states[index], 0
+            for action in path or []:
+                cost += problem.get_cost(state, action)
+                state = problem.get_successor(state, action)
+            exact.append(math.inf if path is None else cost)
+        else:
+            exact.append(None)
+    return values, exact
+
+# Compute the heuristic of every state (and the optimal cost of the first "exact_count" states) using worker processes
+def evaluate(problem: Problem, heuristic: HeuristicFunction, states: List[Any], exact_count: int, workers: int) -> Tuple[List[float], List[Optional[float]]]:
+    _job.update(problem=problem, heuristic=heuristic, states=states, exact_count=exact_count)
+    chunk = max(1, math.ceil(len(states) / (workers * 8)))
+    chunks = [(start, min(start + chunk, len(states))) for start in range(0, len(states), chunk)]
+    if workers <= 1:
+        results = list(map(_evaluate, chunks))
+    else:
+        with mp.get_context("fork").Pool(workers) as pool:
+            results = pool.map(_evaluate, chunks)
+    values, exact = [], []
+    for chunk_values, chunk_exact in results:
+        values.extend(chunk_values)
+        exact.extend(chunk_exact)
+    return values, exact
+
+# Check every edge for consistency and every state with a known optimal cost for admissibility
+def find_violations(states: List[Any], edges, values: List[float], exact: List[Optional[float]]) -> Tuple[List[Violation], int]:
+    violations, checked = [], 0
+    for index, state_edges in enumerate(edges):
+        h = values[index]
+        for action, child, cost in state_edges:
+            checked += 1
+            if h - values[child] > cost:
+                violations.append(Violation("consistency", h - values[child] - cost, states[index], action, states[child],
+                    f"h(state) - h(next state) = {h} - {values[child]} = {h - values[child]} > {cost} (action cost)"))
+        if exact[index] is not None and h > exact[index]:
+            violations.append(Violation("admissibility", h - exact[index], states[index],
+                message=f"h(state) = {h} > {exact[index]} (optimal cost)"))
+    return violations, checked
+
+# Load the level and return the problem with the heuristic selected by the user
+def load(args: argparse.Namespace):
+    if args.problem == "dungeon":
+        from dungeon import DungeonProblem
+        from play_dungeon import get_heuristic
+        return DungeonProblem.from_file(args.level), get_heuristic(args.heuristic)
+    if args.problem == "parking":
+        from parking import ParkingProblem
+        from play_parking import get_heuristic
+        return ParkingProblem.from_file(args.level), get_heuristic(args.heuristic)
+    print(f"Requested Problem '{args.problem}' is invalid")
+    exit(-1)
+
+def main(args: argparse.Namespace):
+    start = time.time()
+    problem, heuristic = load(args)
+    # Compute the heuristic once before forking so that the tables it caches in the problem are shared with the workers
+    heuristic(problem, problem.get_initial_state())
+    if args.samples > 0:
+        states, edges = sample_states(problem, args.samples, args.walk_length, random.Random(args.seed))
+        values, exact = evaluate(problem, heuristic, states, len(edges) if args.admissibility else 0, args.workers)
+        print(f"Sampled {len(edges)} states (and {len(states) - len(edges)} successors)")
+    else:
+        states, edges, complete = enumerate_states(problem, args.max_states)
+        values, _ = evaluate(problem, heuristic, states, 0, args.workers)
+        # The optimal costs are only known if all the reachable states were enumerated
+        exact = optimal_costs(problem, states, edges) if complete else [None] * len(states)
+        print(f"Enumerated {len(states)} states" + ("" if complete else " (stopped at the limit, admissibility is not checked)"))
+    violations, checked = find_violations(states, edges, values, exact)
+    print(f"Checked {checked} transitions in {time.time() - start:.3f} seconds using {args.workers} worker(s)")
+    for kind in ("consistency", "admissibility"):
+        found = sorted((violation for violation in violations if violation.kind == kind), key=lambda violation: -violation.amount)
+        print(f"{kind.capitalize()} violations: {len(found)}")
+        for violation in found[:args.top]:
+            print(f"State (heuristic exceeds its bound by {violation.amount}):\n{violation.state}")
+            if violation.action is not None:
+                print(f"Action: {violation.action}\nNext State:\n{violation.next_state}")
+            print(violation.message)
+    if violations: exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the consistency and admissibility of a heuristic over the states of a level")
+    parser.add_argument("problem", choices=["dungeon", "parking"], help="the problem of the level")
+    parser.add_argument("level", help="path to the level")
+    parser.add_argument("--heuristic", "-hf", default="zero", help="the heuristic to check (as named by the play script of the problem)")
+    parser.add_argument("--samples", "-n", type=int, default=0, help="check this many sampled states instead of all the reachable states")
+    parser.add_argument("--walk-length", type=int, default=100, help="the maximum length of the random walks that sample the states")
+    parser.add_argument("--admissibility", "-a", action="store_true", default=False,
+                        help="check the admissibility of the sampled states (every sample is solved by a uniform cost search)")
+    parser.add_argument("--max-states", type=int, default=10**6, help="the maximum number of enumerated states")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="the number of worker processes")
+    parser.add_argument("--top", "-k", type=int, default=3, help="the number of worst violations reported for each kind")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random generator")
+    main(parser.parse_args())